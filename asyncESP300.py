@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+
+from esp300Protocol import COMMAND_SEPARATOR, pack_commands, split_responses
+from frameReader import FrameReader
+
+# Cliente asyncio do ESP300: muitas esperas de eixo e laços de telemetria compartilham um único event loop
+
+class AsyncSerialTransport:
+    def __init__(self, port, baudrate=19200):
+        self.port = port
+        self.baudrate = baudrate
+        self.connection = None
+        self._loop = None
+        self._framer = None
+        self._frames = None
+
+    async def open(self):
+        self._loop = asyncio.get_running_loop()
+        self._frames = asyncio.Queue()
+        self.connection = serial.Serial(self.port, baudrate=self.baudrate, timeout=0)
+        self._framer = FrameReader(self.connection)
+        # O event loop avisa quando há bytes; nenhuma leitura bloqueia a thread
+        self._loop.add_reader(self.connection.fileno(), self._on_readable)
+
+    def _on_readable(self):
+        try:
+            self._framer.fill(0)
+        except (serial.SerialException, OSError) as e:
+            print(f"Erro de leitura na porta serial: {e}")
+            return
+        while True:
+            frame = self._framer.next_frame()
+            if frame is None:
+                break
+            self._frames.put_nowait(bytes(frame))  # A fila guarda o quadro além da próxima leitura
+
+    async def write(self, command):
+        command = command if command.endswith('\r') else command + '\r'
+        self.connection.write(command.encode())
+
+    async def query(self, command, timeout):
+        # Respostas atrasadas de uma consulta anterior que expirou não podem ser entregues a esta
+        while not self._frames.empty():
+            self._frames.get_nowait()
+        await self.write(command)
+        frame = await asyncio.wait_for(self._frames.get(), timeout)
+        return frame.decode().strip()
+
+    async def close(self):
+        if self.connection is not None:
+            self._loop.remove_reader(self.connection.fileno())
+            self.connection.close()
+
+class AsyncVisaTransport:
+    # O pyvisa não tem API assíncrona: as chamadas rodam numa única thread auxiliar, fora do event loop.
+    # O handle é compartilhado pelo visaPool: timeout e fechamento passam por ele, nunca direto pelo recurso
+    def __init__(self, resource_name, timeout=5):
+        self.resource_name = resource_name
+        self.timeout = timeout
+        self.resource = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    async def open(self):
+        import visaPool
+        if self.resource is None:
+            self.resource = await asyncio.get_running_loop().run_in_executor(
+                self._executor, visaPool.open_resource, self.resource_name, self.timeout)
+
+    async def write(self, command):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.resource.write, command)
+
+    async def query(self, command, timeout):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._query, command, timeout)
+
+    def _query(self, command, timeout):
+        # Prazo diferente do da conexão: aplicado e devolvido pelo visaPool, na mesma thread da consulta
+        import visaPool
+        if timeout == self.timeout:
+            return self.resource.query(command)
+        visaPool.open_resource(self.resource_name, timeout)
+        try:
+            return self.resource.query(command)
+        finally:
+            visaPool.open_resource(self.resource_name, self.timeout)
+
+    async def close(self):
+        import visaPool
+        self._executor.shutdown()
+        visaPool.close_resource(self.resource_name)
+        self.resource = None
+
+class AsyncESP300:
+    def __init__(self, transport, timeout=5):
+        self.transport = transport
+        self.timeout = timeout
+        self._lock = asyncio.Lock()  # Uma transação por vez no barramento
+
+    async def __aenter__(self):
+        await self.transport.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.transport.close()
+
+    async def query(self, command, timeout=None):
+        async with self._lock:
+            try:
+                return await self.transport.query(command, self.timeout if timeout is None else timeout)
+            except asyncio.TimeoutError:
+                print(f"Sem resposta para {command} em {self.timeout if timeout is None else timeout} s")
+                return None
+
+    async def write(self, command):
+        async with self._lock:
+            await self.transport.write(command)
+
+    async def query_many(self, commands, timeout=None):
+        results = []
+        for line in pack_commands(commands):
+            results.extend(split_responses(await self.query(COMMAND_SEPARATOR.join(line), timeout), line))
+        return results
+
+    # Sem WS: ele travaria a fila de comandos do controlador para todos os eixos;
+    # a espera é feita por wait_motion_done
+    async def move_to(self, axis, position):
+        await self.write(f"{axis}PA{position}")
+
+    async def move_relative(self, axis, increment):
+        await self.write(f"{axis}PR{increment}")
+
+    async def get_position(self, axis):
+        response = await self.query(f"{axis}TP?")
+        return response if response is not None else "Erro"
+
+    async def wait_motion_done(self, axis, interval=0.01, timeout=None):
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        while await self.query(f"{axis}MD?") != "1":
+            if deadline is not None and loop.time() >= deadline:
+                return False
+            await asyncio.sleep(interval)
+        return True
+
+async def open_serial(port, baudrate=19200, timeout=5):
+    device = AsyncESP300(AsyncSerialTransport(port, baudrate), timeout)
+    await device.transport.open()
+    return device
+
+async def open_gpib(resource_name="GPIB0::5::INSTR", timeout=5):
+    device = AsyncESP300(AsyncVisaTransport(resource_name, timeout), timeout)
+    await device.transport.open()
+    return device
+
+async def main():
+    device = await open_serial("/dev/ttyUSB0")
+    try:
+        await asyncio.gather(*(device.move_relative(axis, 1) for axis in (1, 2, 3)))
+        await asyncio.gather(*(device.wait_motion_done(axis) for axis in (1, 2, 3)))
+        for axis in (1, 2, 3):
+            print(f"Posição atual do eixo {axis}: {await device.get_position(axis)}")
+    finally:
+        await device.transport.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,1161 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import serial
+
+from asyncESP300 import open_serial
+from controleESP300 import ESP300
+from esp300Protocol import TERMINATOR
+from esp300Simulator import ESP300Simulator
+from motionWait import MotionWaiter
+
+def legacy_query(resource, command):
+    # Caminho antigo do ESP300.query: atraso fixo de 1 s antes de ler
+    resource.write((command + '\r').encode())
+    time.sleep(1)
+    return resource.read_until(TERMINATOR).decode().strip()
+
+def measure(function, repetitions):
+    samples = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def percentiles(samples):
+    # (p50, p99) em milissegundos
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000
+
+def report(name, samples):
+    p50, p99 = percentiles(samples)
+    print(f"{name:<30} n={len(samples):<5} p50={p50:9.3f} ms  p99={p99:9.3f} ms")
+
+def bench_latency(args):
+    with ESP300Simulator(latency=args.latency) as simulator:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+        device = ESP300(connection, 5)
+        report("query antigo (sleep 1 s)", measure(lambda: legacy_query(connection, "1TP?"), args.legacy_repetitions))
+        report("query por terminador", measure(lambda: device.query("1TP?"), args.repetitions))
+        connection.close()
+
+def bench_refresh(args):
+    with ESP300Simulator(latency=args.latency) as simulator:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+        device = ESP300(connection, 5)
+        report("3 x get_position", measure(lambda: [device.get_position(axis) for axis in (1, 2, 3)], args.repetitions))
+        report("get_positions (1TP?;2TP?;3TP?)", measure(device.get_positions, args.repetitions))
+        connection.close()
+
+def blocking_wait_motion_done(device, axis, interval):
+    while device.query(f"{axis}MD?") != "1":
+        time.sleep(interval)
+
+def bench_async(args):
+    axes = (1, 2, 3)
+    with ESP300Simulator(latency=args.latency, velocity=args.velocity) as simulator:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+        device = ESP300(connection, 5)
+
+        def blocking_cycle():
+            # O cliente bloqueante espera um eixo de cada vez, uma thread por espera
+            for axis in axes:
+                device.write(f"{axis}PR{args.distance}")
+            for axis in axes:
+                blocking_wait_motion_done(device, axis, args.interval)
+
+        start = time.perf_counter()
+        for _ in range(args.repetitions):
+            device.query_many([f"{axis}TP?" for axis in axes])
+        blocking_rate = args.repetitions / (time.perf_counter() - start)
+        report("bloqueante: mover 3 eixos", measure(blocking_cycle, args.moves))
+        connection.close()
+
+        async def run_async():
+            async_device = await open_serial(simulator.port)
+            try:
+                async def cycle():
+                    for axis in axes:
+                        await async_device.move_relative(axis, args.distance)
+                    await asyncio.gather(*(async_device.wait_motion_done(axis, args.interval) for axis in axes))
+
+                async def telemetry(count):
+                    for _ in range(count):
+                        await async_device.query_many([f"{axis}TP?" for axis in axes])
+
+                # Vários laços de telemetria dividem o mesmo event loop
+                start = time.perf_counter()
+                await asyncio.gather(*(telemetry(args.repetitions // 4) for _ in range(4)))
+                async_rate = (args.repetitions // 4) * 4 / (time.perf_counter() - start)
+
+                samples = []
+                for _ in range(args.moves):
+                    start = time.perf_counter()
+                    await cycle()
+                    samples.append(time.perf_counter() - start)
+                return async_rate, samples
+            finally:
+                await async_device.transport.close()
+
+        async_rate, samples = asyncio.run(run_async())
+        report("asyncio: mover 3 eixos", samples)
+        print(f"Atualizações de 3 eixos por segundo: bloqueante={blocking_rate:.1f}  asyncio (4 laços)={async_rate:.1f}")
+
+def bench_gui(args):
+    with ESP300Simulator(latency=args.latency, velocity=args.velocity) as simulator:
+        gaps = gui_gaps(simulator, args.duration, args.distance, args.poll_interval)
+    report("intervalo entre frames da GUI", gaps)
+    print(f"Maior intervalo: {max(gaps) * 1000:.3f} ms (meta: < 16 ms)")
+
+def gui_gaps(simulator, duration, distance, poll_interval):
+    # Intervalos do event loop Qt com os 3 eixos em movimento e as posições sendo atualizadas
+    import tempfile
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication, QLineEdit
+    from controleESP300 import MainWindow
+
+    app = QApplication.instance() or QApplication([])
+    gaps = []
+    directory = tempfile.TemporaryDirectory()
+    window = MainWindow()
+    # Gravações da sessão e esp300.prom num diretório temporário, sem o endpoint /metrics: o
+    # benchmark não mexe em ~/esp300_telemetria nem ocupa a porta 9300
+    window.telemetry_dir = directory.name
+    window.metrics_port = None
+    window.serial_port = simulator.port
+    window.show()
+    window.connect_to_device()
+
+    last = [time.perf_counter()]
+
+    def tick():
+        # Um timer de 1 ms mede quanto tempo o event loop fica sem atender a GUI
+        now = time.perf_counter()
+        gaps.append(now - last[0])
+        last[0] = now
+
+    def start_moves():
+        for axis in (1, 2, 3):
+            window.findChild(QLineEdit, f"eixo{axis}_posicao_input").setText(str(distance * axis))
+            window.move_to_position(axis)
+
+    def poll():
+        for axis in (1, 2, 3):
+            window.update_position_label(axis)
+
+    frame_timer = QTimer()
+    frame_timer.timeout.connect(tick)
+    frame_timer.start(1)
+    poll_timer = QTimer()
+    poll_timer.timeout.connect(poll)
+    poll_timer.start(poll_interval)
+    QTimer.singleShot(500, start_moves)
+    QTimer.singleShot(int(duration * 1000), app.quit)
+    app.exec_()
+    frame_timer.stop()
+    poll_timer.stop()
+    window.close()
+    directory.cleanup()
+    return gaps[1:]
+
+def bench_motion(args):
+    import random
+    random.seed(0)
+    with ESP300Simulator(latency=args.latency) as simulator:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+        device = ESP300(connection, 5)
+        waiter = MotionWaiter(device)
+        state = simulator.axes[1]
+
+        def lag_after(wait):
+            # Tempo entre o fim real do movimento (no simulador) e o momento em que o host percebe
+            device.move_relative(1, random.uniform(-args.distance, args.distance), wait=False)
+            wait()
+            return time.monotonic() - (state.start_time + state.duration)
+
+        def legacy_wait():
+            # check_motor_status antigo: MD a cada 1 s
+            while device.query("1MD?") != "1":
+                time.sleep(1)
+
+        report("polling fixo de 1 s", [lag_after(legacy_wait) for _ in range(args.legacy_moves)])
+        report("espera pelo modelo trapezoidal", [lag_after(lambda: waiter.wait(1, state.target - state.start_position, state.start_time)) for _ in range(args.moves)])
+        connection.close()
+
+def bench_telemetry(args):
+    import tracemalloc
+    from telemetry import PositionSampler
+
+    def run(device, name):
+        sampler = PositionSampler(device, rate=0, capacity=args.capacity)
+        tracemalloc.start()
+        with sampler:
+            time.sleep(args.duration / 2)
+            before = tracemalloc.get_traced_memory()[0]
+            time.sleep(args.duration / 2)
+            after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        samples = sampler.buffer.count
+        print(f"{name:<30} {samples / args.duration:8.1f} amostras/s (3 x TP + 3 x MD)  "
+              f"memória na 2ª metade: {after - before:+d} bytes")
+
+    if args.gpib:
+        import visaPool
+        resource = visaPool.open_resource(args.gpib)
+        run(ESP300(resource, 5), f"GPIB {args.gpib}")
+        resource.close()
+    elif args.port:
+        connection = serial.Serial(args.port, baudrate=19200, timeout=5)
+        run(ESP300(connection, 5), f"serial {args.port}")
+        connection.close()
+    else:
+        with ESP300Simulator(latency=args.latency) as simulator:
+            connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+            run(ESP300(connection, 5), "serial simulado")
+            connection.close()
+
+def bench_scan(args):
+    import numpy as np
+    import scanEngine
+
+    grid = np.linspace(0, args.size, args.points_per_axis)
+    patterns = {
+        "raster": scanEngine.raster(grid, grid, [0.0]),
+        "serpentine": scanEngine.serpentine(grid, grid, [0.0]),
+        "arbitrário (aleatório)": np.random.default_rng(0).uniform(0, args.size, (args.points_per_axis ** 2, 3)),
+    }
+    with ESP300Simulator(latency=args.latency, velocity=args.velocity) as simulator:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+        engine = scanEngine.ScanEngine(ESP300(connection, 5))
+        for name, points in patterns.items():
+            for optimize in (False, True):
+                engine.device.write_many(["1PA0", "2PA0", "3PA0"])
+                engine.waiter.wait_many({1: args.size, 2: args.size, 3: args.size})
+                result = engine.run(points, measure=lambda index, point: None, optimize=optimize)
+                label = f"{name}{' ordenado' if optimize else ''}"
+                print(f"{label:<36} {len(points)} pontos  {result['elapsed']:6.2f} s  "
+                      f"previsto {result['predicted_travel']:6.2f} s  {result['points_per_minute']:7.1f} pontos/min")
+        connection.close()
+
+def bench_program(args):
+    import tempfile
+    from motionProgram import ProgramStore
+
+    steps = []
+    for _ in range(args.steps):
+        steps += [("move_relative", 1, args.distance), ("wait", 1), ("move_relative", 1, -args.distance), ("wait", 1)]
+    with ESP300Simulator(latency=args.latency, velocity=args.velocity) as simulator, tempfile.TemporaryDirectory() as directory:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+        device = ESP300(connection, 5)
+        waiter = MotionWaiter(device)
+
+        def host_driven():
+            # Cada passo custa ida e volta ao host
+            for kind, axis, *value in steps:
+                if kind == "move_relative":
+                    started = time.monotonic()
+                    device.move_relative(axis, value[0], wait=False)
+                    waiter.wait(axis, value[0], started)
+
+        store = ProgramStore(device, registry_path=f"{directory}/programas.json")
+
+        def on_controller():
+            store.run(steps)
+            time.sleep(0.01)
+            while simulator.program_running:
+                time.sleep(0.001)
+
+        report("sequência pelo host", measure(host_driven, args.repetitions))
+        report("programa no controlador", measure(on_controller, args.repetitions))
+        print(f"Programas gravados: {len(simulator.programs)} (a partir da 2ª execução nada é reenviado)")
+        connection.close()
+
+def bench_group(args):
+    from contextlib import ExitStack
+    from controllerGroup import ControllerGroup
+
+    with ExitStack() as stack:
+        simulators = [stack.enter_context(ESP300Simulator(latency=args.latency)) for _ in range(args.units)]
+        devices = {f"esp{index}": ESP300(serial.Serial(simulator.port, baudrate=19200, timeout=5), 5)
+                   for index, simulator in enumerate(simulators, 1)}
+        report(f"{args.units} x get_positions em série", measure(lambda: [device.get_positions() for device in devices.values()], args.repetitions))
+        with ControllerGroup(devices) as group:
+            report("ControllerGroup.positions", measure(group.positions, args.repetitions))
+            position = [0.0]
+
+            def group_move():
+                # Cada controlador com uma distância diferente: a barreira dura o mais longo
+                position[0] = args.distance if position[0] == 0 else 0.0
+                targets = {name: {1: position[0] * index} for index, name in enumerate(group.workers, 1)}
+                group.move_and_wait(targets)
+
+            report("move_and_wait em grupo", measure(group_move, args.moves))
+            longest = max(simulator.axes[1].duration for simulator in simulators)
+            print(f"Movimento mais longo previsto no simulador: {longest * 1000:.1f} ms")
+
+def bench_visa(args):
+    import pyvisa
+    import visaPool
+
+    with ESP300Simulator(latency=args.latency) as simulator:
+        name = f"ASRL{simulator.port}::INSTR"
+
+        def fresh_manager():
+            # Como era antes: um ResourceManager novo a cada conexão
+            rm = pyvisa.ResourceManager()
+            rm.list_resources()
+            resource = rm.open_resource(name)
+            resource.close()
+            rm.close()
+
+        report("ResourceManager novo + listagem + open", measure(fresh_manager, args.repetitions))
+        started = time.perf_counter()
+        visaPool.list_resources()
+        visaPool.open_resource(name)
+        print(f"{'visaPool, primeira conexão':<30} {(time.perf_counter() - started) * 1000:8.2f} ms")
+        report("visaPool, conexão já aberta", measure(lambda: visaPool.open_resource(name), args.repetitions))
+        report("visaPool, listagem em cache", measure(visaPool.list_resources, args.repetitions))
+        report("visaPool.reopen", measure(lambda: visaPool.reopen(name), args.repetitions))
+        visaPool.close_all()
+
+def bench_reconnect(args):
+    import threading
+
+    with ESP300Simulator(latency=args.latency) as simulator:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=args.timeout)
+        device = ESP300(connection, args.timeout)
+
+        # Comando sem resposta: estoura o prazo, mas a sonda VE mostra que o enlace está bom
+        started = time.perf_counter()
+        device.query("1PA0")
+        print(f"{'comando sem resposta':<30} {(time.perf_counter() - started) * 1000:8.1f} ms  "
+              f"reconexões: {len(device.link.recoveries)} (antes: reabertura + 2 s fixos)")
+
+        for outage in args.outages:
+            # Cabo "desconectado" por 'outage' segundos; mede até a primeira consulta bem-sucedida
+            recoveries = len(device.link.recoveries)
+            simulator.online = False
+            threading.Timer(outage, setattr, (simulator, "online", True)).start()
+            started = time.perf_counter()
+            while device.query("1TP?") is None:
+                pass
+            total = (time.perf_counter() - started) * 1000
+            if len(device.link.recoveries) == recoveries:
+                detail = "sem reconexão: a sonda já respondeu"
+            else:
+                tier, elapsed, _ = device.link.last_recovery
+                detail = f"nível {tier}, recuperação {elapsed * 1000:.1f} ms"
+            print(f"{f'queda de {outage} s':<30} volta em {total:8.1f} ms  ({detail})")
+
+        # Queda maior que o limite da recuperação: o disjuntor abre e as chamadas falham na hora
+        device.link.backoff_budget = device.link.max_recovery = 1.0
+        simulator.online = False
+        device.query("1TP?")
+        report("chamada com disjuntor aberto", measure(lambda: device.query("1TP?"), args.repetitions))
+        simulator.online = True
+        device.link.opened_at -= device.link.cooldown
+        started = time.perf_counter()
+        device.query("1TP?")
+        print(f"{'meio aberto -> fechado':<30} {(time.perf_counter() - started) * 1000:8.1f} ms  estado: {device.link.state}")
+        connection.close()
+
+def bench_discovery(args):
+    import tempfile
+    from contextlib import ExitStack
+    import findPorts
+
+    with ExitStack() as stack:
+        directory = stack.enter_context(tempfile.TemporaryDirectory())
+        cache = f"{directory}/portas.json"
+        simulators = [stack.enter_context(ESP300Simulator(latency=args.latency)) for _ in range(args.ports)]
+        for simulator in simulators[1:]:
+            simulator.online = False  # Outros dispositivos tty que não respondem ao VE
+        # pty não tem USB: como as demais portas sem USB, a identificação é o próprio endereço. As ptys
+        # não aparecem em list_ports, então só a varredura recebe os candidatos
+        candidates = {simulator.port: simulator.port for simulator in reversed(simulators)}
+
+        started = time.perf_counter()
+        found = [address for address in candidates if findPorts.probe(address, args.timeout)]
+        print(f"{'sondas em série':<30} {(time.perf_counter() - started) * 1000:8.1f} ms  encontrados: {len(found)}")
+        started = time.perf_counter()
+        address = findPorts.find_esp300(args.timeout, cache, candidates=candidates)
+        print(f"{'varredura paralela (sem cache)':<30} {(time.perf_counter() - started) * 1000:8.1f} ms  -> {address}")
+        report("porta do cache", measure(lambda: findPorts.find_esp300(args.timeout, cache), args.repetitions))
+        started = time.perf_counter()
+        findPorts.candidate_ports()
+        print(f"{'enumeração serial + VISA':<30} {(time.perf_counter() - started) * 1000:8.1f} ms  (evitada quando o cache acerta)")
+
+def bench_framing(args):
+    import os
+    import pty
+    import threading
+    import tracemalloc
+    import tty
+    from frameReader import FrameReader
+
+    frame = b"1.234567,-2.345678,3.456789\r\n"  # Resposta típica de 1TP?;2TP?;3TP?
+
+    def byte_at_a_time(connection):
+        # Como em testSerial.py
+        response = b''
+        while not response.endswith(b'\r\n'):
+            response += connection.read(1)
+        return response.decode('ascii', errors='ignore').strip()
+
+    def read_until(connection):
+        # Como ESP300.read_response antes
+        return connection.read_until(TERMINATOR).decode().strip()
+
+    methods = {
+        "byte a byte (testSerial)": lambda connection, framer: byte_at_a_time(connection),
+        "read_until + decode": lambda connection, framer: read_until(connection),
+        "FrameReader.read_frame": lambda connection, framer: framer.read_frame(5),
+        "FrameReader.read_numbers": lambda connection, framer: framer.read_numbers(5),
+    }
+    for name, method in methods.items():
+        master, slave = pty.openpty()
+        tty.setraw(slave)
+        connection = serial.Serial(os.ttyname(slave), baudrate=19200, timeout=5)
+        framer = FrameReader(connection)
+
+        burst = memoryview(frame * 64)
+
+        def writer(count):
+            # Rajadas de vários quadros por escrita, como no modo de telemetria; o pty tem buffer
+            # pequeno, então o escritor roda numa thread e bloqueia até o leitor consumir
+            for start in range(0, count, 64):
+                os.write(master, burst[:len(frame) * min(64, count - start)])
+
+        thread = threading.Thread(target=writer, args=(args.frames,))
+        started = time.perf_counter()
+        thread.start()
+        for _ in range(args.frames):
+            method(connection, framer)
+        elapsed = time.perf_counter() - started
+        thread.join()
+
+        # Memória alocada e liberada dentro de cada leitura (pico acima do nível de antes)
+        thread = threading.Thread(target=writer, args=(args.allocation_frames,))
+        thread.start()
+        tracemalloc.start()
+        transient = 0
+        for _ in range(args.allocation_frames):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            method(connection, framer)
+            transient += tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+        thread.join()
+        print(f"{name:<30} {args.frames / elapsed:10.0f} quadros/s  {transient / args.allocation_frames:7.0f} bytes transitórios/quadro")
+        connection.close()
+        os.close(master)
+        os.close(slave)
+
+def bench_overhead(args):
+    from esp300Protocol import COMMAND_SEPARATOR, pack_commands, split_responses
+    from transports import FakeTransport, encode
+
+    # Resposta imediata em memória: o tempo medido é só o custo do host por comando
+    def responder(line):
+        return "0" if ';' not in line else ','.join("0" for _ in line.split(';'))
+
+    class Legacy:
+        # Trabalho por chamada do ESP300.query anterior: testes de tipo, \r, formatação e encode
+        def __init__(self, resource):
+            self.resource = resource
+
+        def query(self, command):
+            if isinstance(self.resource, serial.Serial):
+                pass
+            command = command if command.endswith('\r') else command + '\r'
+            return self.resource(command.encode()[:-1].decode()).strip()
+
+        def query_many(self, commands):
+            results = []
+            for line in pack_commands(commands):
+                results.extend(split_responses(self.query(COMMAND_SEPARATOR.join(line)), line))
+            return results
+
+    legacy = Legacy(responder)
+    device = ESP300(FakeTransport(responder), 5)
+    transport = device.transport
+    hot = encode("1TP?")
+    axes = (1, 2, 3)
+    commands = tuple(f"{axis}TP?" for axis in axes)
+
+    def per_call(name, function):
+        started = time.perf_counter()
+        for _ in range(args.calls):
+            function()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<36} {elapsed / args.calls * 1e9:8.0f} ns/comando")
+
+    per_call("query (caminho anterior)", lambda: legacy.query(f"{axes[0]}TP?"))
+    per_call("ESP300.query", lambda: device.query(f"{axes[0]}TP?"))
+    per_call("transporte, bytes pré-compilados", lambda: transport.query(hot))
+    per_call("query_many 3 eixos (anterior)", lambda: legacy.query_many([f"{axis}TP?" for axis in axes]))
+    per_call("ESP300.query_many 3 eixos", lambda: device.query_many(commands))
+
+def bench_simulator(args):
+    import scanEngine
+
+    # Mesma varredura em tempo real e acelerado, pelo pty e pelo recurso em processo
+    grid = [float(value) for value in range(args.points_per_axis)]
+    points = scanEngine.serpentine(grid, grid, [0.0])
+    for time_scale in (1.0, args.time_scale):
+        for variant in ("pty", "em processo"):
+            simulator = ESP300Simulator(latency=0.0, time_scale=time_scale, velocity=args.velocity)
+            if variant == "pty":
+                simulator.start()
+                device = ESP300(serial.Serial(simulator.port, baudrate=19200, timeout=5), 5)
+            else:
+                device = ESP300(simulator.resource(), 5)
+            engine = scanEngine.ScanEngine(device, waiter=MotionWaiter(device, time_scale=time_scale))
+            result = engine.run(points, optimize=False)
+            simulated = result["elapsed"] * time_scale
+            print(f"{variant:<12} escala {time_scale:5.0f}x  {len(points)} pontos em {result['elapsed']:6.2f} s reais "
+                  f"({simulated:6.2f} s do controlador)")
+            device.transport.close()
+            simulator.stop()
+
+def suite_control(args, results):
+    import threading
+    from ioWorker import IOWorker, PRIORITY_POLL
+
+    with ESP300Simulator(latency=args.latency, time_scale=args.time_scale) as simulator:
+        connection = serial.Serial(simulator.port, baudrate=19200, timeout=5)
+        device = ESP300(connection, 5)
+        prefix = "controleESP300"
+
+        results[f"{prefix}.query_p50_ms"], results[f"{prefix}.query_p99_ms"] = percentiles(measure(lambda: device.query("1TP?"), args.repetitions))
+        results[f"{prefix}.refresh_p50_ms"], results[f"{prefix}.refresh_p99_ms"] = percentiles(measure(device.get_positions, args.repetitions))
+
+        # Várias consultas na fila da thread de I/O ao mesmo tempo: o worker agrupa em linhas com ';'
+        worker = IOWorker(device)
+        started = time.perf_counter()
+        futures = [worker.submit("query", f"{index % 3 + 1}TP?", priority=PRIORITY_POLL) for index in range(args.pipelined)]
+        for future in futures:
+            future.result()
+        results[f"{prefix}.pipelined_commands_per_s"] = args.pipelined / (time.perf_counter() - started)
+        worker.close()
+
+        # Do comando de movimento até o host perceber que terminou, medido contra o fim real no simulador
+        waiter = MotionWaiter(device, time_scale=args.time_scale)
+        state = simulator.axes[1]
+        lags = []
+        for index in range(args.moves):
+            distance = args.distance if index % 2 == 0 else -args.distance
+            started = time.monotonic()
+            device.move_relative(1, distance, wait=False)
+            waiter.wait(1, distance, started)
+            lags.append(time.monotonic() - simulator.host_time(state.start_time + state.duration))
+        results[f"{prefix}.move_done_lag_p50_ms"], results[f"{prefix}.move_done_lag_p99_ms"] = percentiles(lags)
+
+        # Queda curta do enlace: tempo entre o enlace voltar e a primeira resposta
+        device.transport.timeout = 0.2
+        restored = []
+
+        def restore():
+            simulator.online = True
+            restored.append(time.perf_counter())
+
+        simulator.online = False
+        threading.Timer(args.outage, restore).start()
+        while device.query("1TP?") is None:
+            pass
+        results[f"{prefix}.reconnect_recovery_ms"] = (time.perf_counter() - restored[0]) * 1000
+        connection.close()
+
+    with ESP300Simulator(latency=args.latency, time_scale=args.time_scale) as simulator:
+        gaps = gui_gaps(simulator, args.gui_duration, args.distance, 50)
+        results[f"{prefix}.gui_block_p99_ms"] = percentiles(gaps)[1]
+        results[f"{prefix}.gui_block_max_ms"] = max(gaps) * 1000
+
+def suite_commands(args, results):
+    from pymeasure.adapters import SerialAdapter
+    import esp300commands
+
+    with ESP300Simulator(latency=args.latency, time_scale=args.time_scale) as simulator:
+        adapter = SerialAdapter(simulator.port, baudrate=19200, timeout=5, write_termination='\r', read_termination='\r\n')
+        device = esp300commands.ESP300(adapter)
+        prefix = "esp300commands"
+
+        results[f"{prefix}.query_p50_ms"], results[f"{prefix}.query_p99_ms"] = percentiles(measure(lambda: device.ask("1TP?"), args.repetitions))
+        results[f"{prefix}.refresh_p50_ms"], results[f"{prefix}.refresh_p99_ms"] = percentiles(measure(lambda: device.query_many(["1TP?", "2TP?", "3TP?"]), args.repetitions))
+
+        # Sem thread de I/O, o que este driver tem para encadear comandos é o agrupamento em linhas
+        commands = [f"{index % 3 + 1}TP?" for index in range(args.pipelined)]
+        started = time.perf_counter()
+        device.query_many(commands)
+        results[f"{prefix}.pipelined_commands_per_s"] = args.pipelined / (time.perf_counter() - started)
+
+        # move_to envia WS: a consulta seguinte só é respondida depois que o eixo para
+        state = simulator.axes[1]
+        lags = []
+        for index in range(args.moves):
+            device.move_to(1, args.distance if index % 2 == 0 else 0)
+            while device.ask("1MD?").strip() != "1":
+                pass
+            lags.append(time.monotonic() - simulator.host_time(state.start_time + state.duration))
+        results[f"{prefix}.move_done_lag_p50_ms"], results[f"{prefix}.move_done_lag_p99_ms"] = percentiles(lags)
+
+        results[f"{prefix}.reconnect_ms"] = percentiles(measure(device.reconnect, 5))[0]
+        adapter.close()
+
+def compare(results, baseline, tolerance, min_delta):
+    # Regressão: pior que a referência por mais que 'tolerance' (fração); *_per_s quanto maior melhor.
+    # Em métricas *_ms, diferenças menores que min_delta ms são ruído e não contam
+    regressions = []
+    for name, value in sorted(results.items()):
+        reference = baseline.get(name)
+        if reference is None or value is None or reference == 0:
+            continue
+        change = (value - reference) / reference
+        worse = -change if name.endswith("_per_s") else change
+        flag = "REGRESSÃO" if worse > tolerance and not (name.endswith("_ms") and abs(value - reference) < min_delta) else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<45} {reference:12.3f} -> {value:12.3f}  {change * 100:+7.1f}%  {flag}")
+    return regressions
+
+def bench_suite(args):
+    import json
+    import os
+    import platform
+    import subprocess
+    import sys
+
+    results = {}
+    suite_control(args, results)
+    if not args.skip_pymeasure:
+        suite_commands(args, results)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    run = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {key: value for key, value in vars(args).items() if key != "function"},
+        "results": results,
+    }
+    for name, value in sorted(results.items()):
+        print(f"{name:<45} {value:12.3f}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(run, file, indent=2)
+        print(f"Resultados gravados em {args.output}")
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        print(f"\nComparação com {args.baseline} (tolerância {args.tolerance * 100:.0f}%):")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        if regressions:
+            print(f"{len(regressions)} métrica(s) pioraram além da tolerância.")
+            sys.exit(1)
+
+def bench_metrics(args):
+    import driverMetrics
+    from transports import FakeTransport, encode
+
+    # Custo da instrumentação por comando: o mesmo ESP300 em memória com e sem as métricas
+    class NoMetrics:
+        rejected = 0
+
+        def record(self, data, elapsed, error=None):
+            pass
+
+    instrumented = ESP300(FakeTransport(lambda line: "0"), 5)
+    bare = ESP300(FakeTransport(lambda line: "0"), 5)
+    bare.metrics.close()
+    bare.metrics = NoMetrics()
+    hot = encode("1TP?")
+
+    def per_call(function):
+        best = float("inf")
+        for _ in range(5):  # Melhor de 5: a diferença é pequena perto do ruído do laço
+            started = time.perf_counter()
+            for _ in range(args.calls):
+                function()
+            best = min(best, time.perf_counter() - started)
+        return best / args.calls * 1e9
+
+    without = per_call(lambda: bare.query("1TP?"))
+    with_metrics = per_call(lambda: instrumented.query("1TP?"))
+    record = per_call(lambda: instrumented.metrics.record(hot, 0.001))
+    print(f"{'ESP300.query sem métricas':<36} {without:8.0f} ns/comando")
+    print(f"{'ESP300.query com métricas':<36} {with_metrics:8.0f} ns/comando")
+    print(f"{'sobrecarga':<36} {with_metrics - without:8.0f} ns/comando")
+    print(f"{'Metrics.record isolado':<36} {record:8.0f} ns")
+
+    started = time.perf_counter()
+    text = driverMetrics.prometheus_text([instrumented.metrics])
+    print(f"{'exposição Prometheus':<36} {(time.perf_counter() - started) * 1000:8.3f} ms ({len(text.splitlines())} linhas)")
+    instrumented.metrics.close()
+
+def bench_trace(args):
+    from busTracer import Tracer
+    from ioWorker import IOWorker
+    from transports import FakeTransport
+
+    # Custo por comando com o tracer desligado (o normal) e ligado, em memória
+    device = ESP300(FakeTransport(lambda line: "0"), 5)
+
+    def per_call():
+        best = float("inf")
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(args.calls):
+                device.query("1TP?")
+            best = min(best, time.perf_counter() - started)
+        return best / args.calls * 1e9
+
+    off = per_call()
+    device.trace(Tracer(capacity=1000))
+    on = per_call()
+    device.trace(None)
+    device.metrics.close()
+    print(f"{'ESP300.query, tracer desligado':<36} {off:8.0f} ns/comando")
+    print(f"{'ESP300.query, tracer ligado':<36} {on:8.0f} ns/comando")
+
+    # Sessão real no simulador: polling e movimento disputando a porta, gravada em JSON
+    with ESP300Simulator(latency=args.latency) as simulator:
+        device = ESP300(serial.Serial(simulator.port, baudrate=19200, timeout=1), 1)
+        worker = IOWorker(device)
+        tracer = Tracer()
+        device.trace(tracer)
+        worker.tracer = tracer
+        futures = [worker.submit("get_positions", (1, 2, 3), priority=2, coalesce=True) for _ in range(args.polls)]
+        futures.append(worker.submit("move_relative", "1", 0.1, False))
+        futures += [worker.submit("query", "1TP?", priority=2) for _ in range(args.polls)]
+        for future in futures:
+            future.result()
+        worker.close()
+        device.metrics.close()
+    count = tracer.dump(args.output)
+    print(f"{count} eventos gravados em {args.output}")
+
+def bench_interpolation(args):
+    from concurrent.futures import ThreadPoolExecutor
+    from ioWorker import IOWorker
+
+    # Movimento diagonal: três movimentos por eixo como na GUI (um por quadro, cada um com a sua
+    # espera) contra um movimento do grupo de interpolação com uma única espera
+    with ESP300Simulator(latency=args.latency, time_scale=args.time_scale) as simulator:
+        device = ESP300(serial.Serial(simulator.port, baudrate=19200, timeout=5), 5)
+        worker = IOWorker(device)
+        waiter = MotionWaiter(worker, time_scale=args.time_scale)
+        executor = ThreadPoolExecutor(max_workers=3)
+        axes = ("1", "2", "3")
+        waiter.define_group(axes)
+        sign = [1.0]
+
+        def skew():
+            # Diferença entre o primeiro e o último eixo, na partida e na chegada (ms do host)
+            starts = [simulator.host_time(state.start_time) for state in simulator.axes.values()]
+            ends = [simulator.host_time(state.start_time + state.duration) for state in simulator.axes.values()]
+            return (max(starts) - min(starts)) * 1000, (max(ends) - min(ends)) * 1000
+
+        def per_axis():
+            sign[0] = -sign[0]
+            futures = [executor.submit(waiter.move_to, axis, format(sign[0] * args.distance * factor, "g"))
+                       for axis, factor in zip(axes, (1.0, 0.6, 0.3))]
+            return all(future.result() for future in futures)
+
+        def grouped():
+            sign[0] = -sign[0]
+            return waiter.move_all({axis: sign[0] * args.distance * factor for axis, factor in zip(axes, (1.0, 0.6, 0.3))})
+
+        for name, move in (("3 movimentos por eixo (GUI)", per_axis), ("grupo de interpolação (HL)", grouped)):
+            skews = []
+
+            def timed():
+                if not move():
+                    raise TimeoutError(name)
+                skews.append(skew())
+
+            report(name, measure(timed, args.moves))
+            print(f"{'':<30} defasagem média na partida {statistics.mean(s[0] for s in skews):7.2f} ms, "
+                  f"na chegada {statistics.mean(s[1] for s in skews):7.2f} ms")
+        executor.shutdown()
+        worker.close()
+
+def bench_sequence(args):
+    import json
+    import os
+    import tempfile
+    import tracemalloc
+    from pymeasure.adapters import SerialAdapter
+    import esp300commands
+    from sequenceRunner import SequenceRunner, open_steps
+
+    # Rajadas de parâmetros e movimentos entre esperas, como numa varredura escrita à mão
+    steps = []
+    for index in range(args.blocks):
+        position = args.distance if index % 2 == 0 else 0.0
+        steps += [{"action": "velocity", "axis": axis, "value": 2.0} for axis in (1, 2, 3)]
+        steps += [{"action": "move", "axis": axis, "value": position} for axis in (1, 2, 3)]
+        steps += [{"action": "wait"}, {"action": "measure"}]
+    with ESP300Simulator(latency=args.latency, time_scale=args.time_scale) as simulator:
+        class Counting(esp300commands.ESP300):
+            lines = 0
+
+            def write(self, command, **kwargs):
+                self.lines += 1
+                super().write(command, **kwargs)
+
+        adapter = SerialAdapter(simulator.port, baudrate=19200, timeout=5, write_termination='\r', read_termination='\r\n')
+        device = Counting(adapter)
+        for name, pipeline in (("um comando por vez", False), ("comandos agrupados", True)):
+            device.lines = 0
+            summary = SequenceRunner(device, pipeline=pipeline).run(iter(steps))
+            print(f"{name:<30} {len(steps)} passos em {summary['elapsed'] * 1000:8.1f} ms, "
+                  f"{device.lines} linhas enviadas (com as consultas)")
+        adapter.close()
+
+    # Memória: sequência longa lida de uma vez (json.load) ou em fluxo
+    class Idle:
+        def write(self, command):
+            pass
+
+        def query_many(self, commands):
+            return ["1"] * len(commands)
+
+        def invalidate_cache(self, axis=None):
+            pass
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+        file.write("[\n")
+        for index in range(args.long_steps):
+            file.write(json.dumps({"action": "move", "axis": 1 + index % 3, "value": index % 100}) + ",\n")
+        file.write('{"action": "wait"}]\n')
+    try:
+        for name, load in (("json.load da lista inteira", lambda: iter(json.load(open(file.name)))),
+                           ("leitura em fluxo", lambda: open_steps(file.name))):
+            tracemalloc.start()
+            started = time.perf_counter()
+            SequenceRunner(Idle()).run(load())
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:<30} {args.long_steps} passos em {elapsed:6.2f} s, pico de memória {peak / 1e6:7.1f} MB")
+    finally:
+        os.unlink(file.name)
+
+def bench_server(args):
+    import json
+    import tempfile
+    import threading
+    from motionServer import MotionServer
+
+    # Teste de carga: muitos clientes lendo posições ao mesmo tempo pelo servidor local, com e sem
+    # o compartilhamento de leituras; e assinantes recebendo as posições empurradas pelo servidor
+    def run_server(server, path, ready, stop):
+        async def serve():
+            await server.start_unix(path)
+            ready.set()
+            while not stop.is_set():
+                await asyncio.sleep(0.05)
+            await server.close()
+        asyncio.run(serve())
+
+    async def client(path, requests, latencies):
+        reader, writer = await asyncio.open_unix_connection(path)
+        for index in range(requests):
+            # A maioria lê a mesma posição; um em cada quatro pede os três eixos
+            message = {"id": index, "method": "get_positions", "params": [[1, 2, 3]]} if index % 4 == 3 else \
+                      {"id": index, "method": "query", "params": [f"{1 + index % 3}TP?"]}
+            started = time.perf_counter()
+            writer.write(json.dumps(message).encode() + b"\n")
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - started)
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+        writer.close()
+
+    async def subscriber(path, duration, counts):
+        reader, writer = await asyncio.open_unix_connection(path)
+        writer.write(b'{"id": 1, "method": "subscribe"}\n')
+        received = 0
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            try:
+                line = await asyncio.wait_for(reader.readline(), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            if b'"positions"' in line:
+                received += 1
+        counts.append(received)
+        writer.close()
+
+    with ESP300Simulator(latency=args.latency) as simulator, tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "esp300.sock")
+        for name, coalesce in (("sem compartilhamento", False), ("com compartilhamento", True)):
+            device = ESP300(serial.Serial(simulator.port, baudrate=19200, timeout=5), 5)
+            server = MotionServer(device, rate=args.rate, coalesce=coalesce)
+            ready, stop = threading.Event(), threading.Event()
+            thread = threading.Thread(target=run_server, args=(server, path, ready, stop))
+            thread.start()
+            ready.wait()
+            latencies = []
+
+            async def load():
+                await asyncio.gather(*(client(path, args.requests, latencies) for _ in range(args.clients)))
+
+            started = time.perf_counter()
+            asyncio.run(load())
+            elapsed = time.perf_counter() - started
+            transactions = sum(values["count"] for values in device.metrics.snapshot()["commands"].values())
+            p50, p99 = percentiles(latencies)
+            print(f"{name:<22} {args.clients} clientes: {len(latencies) / elapsed:8.0f} pedidos/s, "
+                  f"p50={p50:7.2f} ms p99={p99:7.2f} ms, {transactions} transações no barramento")
+
+            if coalesce:
+                counts = []
+
+                async def subscribe():
+                    await asyncio.gather(*(subscriber(path, args.duration, counts) for _ in range(args.subscribers)))
+
+                before = transactions
+                asyncio.run(subscribe())
+                transactions = sum(values["count"] for values in device.metrics.snapshot()["commands"].values())
+                print(f"{'assinantes':<22} {args.subscribers} assinantes: {statistics.mean(counts) / args.duration:6.1f} "
+                      f"atualizações/s cada, {transactions - before} transações no barramento em {args.duration} s")
+            stop.set()
+            thread.join()
+            device.metrics.close()
+            device.transport.close()
+
+def bench_cache(args):
+    import threading
+
+    # Leituras de posição repetidas, como na sessão da GUI: vários leitores independentes (mostradores,
+    # telemetria, outro programa) consultando os mesmos eixos ao mesmo tempo
+    def transactions(device):
+        return sum(values["count"] for values in device.metrics.snapshot()["commands"].values())
+
+    def pollers(device, duration, interval):
+        stop = threading.Event()
+        reads = []
+
+        def poll(read):
+            count = 0
+            while not stop.is_set():
+                read()
+                count += 1
+                time.sleep(interval)
+            reads.append(count)
+
+        readers = [lambda: device.get_positions((1, 2, 3))] * args.pollers + \
+                  [lambda axis=axis: device.get_position(axis) for axis in (1, 2, 3)]
+        threads = [threading.Thread(target=poll, args=(read,)) for read in readers]
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return sum(reads)
+
+    with ESP300Simulator(latency=args.latency) as simulator:
+        device = ESP300(serial.Serial(simulator.port, baudrate=19200, timeout=5), 5)
+        for name, ttl, share in (("sem compartilhamento", 0.0, False), ("leituras em andamento", 0.0, True),
+                                 (f"cache de {args.ttl * 1000:g} ms", args.ttl, True)):
+            device.read_ttl, device.share_reads = ttl, share
+            before, hits, shared = transactions(device), device.metrics.cache_hits, device.metrics.shared_reads
+            reads = pollers(device, args.duration, args.interval)
+            bus = transactions(device) - before
+            print(f"{name:<24} {reads / args.duration:8.0f} leituras/s, {bus / args.duration:6.0f} transações/s "
+                  f"({device.metrics.cache_hits - hits} do cache, {device.metrics.shared_reads - shared} compartilhadas)")
+
+        # Uma escrita no eixo descarta a posição guardada: a leitura seguinte vai ao controlador
+        device.read_ttl = 60.0
+        device.write("1DH0")
+        first = device.get_position(1)
+        device.write("1DH5")
+        second = device.get_position(1)
+        device.write("2DH0")
+        hits = device.metrics.cache_hits
+        device.get_position(1)
+        print(f"{'invalidação':<24} 1TP? depois de 1DH0/1DH5: {first} -> {second}; "
+              f"escrita no eixo 2 manteve o eixo 1 no cache: {device.metrics.cache_hits - hits == 1}")
+        device.metrics.close()
+        device.transport.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do driver ESP300 contra o controlador simulado")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    latency = subparsers.add_parser("latency", help="Tempo de ida e volta por consulta")
+    latency.add_argument("--repetitions", type=int, default=200)
+    latency.add_argument("--legacy-repetitions", type=int, default=5)
+    latency.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    latency.set_defaults(function=bench_latency)
+
+    refresh = subparsers.add_parser("refresh", help="Atualização das posições dos 3 eixos")
+    refresh.add_argument("--repetitions", type=int, default=200)
+    refresh.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    refresh.set_defaults(function=bench_refresh)
+
+    asynchronous = subparsers.add_parser("async", help="Cliente asyncio contra o cliente bloqueante")
+    asynchronous.add_argument("--repetitions", type=int, default=200)
+    asynchronous.add_argument("--moves", type=int, default=5)
+    asynchronous.add_argument("--distance", type=float, default=0.5)
+    asynchronous.add_argument("--velocity", type=float, default=2.0)
+    asynchronous.add_argument("--interval", type=float, default=0.01, help="Intervalo entre consultas MD? (s)")
+    asynchronous.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    asynchronous.set_defaults(function=bench_async)
+
+    gui = subparsers.add_parser("gui", help="Latência do event loop Qt com 3 eixos em movimento e sendo consultados")
+    gui.add_argument("--duration", type=float, default=5.0)
+    gui.add_argument("--distance", type=float, default=1.0)
+    gui.add_argument("--velocity", type=float, default=1.0)
+    gui.add_argument("--poll-interval", type=int, default=50, help="Intervalo entre cliques simulados em ATUALIZAR POSIÇÃO (ms)")
+    gui.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    gui.set_defaults(function=bench_gui)
+
+    motion = subparsers.add_parser("motion", help="Atraso entre o fim do movimento e sua detecção")
+    motion.add_argument("--moves", type=int, default=20)
+    motion.add_argument("--legacy-moves", type=int, default=5)
+    motion.add_argument("--distance", type=float, default=2.0)
+    motion.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    motion.set_defaults(function=bench_motion)
+
+    telemetry = subparsers.add_parser("telemetry", help="Taxa máxima sustentável do amostrador de posições")
+    telemetry.add_argument("--duration", type=float, default=4.0)
+    telemetry.add_argument("--capacity", type=int, default=1000, help="Menor que o total de amostras, para exercitar a volta do buffer")
+    telemetry.add_argument("--port", help="Mede num ESP300 real por esta porta serial")
+    telemetry.add_argument("--gpib", help="Mede num ESP300 real por este recurso VISA, ex.: GPIB0::5::INSTR")
+    telemetry.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    telemetry.set_defaults(function=bench_telemetry)
+
+    scan = subparsers.add_parser("scan", help="Pontos por minuto do motor de varredura")
+    scan.add_argument("--points-per-axis", type=int, default=5)
+    scan.add_argument("--size", type=float, default=1.0)
+    scan.add_argument("--velocity", type=float, default=10.0)
+    scan.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    scan.set_defaults(function=bench_scan)
+
+    program = subparsers.add_parser("program", help="Sequência pelo host contra programa gravado no controlador")
+    program.add_argument("--steps", type=int, default=10)
+    program.add_argument("--repetitions", type=int, default=3)
+    program.add_argument("--distance", type=float, default=0.05)
+    program.add_argument("--velocity", type=float, default=2.0)
+    program.add_argument("--latency", type=float, default=0.002, help="Latência simulada do controlador (s)")
+    program.set_defaults(function=bench_program)
+
+    group = subparsers.add_parser("group", help="Vários controladores em paralelo")
+    group.add_argument("--units", type=int, default=3)
+    group.add_argument("--repetitions", type=int, default=50)
+    group.add_argument("--moves", type=int, default=4)
+    group.add_argument("--distance", type=float, default=0.5)
+    group.add_argument("--latency", type=float, default=0.02, help="Latência simulada de cada controlador (s)")
+    group.set_defaults(function=bench_group)
+
+    visa = subparsers.add_parser("visa", help="Custo de conexão e reconexão VISA com e sem o visaPool")
+    visa.add_argument("--repetitions", type=int, default=10)
+    visa.add_argument("--latency", type=float, default=0.002)
+    visa.set_defaults(function=bench_visa)
+
+    reconnect = subparsers.add_parser("reconnect", help="Recuperação do enlace depois de quedas simuladas")
+    reconnect.add_argument("--outages", type=float, nargs="+", default=[0.2, 1.0, 5.0], help="Durações das quedas (s)")
+    reconnect.add_argument("--timeout", type=float, default=0.5)
+    reconnect.add_argument("--repetitions", type=int, default=1000)
+    reconnect.add_argument("--latency", type=float, default=0.002)
+    reconnect.set_defaults(function=bench_reconnect)
+
+    discovery = subparsers.add_parser("discovery", help="Descoberta do ESP300 entre várias portas tty")
+    discovery.add_argument("--ports", type=int, default=16, help="Portas candidatas; só uma é um ESP300")
+    discovery.add_argument("--timeout", type=float, default=0.3)
+    discovery.add_argument("--repetitions", type=int, default=20)
+    discovery.add_argument("--latency", type=float, default=0.002)
+    discovery.set_defaults(function=bench_discovery)
+
+    framing = subparsers.add_parser("framing", help="Separação das respostas seriais em quadros num pty")
+    framing.add_argument("--frames", type=int, default=20000)
+    framing.add_argument("--allocation-frames", type=int, default=500)
+    framing.set_defaults(function=bench_framing)
+
+    overhead = subparsers.add_parser("overhead", help="Custo do host por comando, com transporte em memória")
+    overhead.add_argument("--calls", type=int, default=200000)
+    overhead.set_defaults(function=bench_overhead)
+
+    simulator = subparsers.add_parser("simulator", help="Varredura no simulador em tempo real e acelerado")
+    simulator.add_argument("--time-scale", type=float, default=50.0)
+    simulator.add_argument("--points-per-axis", type=int, default=4)
+    simulator.add_argument("--velocity", type=float, default=2.0)
+    simulator.set_defaults(function=bench_simulator)
+
+    suite = subparsers.add_parser("suite", help="Métricas principais dos dois drivers, em JSON, com comparação")
+    suite.add_argument("--output", help="Arquivo JSON para os resultados")
+    suite.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    suite.add_argument("--tolerance", type=float, default=0.15, help="Piora relativa tolerada antes de acusar regressão")
+    suite.add_argument("--min-delta", type=float, default=1.0, help="Diferença mínima (ms) para acusar regressão em tempos")
+    suite.add_argument("--repetitions", type=int, default=200)
+    suite.add_argument("--pipelined", type=int, default=240)
+    suite.add_argument("--moves", type=int, default=10)
+    suite.add_argument("--distance", type=float, default=1.0)
+    suite.add_argument("--outage", type=float, default=0.5, help="Duração da queda simulada do enlace (s)")
+    suite.add_argument("--gui-duration", type=float, default=2.0)
+    suite.add_argument("--time-scale", type=float, default=20.0)
+    suite.add_argument("--latency", type=float, default=0.002)
+    suite.add_argument("--skip-pymeasure", action="store_true", help="Não mede esp300commands (sem pymeasure)")
+    suite.set_defaults(function=bench_suite)
+
+    metrics = subparsers.add_parser("metrics", help="Sobrecarga das métricas do driver por comando")
+    metrics.add_argument("--calls", type=int, default=200000)
+    metrics.set_defaults(function=bench_metrics)
+
+    trace = subparsers.add_parser("trace", help="Custo do tracer do barramento e um trace de exemplo")
+    trace.add_argument("--calls", type=int, default=200000)
+    trace.add_argument("--polls", type=int, default=20)
+    trace.add_argument("--latency", type=float, default=0.002)
+    trace.add_argument("--output", default="trace_esp300.json")
+    trace.set_defaults(function=bench_trace)
+
+    interpolation = subparsers.add_parser("interpolation", help="Movimento diagonal: eixos separados contra grupo HL")
+    interpolation.add_argument("--moves", type=int, default=10)
+    interpolation.add_argument("--distance", type=float, default=2.0)
+    interpolation.add_argument("--time-scale", type=float, default=10.0)
+    interpolation.add_argument("--latency", type=float, default=0.002)
+    interpolation.set_defaults(function=bench_interpolation)
+
+    sequence = subparsers.add_parser("sequence", help="Execução de sequências: agrupamento de comandos e memória")
+    sequence.add_argument("--blocks", type=int, default=50)
+    sequence.add_argument("--distance", type=float, default=0.2)
+    sequence.add_argument("--long-steps", type=int, default=200000)
+    sequence.add_argument("--time-scale", type=float, default=50.0)
+    sequence.add_argument("--latency", type=float, default=0.002)
+    sequence.set_defaults(function=bench_sequence)
+
+    server = subparsers.add_parser("server", help="Teste de carga do servidor local com muitos clientes")
+    server.add_argument("--clients", type=int, default=50)
+    server.add_argument("--requests", type=int, default=100)
+    server.add_argument("--subscribers", type=int, default=50)
+    server.add_argument("--duration", type=float, default=2.0)
+    server.add_argument("--rate", type=float, default=20.0)
+    server.add_argument("--latency", type=float, default=0.002)
+    server.set_defaults(function=bench_server)
+
+    cache = subparsers.add_parser("cache", help="Leituras compartilhadas e cache curto de posições")
+    cache.add_argument("--pollers", type=int, default=4)
+    cache.add_argument("--interval", type=float, default=0.01)
+    cache.add_argument("--duration", type=float, default=3.0)
+    cache.add_argument("--ttl", type=float, default=0.05)
+    cache.add_argument("--latency", type=float, default=0.002)
+    cache.set_defaults(function=bench_cache)
+
+    args = parser.parse_args()
+    args.function(args)
+
+if __name__ == "__main__":
+    main()
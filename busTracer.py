@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import collections
+import json
+import os
+import threading
+import time
+
+# Linha do tempo das transações no barramento, no formato de trace do Chrome/Perfetto (abrir em
+# chrome://tracing ou ui.perfetto.dev). Opcional: driver, transportes e IOWorker só chamam o tracer
+# quando ele foi ligado (atributo tracer diferente de None), então desligado o custo é um teste de
+# atributo por comando. Os eventos ficam num buffer circular limitado; os mais antigos são descartados.
+#
+# Eventos de uma consulta serial: fila (espera no IOWorker), transação, escrita, espera do primeiro
+# byte, recepção até o quadro completo e conversão da resposta, cada um na thread que o executou.
+
+class Tracer:
+    def __init__(self, capacity=200000):
+        self.events = collections.deque(maxlen=capacity)
+        self.threads = {}  # id da thread -> nome, para os metadados do trace
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+
+    def now(self):
+        return time.perf_counter_ns()
+
+    def _tid(self):
+        tid = threading.get_ident()
+        if tid not in self.threads:
+            self.threads[tid] = threading.current_thread().name
+        return tid
+
+    def _us(self, instant):
+        return (instant - self.origin) / 1000
+
+    def complete(self, name, started, ended, category="esp300", args=None):
+        # Intervalo já medido (instantes de now()); deque.append é atômico, sem lock
+        self.events.append({"name": name, "cat": category, "ph": "X", "ts": self._us(started),
+                            "dur": (ended - started) / 1000, "pid": self.pid, "tid": self._tid(),
+                            "args": args or {}})
+
+    def instant(self, name, category="esp300", args=None):
+        self.events.append({"name": name, "cat": category, "ph": "i", "s": "t", "ts": self._us(self.now()),
+                            "pid": self.pid, "tid": self._tid(), "args": args or {}})
+
+    def flow(self, name, identifier, start, instant=None):
+        # Seta entre threads (ex.: do pedido enfileirado pela GUI até sua execução na thread de I/O)
+        event = {"name": name, "cat": "fluxo", "ph": "s" if start else "f", "id": identifier,
+                 "ts": self._us(self.now() if instant is None else instant), "pid": self.pid, "tid": self._tid()}
+        if not start:
+            event["bp"] = "e"  # Liga ao intervalo que contém o instante
+        self.events.append(event)
+
+    def clear(self):
+        self.events.clear()
+
+    def trace(self):
+        events = list(self.events)
+        metadata = [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                    for tid, name in list(self.threads.items())]
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+    def dump(self, path):
+        # Pode ser chamado com a sessão em andamento: grava uma cópia do que está no buffer
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.trace(), file)
+        os.replace(temporary, path)
+        return len(self.events)
@@ -1,65 +1,303 @@
 #!/usr/bin/env python3
 
+import os
 import sys
+import threading
 import time
 import pyvisa
 import serial
-from concurrent.futures import ThreadPoolExecutor
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QComboBox, QFrame
-from PyQt5.QtCore import Qt
+from concurrent.futures import Future, ThreadPoolExecutor
+from PyQt5.QtGui import QPixmap, QKeySequence
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QComboBox, QFrame, QShortcut
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from ioWorker import IOWorker, PRIORITY_POLL, PRIORITY_STOP
+from motionWait import MotionWaiter
+from telemetry import PositionSampler
+from telemetryRecorder import TelemetryRecorder
+import visaPool
+from findPorts import find_esp300
+from linkRecovery import LinkRecovery, is_link_error, usb_reset_for
+from esp300Protocol import READ_ONLY, parse_line, split_responses, format_number
+from transports import make_transport, encode, compile_lines
+import driverMetrics
+from busTracer import Tracer
+
+PROBE_TIMEOUT = 0.5  # Prazo da sonda VE usada para decidir se o enlace caiu (s)
+VERSION_BANNER = ("ESP300", "Version")  # Trechos da resposta ao VE, ex.: "ESP300 Version 3.08 09/09/02"
+PROBE_STALE_REPLIES = 4  # Respostas atrasadas descartadas pela sonda antes de desistir
+CACHED_READS = frozenset({"TP"})  # Leituras que podem ser reaproveitadas dentro de read_ttl
+
+def _copy(result):
+    # Cada leitor recebe a sua lista (query_numbers); textos são imutáveis
+    return list(result) if isinstance(result, list) else result
 
 class ESP300:
-    def __init__(self, adapter, timeout):
+    def __init__(self, adapter, timeout, usb_reset=None, name=None):
         self.adapter = adapter
         self.timeout = timeout
-        if isinstance(adapter, serial.Serial):
-            self.adapter.timeout = self.timeout
-        else:
-            self.adapter.timeout = self.timeout * 1000  # Converte segundos para milissegundos
         self.resource = adapter
-
-    def query(self, command):
+        # Escolhido uma vez na conexão: daqui em diante nenhuma chamada testa o tipo do adaptador
+        self.transport = make_transport(adapter, timeout)
+        self.link = LinkRecovery(self.transport.reopen, self._probe, usb_reset)
+        if name is None:
+            name = getattr(adapter, "port", None) or getattr(adapter, "resource_name", None) or "ESP300"
+        self.metrics = driverMetrics.Metrics(name, self.transport, self.link)
+        self.tracer = None  # Ver trace()
+        # Leituras compartilhadas: leitores da mesma consulta pura esperam a transação que já está em
+        # andamento em vez de fazer outra, e posições (CACHED_READS) lidas há menos de read_ttl segundos
+        # são reaproveitadas. Qualquer escrita num eixo, ou leitura de MD? dele, descarta o que foi guardado.
+        self.read_ttl = 0.0  # 0 desliga o reaproveitamento; o compartilhamento em andamento continua
+        self.share_reads = True
+        self._io_lock = threading.Lock()  # Uma transação (ou recuperação do enlace) por vez na porta
+        self._reads_lock = threading.Lock()
+        self._lines = {}  # bytes da linha -> (só leitura, guardável, eixos ou None para todos, eixos com MD?)
+        self._inflight = {}  # bytes -> (geração, função) da transação em andamento
+        self._waiting = {}  # bytes -> Future de quem espera a transação em andamento
+        self._cache = {}  # bytes -> (instante, resultado, eixos, função)
+        self._generation = 0  # Muda depois de cada escrita (sob _reads_lock): leitura iniciada antes não entra no cache
+
+    def query(self, command, timeout=None):
+        return self._transact(self.transport.query, encode(command), timeout)
+
+    def query_numbers(self, command, timeout=None):
+        # Resposta já convertida em números, um por consulta da linha; no serial não passa por str
+        return self._transact(self.transport.query_numbers, encode(command), timeout)
+
+    def _transact(self, function, data, timeout):
+        kind = self._lines.get(data)
+        if kind is None:
+            kind = self._classify(data)
+        if not kind[0]:
+            return self._exchange(function, data, timeout, kind)  # Consulta com efeito: vale como escrita
+        if kind[1] and self.read_ttl > 0:
+            return self._cached_read(function, data, timeout, kind)
+        result = self._shared_read(function, data, timeout)
+        if kind[3]:
+            # Fim de movimento só é visto pelo MD?: posições guardadas antes dele podem ser de meio do caminho
+            self._invalidate(kind[3])
+        return result
+
+    def _classify(self, data):
+        commands = parse_line(data.decode(errors='ignore'))
+        read_only = bool(commands) and all(query and mnemonic in READ_ONLY for _, mnemonic, query in commands)
+        cached = read_only and all(mnemonic in CACHED_READS for _, mnemonic, _ in commands)
+        # Comandos sem eixo (ST, WT) e de grupo (o número é do grupo, não do eixo) atingem todos os eixos
+        if any(axis == 0 or mnemonic.startswith('H') for axis, mnemonic, _ in commands):
+            axes = None
+        else:
+            axes = frozenset(axis for axis, _, _ in commands)
+        settling = frozenset(axis for axis, mnemonic, _ in commands if mnemonic == "MD")
+        if len(self._lines) > 4096:
+            self._lines.clear()  # Comandos digitados à mão não crescem o cache sem limite
+        kind = self._lines[data] = (read_only, cached, axes, settling)
+        return kind
+
+    def _cached_read(self, function, data, timeout, kind):
+        entry = self._cache.get(data)
+        if entry is not None and time.monotonic() - entry[0] <= self.read_ttl and entry[3] == function:
+            self.metrics.cache_hits += 1
+            return _copy(entry[1])
+        generation = self._generation
+        started = time.monotonic()
+        result = self._shared_read(function, data, timeout)
+        if result is not None:
+            with self._reads_lock:
+                if generation == self._generation:  # Nenhuma escrita durante a leitura
+                    self._cache[data] = (started, result, kind[2], function)
+        return result
+
+    def _shared_read(self, function, data, timeout):
+        if not self.share_reads:
+            return self._exchange(function, data, timeout)
+        # Sem concorrência o custo é só registrar a leitura em andamento; o Future é criado pelo
+        # primeiro leitor que chega para esperá-la (ver _join)
+        reading = (self._generation, function)
+        current = self._inflight.setdefault(data, reading)
+        if current is not reading:
+            return self._join(function, data, timeout, current)
+        result = None
         try:
-            if isinstance(self.resource, serial.Serial):
-                command = command if command.endswith('\r') else command + '\r'
-                self.resource.write(command.encode())
-                time.sleep(1)  # Atraso para permitir o processamento do comando
-                response = self.resource.read_until(b'\r\n').decode().strip()
-            else:
-                response = self.resource.query(command)
-            return response
-        except (pyvisa.errors.VisaIOError, serial.SerialException) as e:
-            print(f"Erro ao enviar comando: {e}")
-            self.reconnect()
-            return None
-        except Exception as e:
-            print(f"Erro inesperado: {e}")
-            self.reconnect()
-            return None
+            result = self._exchange(function, data, timeout)
+        finally:
+            del self._inflight[data]  # Antes de procurar quem espera: quem chegar depois já não a encontra
+            if self._waiting:
+                waiting = self._waiting.pop(data, None)
+                if waiting is not None:
+                    waiting.set_result(result)
+        return result
+
+    def _join(self, function, data, timeout, current):
+        if current[1] != function or current[0] != self._generation:
+            # Mesmos bytes lidos por query_numbers, ou leitura começada antes de uma escrita (ex.: TP?
+            # de antes do movimento): não serve para quem chegou depois
+            return self._exchange(function, data, timeout)
+        with self._reads_lock:
+            future = self._waiting.get(data)
+            if future is None:
+                future = self._waiting[data] = Future()
+        # Conferido depois de publicar o Future: se a leitura ainda está registrada, quem a lidera vai
+        # encontrá-lo ao terminar; senão pode já ter terminado sem vê-lo, e a leitura é feita de novo
+        if self._inflight.get(data) is not current:
+            return self._exchange(function, data, timeout)
+        self.metrics.shared_reads += 1
+        return _copy(future.result())
+
+    def _invalidate(self, axes):
+        # axes None: todos os eixos
+        with self._reads_lock:
+            self._generation += 1
+            if not self._cache:
+                return
+            if axes is None:
+                self._cache.clear()
+                return
+            for key in [key for key, entry in self._cache.items() if entry[2] is None or entry[2] & axes]:
+                del self._cache[key]
+
+    def _exchange(self, function, data, timeout, written=None):
+        # A meia abertura e a recuperação (reabertura, sonda VE) também usam a porta: ficam sob o mesmo lock.
+        # written: classificação de uma linha com efeito, cujos eixos são invalidados depois do envio
+        with self._io_lock:
+            try:
+                if not self.link.available():
+                    self.metrics.rejected += 1
+                    return None  # Disjuntor aberto: falha na hora, sem esperar o timeout
+                started = time.perf_counter_ns()
+                try:
+                    result = function(data, timeout)
+                except (pyvisa.errors.VisaIOError, pyvisa.errors.InvalidSession, serial.SerialException, OSError) as e:
+                    self._finish(data, started, e)
+                    print(f"Erro ao enviar comando: {e}")
+                    if is_link_error(e):
+                        self.link.recover()
+                    return None
+                except Exception as e:
+                    self._finish(data, started, e)
+                    print(f"Erro inesperado: {e}")
+                    return None
+            finally:
+                if written is not None:
+                    self._invalidate(written[2])
+        self._finish(data, started)
+        return result
+
+    def _finish(self, data, started, error=None):
+        ended = time.perf_counter_ns()
+        self.metrics.record(data, (ended - started) / 1e9, error)
+        tracer = self.tracer  # Lido uma vez: stop_trace() na thread da GUI pode desligá-lo no meio
+        if tracer is not None:
+            args = {"erro": str(error)} if error is not None else None
+            tracer.complete(data.decode(errors='ignore').strip(), started, ended, "transação", args)
+
+    def trace(self, tracer):
+        # Liga (busTracer.Tracer) ou desliga (None) a linha do tempo das transações
+        self.tracer = tracer
+        self.transport.tracer = tracer
 
     def write(self, command):
-        try:
-            if isinstance(self.resource, serial.Serial):
-                command = command if command.endswith('\r') else command + '\r'
-                self.resource.write(command.encode())
-            else:
-                self.resource.write(command)
-        except (pyvisa.errors.VisaIOError, serial.SerialException) as e:
-            print(f"Erro ao enviar comando: {e}")
-            self.reconnect()
+        self._send(encode(command))
 
-    def move_to(self, axis, position):
+    def _send(self, data):
+        with self._io_lock:
+            return self._send_locked(data)
+
+    def _send_locked(self, data):
+        # Chamado com _io_lock; retorna False se o comando não foi enviado
+        kind = self._lines.get(data)
+        if kind is None:
+            kind = self._classify(data)
+        try:
+            if not self.link.available():
+                self.metrics.rejected += 1
+                print(f"Enlace indisponível; comando {data.decode().strip()} não enviado.")
+                return False
+            started = time.perf_counter_ns()
+            try:
+                self.transport.write(data)
+            except (pyvisa.errors.VisaIOError, pyvisa.errors.InvalidSession, serial.SerialException, OSError) as e:
+                self._finish(data, started, e)
+                print(f"Erro ao enviar comando: {e}")
+                if is_link_error(e):
+                    self.link.recover()
+                return False
+        finally:
+            # Só depois do envio, ainda com a porta: uma leitura feita antes dele não fica no cache
+            # com a geração nova, e uma que ainda vai ser feita já vê o comando aplicado
+            self._invalidate(kind[2])
+        self._finish(data, started)
+        return True
+
+    def query_many(self, commands, timeout=None):
+        # Cada comando deve retornar um único valor; as respostas voltam na ordem dos comandos
+        results = []
+        for data, line in compile_lines(tuple(commands)):
+            results.extend(split_responses(self._transact(self.transport.query, data, timeout), line))
+        return results
+
+    def write_many(self, commands):
+        for data, line in compile_lines(tuple(commands)):
+            self._send(data)
+
+    def upload_program(self, number, commands):
+        # XX, EP, corpo e QP com a porta presa do começo ao fim: qualquer outra linha que chegasse entre
+        # EP e QP (polling, sonda VE) seria gravada no programa. Retorna False se algo não foi enviado
+        with self._io_lock:
+            lines = [encode(f"{number}XX"), encode(f"{number}EP")]
+            lines += [data for data, line in compile_lines(tuple(commands))]
+            lines.append(encode("QP"))
+            for data in lines:
+                if not self._send_locked(data):
+                    return False
+        return True
+
+    # Com wait=False não se envia WS, que travaria a fila de comandos do controlador para todos os
+    # eixos até o fim do movimento; a espera fica a cargo de motionWait.MotionWaiter
+    def move_to(self, axis, position, wait=True):
         self.write(f"{axis}PA{position}")
         print(f"Comando {axis}PA{position} enviado.")
-        self.write(f"{axis}WS")  # Comando para esperar até o motor parar
-        print(f"Comando {axis}WS enviado.")
+        if wait:
+            self.write(f"{axis}WS")  # Comando para esperar até o motor parar
+            print(f"Comando {axis}WS enviado.")
 
-    def move_relative(self, axis, increment):
+    def move_relative(self, axis, increment, wait=True):
         self.write(f"{axis}PR{increment}")
         print(f"Comando {axis}PR{increment} enviado.")
-        self.write(f"{axis}WS")  # Comando para esperar até o motor parar
-        print(f"Comando {axis}WS enviado.")
+        if wait:
+            self.write(f"{axis}WS")  # Comando para esperar até o motor parar
+            print(f"Comando {axis}WS enviado.")
+
+    # Grupo de interpolação linear do controlador: os eixos partem juntos e chegam juntos, com o perfil
+    # (velocidade, aceleração, desaceleração) aplicado ao longo da reta e não a cada eixo
+    def define_group(self, group, axes, velocity, acceleration, deceleration):
+        # HX apaga uma definição anterior do mesmo número (se não existir, o controlador só registra erro)
+        self.write_many([
+            f"{group}HX",
+            f"{group}HN{','.join(str(axis) for axis in axes)}",
+            f"{group}HV{format_number(velocity)}",
+            f"{group}HA{format_number(acceleration)}",
+            f"{group}HD{format_number(deceleration)}",
+            f"{group}HO",
+        ])
+        print(f"Grupo {group} definido com os eixos {', '.join(str(axis) for axis in axes)}.")
+
+    def move_group(self, group, positions, wait=True, profile=None):
+        # positions na ordem dos eixos do grupo; profile=(velocidade, aceleração, desaceleração) redefine
+        # o perfil da reta na mesma linha do HL. Com wait=False a espera fica com MotionWaiter.move_all
+        command = f"{group}HL{','.join(format_number(position) for position in positions)}"
+        if profile is None:
+            self.write(command)
+        else:
+            velocity, acceleration, deceleration = profile
+            self.write_many([f"{group}HV{format_number(velocity)}", f"{group}HA{format_number(acceleration)}",
+                             f"{group}HD{format_number(deceleration)}", command])
+        print(f"Comando {command} enviado.")
+        if wait:
+            self.write(f"{group}HW")  # Como WS, para a fila de comandos até o grupo parar
+            print(f"Comando {group}HW enviado.")
+
+    def stop_group(self, group):
+        self.write(f"{group}HS")
+        print(f"Comando {group}HS enviado.")
 
     def get_position(self, axis):
         response = self.query(f"{axis}TP?")
@@ -67,23 +305,74 @@ class ESP300:
             return response.strip()  # Remove espaços extras se houver
         return "Erro"
 
+    def stop(self, axis):
+        self.write(f"{axis}ST")
+        print(f"Comando {axis}ST enviado.")
+
+    def get_positions(self, axes=(1, 2, 3)):
+        # Lê a posição de todos os eixos numa única transação
+        responses = self.query_many([f"{axis}TP?" for axis in axes])
+        return {axis: response if response is not None else "Erro" for axis, response in zip(axes, responses)}
+
     def execute_command(self, command):
-        return self.query(command)
+        # Só consultas (terminadas em '?') têm resposta: esperar uma por 1PA10 prenderia a porta até o timeout
+        if command.rstrip().endswith('?'):
+            return self.query(command)
+        self.write(command)
+        return ""
 
     def reconnect(self):
-        print("Tentando reconectar...")
+        # Reconexão forçada: pula a sonda inicial e vai direto aos níveis de linkRecovery
+        with self._io_lock:
+            return self.link.recover(skip_probe=True)
+
+    def _probe(self):
+        # VE é a consulta mais barata do controlador; respostas atrasadas do comando que falhou
+        # são descartadas antes, para não serem confundidas com a resposta da sonda
+        self.transport.flush()
+        reply = self.transport.query(encode("VE"), PROBE_TIMEOUT)
+        for _ in range(PROBE_STALE_REPLIES):
+            if any(mark in reply for mark in VERSION_BANNER):
+                return True
+            # Resposta atrasada que chegou depois do flush: a do VE vem atrás dela. Aceitá-la
+            # deixaria cada resposta seguinte defasada de uma consulta
+            reply = self.transport.read(PROBE_TIMEOUT)
+        self.transport.flush()
+        return False
+
+def open_esp300(address, timeout=5, usb_hub=None):
+    # Portas seriais (/dev/ttyUSB0, COM3) abrem com pyserial; o resto é recurso VISA (GPIB0::5::INSTR).
+    # usb_hub=("1-1", 3) habilita o reinício do adaptador GPIB pela porta do hub (ver turnOnOffGPIP.sh)
+    if address.startswith("/dev/") or address.upper().startswith("COM"):
+        return ESP300(serial.Serial(address, baudrate=19200, timeout=timeout), timeout, usb_reset_for(address, usb_hub), address)
+    return ESP300(visaPool.open_resource(address, timeout), timeout, usb_reset_for(hub=usb_hub), address)
+
+class FutureBridge(QObject):
+    # Entrega na thread da GUI o future concluído em outra thread, via sinal Qt
+    finished = pyqtSignal(object, object)
+
+    def __init__(self):
+        super().__init__()
+        self.tracer = None  # busTracer.Tracer: marca a execução dos callbacks na thread da GUI
+        self.finished.connect(self._dispatch)
+
+    def watch(self, future, callback):
+        future.add_done_callback(lambda done: self._emit(callback, done))
+
+    def _emit(self, callback, future):
         try:
-            if isinstance(self.resource, serial.Serial):
-                self.resource.close()
-                time.sleep(2)
-                self.resource.open()
-            else:
-                self.resource.close()
-                time.sleep(5)
-                self.resource.open()
-            print("Reconexão realizada.")
-        except Exception as e:
-            print(f"Erro ao tentar reconectar: {e}")
+            self.finished.emit(callback, future)
+        except RuntimeError:
+            pass  # A janela já foi destruída; não há mais quem receber o resultado
+
+    def _dispatch(self, callback, future):
+        tracer = self.tracer  # O callback pode ser o próprio stop_trace
+        if tracer is None:
+            callback(future)
+            return
+        started = tracer.now()
+        callback(future)
+        tracer.complete(f"GUI {getattr(callback, '__name__', 'callback')}", started, tracer.now(), "gui")
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -139,6 +428,7 @@ class MainWindow(QMainWindow):
         self.connection_combo.setStyleSheet("background-color: white; ")
         self.connection_combo.addItem("Serial (/dev/ttyUSB0)")
         self.connection_combo.addItem("GPIB (GPIB0::5::INSTR)")
+        self.connection_combo.addItem("Automático (procurar ESP300)")
         self.general_layout.addWidget(self.connection_combo)
 
         self.connect_button = QPushButton("CONECTAR")
@@ -156,11 +446,25 @@ class MainWindow(QMainWindow):
         self.timeout_input.setStyleSheet("background-color: white;")
         self.general_layout.addWidget(self.timeout_input)
 
+        # Movimento conjunto: os eixos com posição absoluta preenchida partem e chegam juntos (grupo HL)
+        self.move_all_button = QPushButton("MOVER TODOS OS EIXOS")
+        self.move_all_button.setFixedHeight(25)
+        self.move_all_button.setFixedWidth(250)
+        self.move_all_button.setStyleSheet("background-color: gray;")
+        self.move_all_button.clicked.connect(self.move_all_axes)
+        self.general_layout.addWidget(self.move_all_button)
+
         self.connection_status_label = QLabel("Status da conexão: Não conectado") 
         self.connection_status_label.setStyleSheet("background-color: #DAA520") # Inicializa com status de não conectado
         self.connection_status_label.setAlignment(Qt.AlignHCenter)
         self.general_layout.addWidget(self.connection_status_label)
 
+        # Painel de estatísticas do driver (contagens e latências por comando, bytes, reconexões)
+        self.stats_label = QLabel("")
+        self.stats_label.setStyleSheet("font-family: monospace; font-size: 9px")
+        self.stats_label.setAlignment(Qt.AlignLeft)
+        self.general_layout.addWidget(self.stats_label)
+
         # Layout horizontal para os frames dos eixos
         self.axis_frame_layout = QHBoxLayout()
         self.layout.addLayout(self.axis_frame_layout)
@@ -170,9 +474,29 @@ class MainWindow(QMainWindow):
         self.create_axis_frame("EIXO 2", 2)
         self.create_axis_frame("EIXO 3", 3)
 
-        # Cria um executor para tarefas paralelas
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # Cria um executor para tarefas paralelas: conexão e uma espera de movimento por eixo
+        self.executor = ThreadPoolExecutor(max_workers=4)
         self.update_futures = {}
+        self.device = None
+        self.worker = None  # Única dona da porta; todo acesso ao dispositivo passa por ela
+        self.waiter = None
+        self.sampler = None
+        self.recorder = None
+        self.telemetry_dir = os.path.expanduser("~/esp300_telemetria")  # Histórico de posições das sessões
+        self.telemetry_rate = 2.0  # Amostras por segundo gravadas durante a sessão
+        self.read_ttl = 0.05  # Posições lidas há menos disso são reaproveitadas por mostradores e telemetria (s)
+        self.metrics_port = 9300  # Endpoint /metrics em 127.0.0.1; None desativa
+        self.metrics_server = None
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.refresh_stats)
+        # Linha do tempo do barramento: ESP300_TRACE=1 liga desde a conexão; Ctrl+T liga e, com o
+        # tracer ligado, grava o trace e desliga. Também é gravado ao fechar a conexão
+        self.tracer = None
+        self.trace_on_connect = bool(os.environ.get("ESP300_TRACE"))
+        QShortcut(QKeySequence("Ctrl+T"), self, activated=self.toggle_trace)
+        self.bridge = FutureBridge()
+        self.serial_port = "/dev/ttyUSB0"  # Alterar conforme necessário
+        self.gpib_resource = "GPIB0::5::INSTR"
 
     def create_axis_frame(self, title, axis_number):
         axis_frame = QFrame()
@@ -201,6 +525,7 @@ class MainWindow(QMainWindow):
         position_input.setStyleSheet("background-color: white; border: 1px solid black;")
         
         move_to_button = QPushButton("MOVIMENTO ABSOLUTO")
+        move_to_button.setObjectName(f"eixo{axis_number}_mov_absoluto_botao")
         move_to_button.setFixedWidth(position_input.width())
         move_to_button.setFixedHeight(25)
         move_to_button.clicked.connect(lambda: self.move_to_position(axis_number))
@@ -214,6 +539,7 @@ class MainWindow(QMainWindow):
         move_relative_input.setStyleSheet("background-color: white; border: 1px solid black;")
 
         move_relative_button = QPushButton("MOVIMENTO RELATIVO")
+        move_relative_button.setObjectName(f"eixo{axis_number}_mov_relativo_botao")
         move_relative_button.setFixedWidth(move_relative_input.width())
         move_relative_button.setFixedHeight(25)
         move_relative_button.clicked.connect(lambda: self.move_relative_position(axis_number))
@@ -227,17 +553,25 @@ class MainWindow(QMainWindow):
         send_command_input.setStyleSheet("background-color: white; border: 1px solid black;")
 
         send_command_button = QPushButton("ENVIAR COMANDO")
+        send_command_button.setObjectName(f"eixo{axis_number}_comando_botao")
         send_command_button.setFixedWidth(send_command_input.width())
         send_command_button.setFixedHeight(25)
         send_command_button.clicked.connect(lambda: self.send_command(axis_number))
         send_command_button.setStyleSheet("background-color: gray;")
 
         update_button = QPushButton("ATUALIZAR POSIÇÃO")
+        update_button.setObjectName(f"eixo{axis_number}_atualizar_botao")
         update_button.setFixedWidth(250)
         update_button.setFixedHeight(25)
         update_button.clicked.connect(lambda: self.update_position_label(axis_number))
         update_button.setStyleSheet("background-color: gray;")
 
+        stop_button = QPushButton("PARAR")
+        stop_button.setFixedWidth(250)
+        stop_button.setFixedHeight(25)
+        stop_button.clicked.connect(lambda: self.stop_axis(axis_number))
+        stop_button.setStyleSheet("background-color: #CD5C5C;")
+
         axis_layout.addSpacing(10)
         axis_layout.addWidget(current_position_display)
         axis_layout.addSpacing(10)
@@ -251,56 +585,245 @@ class MainWindow(QMainWindow):
         axis_layout.addWidget(send_command_button)
         axis_layout.addSpacing(25)
         axis_layout.addWidget(update_button)
+        axis_layout.addWidget(stop_button)
 
     def connect_to_device(self):
         connection_method = self.connection_combo.currentText()
         timeout = int(self.timeout_input.text()) if self.timeout_input.text().isdigit() else 5
 
+        self.set_pending(self.connect_button, True)
+        self.connection_status_label.setText("Status da conexão: Conectando...")
+        future = self.executor.submit(self.open_device, connection_method, timeout)
+        self.bridge.watch(future, self.on_device_opened)
+
+    def open_device(self, connection_method, timeout):
+        # Roda fora da thread da GUI: abrir a porta e carregar o backend VISA pode demorar
         if connection_method.startswith("Serial"):
-            port = "/dev/ttyUSB0"  # Alterar conforme necessário
-            self.serial_connection = serial.Serial(port, baudrate=19200, timeout=timeout)
-            self.device = ESP300(self.serial_connection, timeout)
-        else:
-            rm = pyvisa.ResourceManager()
-            self.gpib_connection = rm.open_resource("GPIB0::5::INSTR")
-            self.device = ESP300(self.gpib_connection, timeout)
+            return open_esp300(self.serial_port, timeout)
+        if connection_method.startswith("Automático"):
+            # Porta do cache de findPorts quando o adaptador é conhecido; senão sonda todas em paralelo
+            address = find_esp300()
+            if address is None:
+                raise RuntimeError("Nenhum ESP300 encontrado")
+            print(f"ESP300 encontrado em {address}.")
+            return open_esp300(address, timeout)
+        return open_esp300(self.gpib_resource, timeout)
+
+    def on_device_opened(self, future):
+        self.set_pending(self.connect_button, False)
+        if future.exception() is not None:
+            self.connection_status_label.setText(f"Status da conexão: Erro ao conectar: {future.exception()}")
+            self.connection_status_label.setStyleSheet("background-color: #DAA520")
+            return
+
+        self.close_device()
+        self.device = future.result()
+        self.device.read_ttl = self.read_ttl
+        self.worker = IOWorker(self.device)
+        self.waiter = MotionWaiter(self.worker)
+        self.start_recording()
+        self.start_metrics()
+        if self.trace_on_connect:
+            self.start_trace()
 
         self.connection_status_label.setText("Status da conexão: Conectado")
         self.connection_status_label.setStyleSheet("background-color: #32CD32")  # Verde para conectado
 
+    def start_recording(self):
+        try:
+            os.makedirs(self.telemetry_dir, exist_ok=True)
+            self.sampler = PositionSampler(self.worker, rate=self.telemetry_rate, capacity=10000, velocity=True)
+            path = os.path.join(self.telemetry_dir, time.strftime("sessao_%Y%m%d_%H%M%S.esp300rec"))
+            self.recorder = TelemetryRecorder(path, self.sampler.buffer.columns)
+            self.sampler.sinks.append(self.recorder.append)
+            self.sampler.start()
+        except OSError as e:
+            print(f"Erro ao iniciar a gravação de telemetria: {e}")
+            self.sampler = None
+            self.recorder = None
+
+    def start_metrics(self):
+        if self.metrics_server is None and self.metrics_port is not None:
+            try:
+                self.metrics_server = driverMetrics.serve(self.metrics_port)
+            except OSError as e:
+                print(f"Erro ao abrir o endpoint de métricas na porta {self.metrics_port}: {e}")
+        self.stats_timer.start(1000)
+
+    def refresh_stats(self):
+        # Só formata texto; os contadores são lidos sem passar pela fila de I/O
+        if self.device is None:
+            return
+        self.stats_label.setText(self.device.metrics.summary())
+        try:
+            driverMetrics.write_prometheus(os.path.join(self.telemetry_dir, "esp300.prom"))
+        except OSError as e:
+            print(f"Erro ao gravar as métricas: {e}")
+            self.stats_timer.stop()
+
+    def start_trace(self):
+        self.tracer = Tracer()
+        self.device.trace(self.tracer)
+        self.worker.tracer = self.tracer
+        self.bridge.tracer = self.tracer
+        print("Linha do tempo do barramento ligada.")
+
+    def stop_trace(self):
+        tracer, self.tracer = self.tracer, None
+        self.device.trace(None)
+        self.worker.tracer = None
+        self.bridge.tracer = None
+        path = os.path.join(self.telemetry_dir, time.strftime("trace_%Y%m%d_%H%M%S.json"))
+        try:
+            os.makedirs(self.telemetry_dir, exist_ok=True)
+            count = tracer.dump(path)
+            print(f"Linha do tempo gravada em {path} ({count} eventos); abrir em ui.perfetto.dev")
+        except OSError as e:
+            print(f"Erro ao gravar a linha do tempo: {e}")
+
+    def toggle_trace(self):
+        if self.device is None:
+            return
+        if self.tracer is None:
+            self.start_trace()
+        else:
+            self.stop_trace()
+
+    def close_device(self):
+        self.stats_timer.stop()
+        if self.tracer is not None:
+            self.stop_trace()
+        if self.sampler is not None:
+            self.sampler.stop()
+            self.sampler = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.worker is not None:
+            self.worker.close()
+        if self.device is not None:
+            # Depois da thread de I/O: a porta serial (ou o recurso VISA) é liberada a cada reconexão
+            self.device.metrics.close()
+            try:
+                self.device.transport.close()
+            except Exception as e:
+                print(f"Erro ao fechar a conexão: {e}")
+            self.device = None
+
+    def set_pending(self, button, pending):
+        # Enquanto a operação está em andamento o botão fica desabilitado e sinaliza a espera
+        if pending and button.isEnabled():
+            button.setProperty("texto_original", button.text())
+            button.setText("AGUARDANDO...")
+        elif button.property("texto_original"):
+            button.setText(button.property("texto_original"))
+        button.setEnabled(not pending)
+
+    def position_label(self, axis_number):
+        return self.findChild(QLabel, f"eixo{axis_number}_posicao_atual")
+
+    def submit(self, button, callback, method, *args, **kwargs):
+        if self.worker is None:
+            self.connection_status_label.setText("Status da conexão: Não conectado")
+            return
+        if not button.isEnabled():
+            return  # Já existe uma operação em andamento para este botão
+        self.set_pending(button, True)
+        future = self.worker.submit(method, *args, **kwargs)
+        self.bridge.watch(future, callback)
+
     def move_to_position(self, axis_number):
         position = self.findChild(QLineEdit, f"eixo{axis_number}_posicao_input").text()
         if position:
-            self.device.move_to(f"{axis_number}", position)
-            self.check_motor_status(axis_number)
+            button = self.findChild(QPushButton, f"eixo{axis_number}_mov_absoluto_botao")
+            self.check_motor_status(axis_number, button, lambda: self.waiter.move_to(f"{axis_number}", position))
 
     def move_relative_position(self, axis_number):
         increment = self.findChild(QLineEdit, f"eixo{axis_number}_mov_relativo_input").text()
         if increment:
-            self.device.move_relative(f"{axis_number}", increment)
-            self.check_motor_status(axis_number)
+            button = self.findChild(QPushButton, f"eixo{axis_number}_mov_relativo_botao")
+            self.check_motor_status(axis_number, button, lambda: self.waiter.move_relative(f"{axis_number}", increment))
+
+    def move_all_axes(self):
+        targets = {}
+        for axis_number in (1, 2, 3):
+            position = self.findChild(QLineEdit, f"eixo{axis_number}_posicao_input").text()
+            if position:
+                targets[f"{axis_number}"] = position
+        if not targets or self.worker is None or not self.move_all_button.isEnabled():
+            return
+        self.set_pending(self.move_all_button, True)
+
+        def move():
+            # Um eixo só não precisa de grupo
+            done = self.waiter.move_all(targets) if len(targets) > 1 else self.waiter.move_to(*next(iter(targets.items())))
+            if not done:
+                raise TimeoutError(f"Eixos {', '.join(targets)} não confirmaram o fim do movimento")
+            return self.worker.get_positions(tuple(targets))
+
+        future = self.executor.submit(move)
+        self.bridge.watch(future, lambda done: self.on_positions(targets, done))
+
+    def on_positions(self, targets, future):
+        self.set_pending(self.move_all_button, False)
+        for axis in targets:
+            if future.exception() is not None:
+                self.position_label(axis).setText(f"Erro: {future.exception()}")
+            else:
+                self.position_label(axis).setText(f"POSIÇÃO ATUAL: {future.result()[axis]}")
 
     def send_command(self, axis_number):
         command = self.findChild(QLineEdit, f"eixo{axis_number}_comando_input").text()
         if command:
-            response = self.device.execute_command(command)
-            self.findChild(QLabel, f"eixo{axis_number}_posicao_atual").setText(f"Resposta do comando: {response}")
+            button = self.findChild(QPushButton, f"eixo{axis_number}_comando_botao")
+            self.submit(button, lambda future: self.on_command_response(axis_number, button, future), "execute_command", command)
+
+    def on_command_response(self, axis_number, button, future):
+        self.set_pending(button, False)
+        self.waiter.invalidate()  # O comando pode ter alterado VA, AC ou AG
+        if future.exception() is not None:
+            self.position_label(axis_number).setText(f"Erro: {future.exception()}")
+        else:
+            self.position_label(axis_number).setText(f"Resposta do comando: {future.result()}")
+
+    def check_motor_status(self, axis_number, button, move):
+        # Envia o movimento e espera o fim previsto pelo modelo trapezoidal, fora da thread da GUI
+        if self.worker is None or not button.isEnabled():
+            return
+        self.set_pending(button, True)
 
-    def check_motor_status(self, axis_number):
         def check_status():
-            while True:
-                status = self.device.query(f"{axis_number}MD")
-                if status == "1":
-                    self.update_position_label(axis_number)
-                    break
-                time.sleep(1)
+            if not move():
+                raise TimeoutError(f"Eixo {axis_number} não confirmou o fim do movimento")
+            return self.worker.get_position(f"{axis_number}")
 
         future = self.executor.submit(check_status)
         self.update_futures[axis_number] = future
+        self.bridge.watch(future, lambda done: self.on_position(axis_number, button, done))
+
+    def stop_axis(self, axis_number):
+        if self.worker is not None:
+            self.worker.submit("stop", f"{axis_number}", priority=PRIORITY_STOP)
 
     def update_position_label(self, axis_number):
-        position = self.device.get_position(f"{axis_number}")
-        self.findChild(QLabel, f"eixo{axis_number}_posicao_atual").setText(f"POSIÇÃO ATUAL: {position}")
+        button = self.findChild(QPushButton, f"eixo{axis_number}_atualizar_botao")
+        self.submit(button, lambda future: self.on_position(axis_number, button, future),
+                    "get_position", f"{axis_number}", priority=PRIORITY_POLL, coalesce=True)
+
+    def on_position(self, axis_number, button, future):
+        if button is not None:
+            self.set_pending(button, False)
+        if future.exception() is not None:
+            self.position_label(axis_number).setText(f"Erro: {future.exception()}")
+        else:
+            self.position_label(axis_number).setText(f"POSIÇÃO ATUAL: {future.result()}")
+
+    def closeEvent(self, event):
+        self.close_device()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from controleESP300 import open_esp300
+from ioWorker import IOWorker, PRIORITY_POLL, PRIORITY_STOP
+from motionWait import MotionWaiter
+
+# Vários ESP300, cada um no seu enlace serial ou GPIB. Cada enlace tem a sua thread de I/O, então as
+# operações em grupo rodam em paralelo e a latência total é a do enlace mais lento, não a soma.
+
+def release(device):
+    # Libera a porta serial ou o recurso VISA e tira as métricas do registro do processo
+    device.metrics.close()
+    device.transport.close()
+
+class ControllerGroup:
+    def __init__(self, devices):
+        # devices: nome -> driver já aberto (ESP300 ou compatível); o grupo passa a ser dono deles e os fecha em close()
+        self.workers = {name: IOWorker(device) for name, device in devices.items()}
+        self.waiters = {name: MotionWaiter(worker) for name, worker in self.workers.items()}
+        # Esperas bloqueantes (barreira) rodam em paralelo, uma por controlador
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self.workers), 1))
+
+    @classmethod
+    def open(cls, addresses, timeout=5):
+        # addresses: nome -> endereço, ex.: {"mesa": "/dev/ttyUSB0", "fonte": "GPIB0::5::INSTR"}
+        with ThreadPoolExecutor(max_workers=max(len(addresses), 1)) as executor:
+            futures = {name: executor.submit(open_esp300, address, timeout) for name, address in addresses.items()}
+        devices = {name: future.result() for name, future in futures.items() if future.exception() is None}
+        errors = [(name, future.exception()) for name, future in futures.items() if future.exception() is not None]
+        if errors:
+            # Se um controlador falha, os que abriram liberam as portas antes de o erro subir
+            for name, error in errors:
+                print(f"Erro ao abrir o controlador {name}: {error}")
+            for device in devices.values():
+                release(device)
+            raise errors[0][1]
+        return cls(devices)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for worker in self.workers.values():
+            worker.close()
+            release(worker.device)
+        self._executor.shutdown()
+
+    def _gather(self, futures):
+        # Espera todos; um erro num controlador não impede de coletar os demais
+        wait(list(futures.values()))
+        results = {}
+        for name, future in futures.items():
+            if future.exception() is not None:
+                print(f"Erro no controlador {name}: {future.exception()}")
+                results[name] = None
+            else:
+                results[name] = future.result()
+        return results
+
+    def positions(self, axes=(1, 2, 3)):
+        # Foto das posições de todos os controladores, lidas em paralelo
+        futures = {name: worker.submit("get_positions", tuple(axes), priority=PRIORITY_POLL, coalesce=True)
+                   for name, worker in self.workers.items()}
+        return self._gather(futures)
+
+    def move(self, targets):
+        # targets: nome -> {eixo: posição}; um único write_many por controlador, todos ao mesmo tempo
+        futures = {name: self.workers[name].submit("write_many", [f"{axis}PA{position}" for axis, position in moves.items()])
+                   for name, moves in targets.items()}
+        return self._gather(futures)
+
+    def wait_all(self, distances, timeout=None):
+        # Barreira: retorna quando todos os controladores confirmarem o fim do movimento.
+        # distances: nome -> {eixo: distância}, usada pelo modelo de tempo de cada eixo
+        futures = {name: self._executor.submit(self.waiters[name].wait_many, moves, None, timeout)
+                   for name, moves in distances.items()}
+        results = self._gather(futures)
+        return all(results.values())
+
+    def move_and_wait(self, targets, timeout=None):
+        start = self.positions({axis for moves in targets.values() for axis in moves})
+        self.move(targets)
+        distances = {}
+        for name, moves in targets.items():
+            current = start.get(name) or {}
+            distances[name] = {}
+            for axis, position in moves.items():
+                try:
+                    distances[name][axis] = float(position) - float(current.get(axis))
+                except (TypeError, ValueError):
+                    distances[name][axis] = 0.0  # Posição desconhecida: só consulta MD?
+        return self.wait_all(distances, timeout)
+
+    def stop(self):
+        # ST sem número de eixo para todos os eixos do controlador
+        futures = {name: worker.submit("write", "ST", priority=PRIORITY_STOP) for name, worker in self.workers.items()}
+        return self._gather(futures)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pyvisa
+import serial
+
+# Instrumentação do caminho de I/O do driver: contadores e histograma de latência por comando,
+# timeouts e erros, bytes enviados/recebidos (contados pelos transportes) e reconexões (de
+# linkRecovery). O registro de cada comando custa um lookup num dicionário e alguns incrementos;
+# a formatação (Prometheus, painel da GUI) só acontece quando alguém lê.
+
+BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)  # Segundos
+
+registry = []  # Métricas de todos os dispositivos abertos no processo
+_registry_lock = threading.Lock()
+
+def command_key(data):
+    # b"1TP?;2TP?\r" -> "TP;TP": os mnemônicos da linha, sem eixos nem argumentos
+    mnemonics = []
+    for command in data.decode(errors='ignore').rstrip('\r').split(';'):
+        command = command.strip().lstrip('0123456789')
+        mnemonics.append(command[:2].upper() or "?")
+    return ';'.join(mnemonics)
+
+def is_timeout(error):
+    if isinstance(error, serial.SerialTimeoutException):
+        return True
+    return isinstance(error, pyvisa.errors.VisaIOError) and error.error_code == pyvisa.constants.StatusCode.error_timeout
+
+class Series:
+    __slots__ = ("count", "errors", "timeouts", "total", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.total = 0.0  # Soma das latências (s)
+        self.buckets = [0] * (len(BUCKETS) + 1)  # Último: acima do maior limite
+
+    def quantile(self, fraction):
+        # Estimativa pelo limite superior do bucket, como histogram_quantile sem interpolação
+        if self.count == 0:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return BUCKETS[index] if index < len(BUCKETS) else float("inf")
+        return float("inf")
+
+class Metrics:
+    def __init__(self, name, transport=None, link=None):
+        self.name = name  # Rótulo do dispositivo, ex.: a porta ou o recurso VISA
+        self.transport = transport  # Fonte dos bytes enviados/recebidos
+        self.link = link  # Fonte das reconexões
+        self.series = {}  # chave do comando -> Series
+        self.rejected = 0  # Chamadas recusadas com o disjuntor aberto
+        self.cache_hits = 0  # Leituras atendidas pelo cache de posições, sem transação
+        self.shared_reads = 0  # Leituras que esperaram uma transação idêntica já em andamento
+        self._series = {}  # bytes da linha -> Series (os bytes vêm do cache de transports.encode)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            registry.append(self)
+
+    def close(self):
+        with _registry_lock:
+            if self in registry:
+                registry.remove(self)
+
+    def record(self, data, elapsed, error=None):
+        series = self._series.get(data)
+        if series is None:
+            series = self._series_for(data)
+        with self._lock:
+            series.count += 1
+            series.total += elapsed
+            series.buckets[bisect.bisect_left(BUCKETS, elapsed)] += 1
+            if error is not None:
+                series.errors += 1
+                if is_timeout(error):
+                    series.timeouts += 1
+
+    def _series_for(self, data):
+        # Primeira vez destes bytes: linhas diferentes com os mesmos mnemônicos somam na mesma série
+        key = command_key(data)
+        with self._lock:
+            if len(self._series) > 4096:
+                self._series.clear()  # Comandos digitados à mão não crescem o cache sem limite
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = Series()
+            self._series[data] = series
+        return series
+
+    def snapshot(self):
+        with self._lock:
+            commands = {key: {
+                "count": series.count,
+                "errors": series.errors,
+                "timeouts": series.timeouts,
+                "seconds": series.total,
+                "buckets": list(series.buckets),
+                "p50": series.quantile(0.5),
+                "p99": series.quantile(0.99),
+            } for key, series in self.series.items()}
+        recoveries = list(self.link.recoveries) if self.link is not None else []
+        return {
+            "device": self.name,
+            "commands": commands,
+            "bytes_sent": getattr(self.transport, "sent", 0),
+            "bytes_received": getattr(self.transport, "received", 0),
+            "rejected": self.rejected,
+            "cache_hits": self.cache_hits,
+            "shared_reads": self.shared_reads,
+            "reconnects": sum(1 for _, _, success in recoveries if success),
+            "failed_recoveries": sum(1 for _, _, success in recoveries if not success),
+            "reconnect_attempts": getattr(self.link, "attempts", 0),
+            "link_state": getattr(self.link, "state", None),
+        }
+
+    def summary(self):
+        # Texto curto para o painel da GUI
+        snapshot = self.snapshot()
+        lines = [f"{'comando':<12}{'n':>7}{'erros':>7}{'p50 ms':>9}{'p99 ms':>9}"]
+        for key, values in sorted(snapshot["commands"].items(), key=lambda item: -item[1]["count"])[:8]:
+            p50 = "-" if values["p50"] is None else f"{values['p50'] * 1000:g}"
+            p99 = "-" if values["p99"] is None else f"{values['p99'] * 1000:g}"
+            lines.append(f"{key[:12]:<12}{values['count']:>7}{values['errors']:>7}{p50:>9}{p99:>9}")
+        lines.append(f"bytes: {snapshot['bytes_sent']} enviados, {snapshot['bytes_received']} recebidos")
+        lines.append(f"leituras reaproveitadas: {snapshot['cache_hits']} do cache, {snapshot['shared_reads']} em andamento")
+        lines.append(f"reconexões: {snapshot['reconnects']} (tentativas: {snapshot['reconnect_attempts']}), enlace {snapshot['link_state']}")
+        return "\n".join(lines)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prometheus_text(sources=None):
+    # Formato texto do Prometheus para todos os dispositivos registrados
+    sources = list(registry) if sources is None else sources
+    snapshots = [source.snapshot() for source in sources]
+    lines = [
+        "# HELP esp300_command_seconds Latência dos comandos enviados ao ESP300.",
+        "# TYPE esp300_command_seconds histogram",
+    ]
+    for snapshot in snapshots:
+        device = _escape(snapshot["device"])
+        for key, values in sorted(snapshot["commands"].items()):
+            labels = f'device="{device}",command="{_escape(key)}"'
+            cumulative = 0
+            for limit, count in zip(BUCKETS + ("+Inf",), values["buckets"]):
+                cumulative += count
+                lines.append(f'esp300_command_seconds_bucket{{{labels},le="{limit}"}} {cumulative}')
+            lines.append(f"esp300_command_seconds_sum{{{labels}}} {values['seconds']}")
+            lines.append(f"esp300_command_seconds_count{{{labels}}} {values['count']}")
+    counters = (
+        ("esp300_command_errors_total", "Comandos que terminaram em erro.", "errors"),
+        ("esp300_command_timeouts_total", "Comandos sem resposta no prazo.", "timeouts"),
+    )
+    for metric, description, field in counters:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+        for snapshot in snapshots:
+            for key, values in sorted(snapshot["commands"].items()):
+                lines.append(f'{metric}{{device="{_escape(snapshot["device"])}",command="{_escape(key)}"}} {values[field]}')
+    totals = (
+        ("esp300_bytes_sent_total", "Bytes enviados ao controlador.", "bytes_sent"),
+        ("esp300_bytes_received_total", "Bytes recebidos do controlador.", "bytes_received"),
+        ("esp300_rejected_total", "Chamadas recusadas com o enlace fora (disjuntor aberto).", "rejected"),
+        ("esp300_cache_hits_total", "Leituras atendidas pelo cache de posições.", "cache_hits"),
+        ("esp300_shared_reads_total", "Leituras que aproveitaram uma transação idêntica em andamento.", "shared_reads"),
+        ("esp300_reconnects_total", "Reconexões bem-sucedidas.", "reconnects"),
+        ("esp300_failed_recoveries_total", "Recuperações que terminaram com o disjuntor aberto.", "failed_recoveries"),
+        ("esp300_reconnect_attempts_total", "Tentativas de reabrir a porta.", "reconnect_attempts"),
+    )
+    for metric, description, field in totals:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+        for snapshot in snapshots:
+            lines.append(f'{metric}{{device="{_escape(snapshot["device"])}"}} {snapshot[field]}')
+    lines += ["# HELP esp300_link_up 1 se o enlace está fechado (normal).", "# TYPE esp300_link_up gauge"]
+    for snapshot in snapshots:
+        up = 1 if snapshot["link_state"] in (None, "fechado") else 0
+        lines.append(f'esp300_link_up{{device="{_escape(snapshot["device"])}"}} {up}')
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path, sources=None):
+    # Para o textfile collector do node_exporter: escreve ao lado e renomeia (atômico)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w") as file:
+        file.write(prometheus_text(sources))
+    os.replace(temporary, path)
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Sem uma linha no terminal a cada coleta
+
+def serve(port=9300, host="127.0.0.1"):
+    # Endpoint /metrics só na máquina local, numa thread daemon; retorna o servidor (shutdown() para parar)
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="ESP300-métricas", daemon=True).start()
+    return server
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import functools
+
+# Regras de linha do protocolo do ESP300 (terminadores, agrupamento de comandos com ';'),
+# sem dependência de GUI nem de transporte, para uso também em scripts sem display
+
+TERMINATOR = b'\r\n'  # Terminador das respostas do ESP300
+COMMAND_SEPARATOR = ';'  # Separa vários comandos numa mesma linha
+RESPONSE_SEPARATOR = ','  # Separa as respostas de várias consultas numa mesma linha
+MAX_LINE_LENGTH = 80  # Tamanho do buffer de entrada do ESP300 por linha, incluindo o \r
+# Consultas sem efeito colateral: a mesma leitura pode ser entregue a vários leitores
+READ_ONLY = frozenset({"TP", "TV", "MD", "VA", "AC", "AG", "MO", "VE", "HP", "HV", "HA", "HD"})
+# Consultas cuja resposta tem mais de um valor separado por ',' (um por eixo do grupo, código e texto do erro)
+MULTI_VALUE = frozenset({"HP", "TB", "ID"})
+
+def pack_commands(commands, max_length=MAX_LINE_LENGTH):
+    # Agrupa os comandos no menor número de linhas que cabem no buffer de entrada
+    lines = []
+    current = []
+    length = 1  # \r final
+    for command in commands:
+        command = command.rstrip('\r')
+        added = len(command) + (len(COMMAND_SEPARATOR) if current else 0)
+        if current and length + added > max_length:
+            lines.append(current)
+            current = []
+            length = 1
+            added = len(command)
+        current.append(command)
+        length += added
+    if current:
+        lines.append(current)
+    return lines
+
+def parse_line(line):
+    # "1TP?;2PA5" -> [(1, "TP", True), (2, "PA", False)]: eixo (0 quando não há), mnemônico e se é consulta
+    commands = []
+    for command in line.rstrip('\r').split(COMMAND_SEPARATOR):
+        command = command.strip()
+        if not command:
+            continue
+        digits = len(command) - len(command.lstrip('0123456789'))
+        commands.append((int(command[:digits] or 0), command[digits:digits + 2].upper(), command.endswith('?')))
+    return commands
+
+def is_read_only(line):
+    commands = parse_line(line)
+    return bool(commands) and all(query and mnemonic in READ_ONLY for _, mnemonic, query in commands)
+
+@functools.lru_cache(maxsize=1024)
+def is_single_value(line):
+    # Uma só consulta com um só valor na resposta: pode dividir uma linha com outras (query_many)
+    commands = parse_line(line)
+    return len(commands) == 1 and commands[0][2] and commands[0][1] not in MULTI_VALUE
+
+def split_responses(response, line):
+    # Separa a resposta de uma linha com várias consultas; None para cada comando se não bater
+    values = response.split(RESPONSE_SEPARATOR) if response is not None else []
+    if len(values) != len(line):
+        if response is not None:
+            print(f"Resposta inesperada para {COMMAND_SEPARATOR.join(line)}: {response}")
+        return [None] * len(line)
+    return [value.strip() for value in values]
+
+def format_number(value):
+    # Número em ponto fixo sem zeros supérfluos, ex.: 1.5 -> "1.5", 2.0 -> "2"
+    text = f"{float(value):.6f}".rstrip('0').rstrip('.')
+    return "0" if text == "-0" else text
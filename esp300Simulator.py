@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+
+import os
+import pty
+import random
+import select
+import threading
+import time
+import tty
+
+# Controlador ESP300 simulado servido num pseudo-terminal, para testes e benchmarks sem o estágio real.
+# Também pode ser usado sem pty: resource() devolve um objeto com a interface de um recurso pyvisa,
+# atendido na própria thread de quem chama.
+#
+# time_scale > 1 acelera o relógio do controlador (movimentos, WS e WT terminam time_scale vezes
+# mais rápido); a latência e a taxa de transmissão são do enlace e não são aceleradas. As falhas
+# injetadas (bytes perdidos, respostas que não chegam) usam um gerador com semente, reprodutível.
+
+VERSION = "ESP300 Version 3.08 09/09/02"
+
+class Axis:
+    # Perfil trapezoidal de velocidade (triangular quando a distância é curta)
+    def __init__(self, velocity=2.0, acceleration=8.0, deceleration=8.0):
+        self.velocity = velocity  # Unidades por segundo
+        self.acceleration = acceleration  # Unidades por segundo ao quadrado
+        self.deceleration = deceleration
+        self.start_position = 0.0
+        self.target = 0.0
+        self.start_time = 0.0
+        self.duration = 0.0
+        # Tempo acelerando, em cruzeiro, desacelerando, velocidade de pico, aceleração e desaceleração
+        self._profile = (0.0, 0.0, 0.0, 0.0, acceleration, deceleration)
+
+    def position(self, now):
+        elapsed = now - self.start_time
+        if elapsed >= self.duration:
+            return self.target
+        accel_time, cruise_time, decel_time, peak, acceleration, deceleration = self._profile
+        if elapsed < accel_time:
+            travelled = 0.5 * acceleration * elapsed ** 2
+        elif elapsed < accel_time + cruise_time:
+            travelled = 0.5 * peak * accel_time + peak * (elapsed - accel_time)
+        else:
+            braking = elapsed - accel_time - cruise_time
+            travelled = 0.5 * peak * accel_time + peak * cruise_time + peak * braking - 0.5 * deceleration * braking ** 2
+        direction = 1.0 if self.target >= self.start_position else -1.0
+        return self.start_position + direction * travelled
+
+    def moving(self, now):
+        return now < self.start_time + self.duration
+
+    def speed(self, now):
+        elapsed = now - self.start_time
+        if elapsed >= self.duration:
+            return 0.0
+        accel_time, cruise_time, decel_time, peak, acceleration, deceleration = self._profile
+        if elapsed < accel_time:
+            speed = acceleration * elapsed
+        elif elapsed < accel_time + cruise_time:
+            speed = peak
+        else:
+            speed = peak - deceleration * (elapsed - accel_time - cruise_time)
+        return speed if self.target >= self.start_position else -speed
+
+    def stop(self, now):
+        self.target = self.position(now)
+        self.duration = 0.0
+
+    def define_home(self, position, now):
+        self.stop(now)
+        self.start_position = self.target = position
+
+    def move_to(self, target, now, velocity=None, acceleration=None, deceleration=None):
+        # velocity/acceleration/deceleration substituem VA/AC/AG neste movimento (interpolação em grupo)
+        velocity = self.velocity if velocity is None else velocity
+        acceleration = self.acceleration if acceleration is None else acceleration
+        deceleration = self.deceleration if deceleration is None else deceleration
+        self.start_position = self.position(now)
+        self.target = target
+        self.start_time = now
+        distance = abs(target - self.start_position)
+        if distance == 0 or velocity <= 0:
+            self.duration = 0.0
+            return
+        peak = velocity
+        if peak ** 2 / (2 * acceleration) + peak ** 2 / (2 * deceleration) > distance:
+            peak = (2 * distance * acceleration * deceleration / (acceleration + deceleration)) ** 0.5
+        accel_time = peak / acceleration
+        decel_time = peak / deceleration
+        cruise_time = (distance - 0.5 * peak * (accel_time + decel_time)) / peak
+        self._profile = (accel_time, cruise_time, decel_time, peak, acceleration, deceleration)
+        self.duration = accel_time + cruise_time + decel_time
+
+class Group:
+    def __init__(self, axes):
+        self.axes = axes
+        self.velocity = 0.0  # Velocidade ao longo da trajetória; HL falha enquanto for zero
+        self.acceleration = 0.0
+        self.deceleration = 0.0
+        self.enabled = False  # HO/HF
+
+class ESP300Simulator:
+    def __init__(self, axes=3, latency=0.002, velocity=2.0, time_scale=1.0, baudrate=None,
+                 drop_rate=0.0, timeout_rate=0.0, seed=0):
+        self.latency = latency  # Tempo de processamento de cada comando (s)
+        self.time_scale = time_scale  # Segundos do controlador por segundo real
+        self.baudrate = baudrate  # Limita a taxa do enlace (10 bits por byte); None sem limite
+        self.drop_rate = drop_rate  # Probabilidade de perder cada byte de uma resposta
+        self.timeout_rate = timeout_rate  # Probabilidade de uma resposta inteira não ser enviada
+        self.axes = {axis: Axis(velocity) for axis in range(1, axes + 1)}
+        self.motors = {axis: True for axis in self.axes}  # MO/MF
+        self.groups = {}  # Grupos de interpolação (HN): número -> Group
+        self.programs = {}  # Programas gravados com nEP ... QP
+        self.program_running = False
+        self.online = True  # False simula o cabo desconectado: os comandos se perdem sem resposta
+        self._recording = None
+        self._random = random.Random(seed)
+        self._epoch = time.monotonic()
+        self.master = self.slave = self.port = None
+        self._running = False
+        self._thread = None
+
+    def clock(self):
+        # Relógio do controlador; igual a time.monotonic() quando time_scale == 1
+        return self._epoch + (time.monotonic() - self._epoch) * self.time_scale
+
+    def host_time(self, instant):
+        # Instante do relógio do controlador convertido para time.monotonic()
+        return self._epoch + (instant - self._epoch) / self.time_scale
+
+    def start(self):
+        self.master, self.slave = pty.openpty()
+        tty.setraw(self.slave)  # Sem eco e sem tradução de \r
+        self.port = os.ttyname(self.slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.master is not None:
+            os.close(self.master)
+            os.close(self.slave)
+            self.master = self.slave = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def resource(self):
+        return SimulatedResource(self)
+
+    def _serve(self):
+        buffer = b''
+        while self._running:
+            ready, _, _ = select.select([self.master], [], [], 0.05)
+            if not ready:
+                continue
+            try:
+                buffer += os.read(self.master, 1024)
+            except OSError:
+                break
+            if not self.online:
+                buffer = b''
+                continue
+            while b'\r' in buffer:
+                line, buffer = buffer.split(b'\r', 1)
+                self.transfer_delay(len(line) + 1)
+                reply = self.respond(line.decode(errors='ignore'))
+                if reply is not None:
+                    self.transfer_delay(len(reply), self.latency)
+                    os.write(self.master, reply)
+
+    def transfer_delay(self, size, extra=0.0):
+        delay = extra + (size * 10 / self.baudrate if self.baudrate else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def respond(self, line):
+        # Bytes enviados de volta para uma linha recebida (com \r\n e as falhas injetadas), ou None
+        reply = self.handle_line(line)
+        if reply is None:
+            return None
+        if self.timeout_rate and self._random.random() < self.timeout_rate:
+            return None
+        data = reply.encode() + b'\r\n'
+        if self.drop_rate:
+            data = bytes(byte for byte in data if self._random.random() >= self.drop_rate)
+        return data
+
+    def handle_line(self, line):
+        if self._recording is not None:
+            # Em modo de programa as linhas são guardadas até QP, sem serem executadas
+            if line.strip().upper() == "QP":
+                self._recording = None
+            else:
+                self.programs[self._recording].append(line)
+            return None
+        # Vários comandos separados por ';' geram uma única resposta com os valores separados por ','
+        replies = [self.handle(command.strip()) for command in line.split(';') if command.strip()]
+        replies = [reply for reply in replies if reply is not None]
+        return ','.join(replies) if replies else None
+
+    def handle(self, line):
+        now = self.clock()
+        query = line.endswith('?')
+        command = line.rstrip('?')
+        axis, mnemonic, argument = self.parse(command)
+        if mnemonic == "VE":
+            return VERSION
+        if mnemonic == "EP":
+            self._recording = axis
+            self.programs[axis] = []
+            return None
+        if mnemonic == "XX":
+            if axis:
+                self.programs.pop(axis, None)
+            else:
+                self.programs.clear()
+            return None
+        if mnemonic == "EX":
+            if axis in self.programs:
+                threading.Thread(target=self._run_program, args=(self.programs[axis],), daemon=True).start()
+            return None
+        if mnemonic == "WT":
+            # Pausa em milissegundos do controlador; os comandos seguintes esperam
+            time.sleep(float(argument or 0) / 1000 / self.time_scale)
+            return None
+        if mnemonic == "ST" and not axis:
+            for state in self.axes.values():
+                state.stop(now)
+            return None
+        if mnemonic.startswith("H"):
+            return self.handle_group(axis, mnemonic, argument, query, now)
+        state = self.axes.get(axis)
+        if state is None:
+            return None
+        if mnemonic == "TP":
+            return f"{state.position(now):.5f}"
+        if mnemonic == "TV":
+            return f"{state.speed(now):.5f}"
+        if mnemonic == "MD":
+            return "0" if state.moving(now) else "1"
+        if mnemonic == "MO" and query:
+            return "1" if self.motors[axis] else "0"
+        if mnemonic in ("VA", "AC", "AG"):
+            attribute = {"VA": "velocity", "AC": "acceleration", "AG": "deceleration"}[mnemonic]
+            if query or not argument:
+                return f"{getattr(state, attribute):.5f}"
+            setattr(state, attribute, float(argument))
+        elif mnemonic == "WS":
+            # Como no controlador, a fila de comandos para até o eixo parar
+            while state.moving(self.clock()):
+                time.sleep(0.001)
+        elif mnemonic == "DH":
+            state.define_home(float(argument or 0), now)
+        elif mnemonic == "MO":
+            self.motors[axis] = True
+        elif mnemonic == "MF":
+            self.motors[axis] = False
+            state.stop(now)
+        elif mnemonic in ("PA", "PR") and argument and not self.motors[axis]:
+            pass  # Motor desligado: o controlador não move o eixo
+        elif mnemonic == "PA" and argument:
+            state.move_to(float(argument), now)
+        elif mnemonic == "PR" and argument:
+            state.move_to(state.target + float(argument), now)
+        elif mnemonic == "ST":
+            state.stop(now)
+        return None
+
+    def handle_group(self, number, mnemonic, argument, query, now):
+        # Grupos de interpolação linear: HN cria, HV/HA/HD definem o perfil ao longo da trajetória,
+        # HL move todos os eixos em linha reta, chegando juntos; HW espera, HS para, HX apaga
+        if mnemonic == "HN":
+            axes = [int(axis) for axis in argument.split(',') if axis.strip()]
+            if all(axis in self.axes for axis in axes):
+                self.groups[number] = Group(axes)
+            return None
+        group = self.groups.get(number)
+        if group is None:
+            return None  # Grupo inexistente: o controlador registra erro e não responde
+        if mnemonic == "HX":
+            del self.groups[number]
+        elif mnemonic in ("HV", "HA", "HD"):
+            attribute = {"HV": "velocity", "HA": "acceleration", "HD": "deceleration"}[mnemonic]
+            if query or not argument:
+                return f"{getattr(group, attribute):.5f}"
+            setattr(group, attribute, float(argument))
+        elif mnemonic == "HO":
+            group.enabled = True
+        elif mnemonic == "HF":
+            group.enabled = False
+        elif mnemonic == "HP":
+            return ','.join(f"{self.axes[axis].position(now):.5f}" for axis in group.axes)
+        elif mnemonic == "HL" and argument:
+            targets = [float(value) for value in argument.split(',')]
+            if not group.enabled or len(targets) != len(group.axes) or not all(self.motors[axis] for axis in group.axes):
+                return None
+            starts = [self.axes[axis].position(now) for axis in group.axes]
+            length = sum((target - start) ** 2 for target, start in zip(targets, starts)) ** 0.5
+            if length == 0 or group.velocity <= 0 or group.acceleration <= 0 or group.deceleration <= 0:
+                return None
+            # Cada eixo recebe a fração do perfil vetorial proporcional ao seu deslocamento
+            for axis, target, start in zip(group.axes, targets, starts):
+                share = abs(target - start) / length
+                if share > 0:
+                    self.axes[axis].move_to(target, now, group.velocity * share,
+                                            group.acceleration * share, group.deceleration * share)
+        elif mnemonic == "HW":
+            while any(self.axes[axis].moving(self.clock()) for axis in group.axes):
+                time.sleep(0.001)
+        elif mnemonic == "HS":
+            for axis in group.axes:
+                self.axes[axis].stop(now)
+        return None
+
+    def _run_program(self, lines):
+        self.program_running = True
+        for line in lines:
+            for command in line.split(';'):
+                if command.strip():
+                    self.handle(command.strip())
+        self.program_running = False
+
+    @staticmethod
+    def parse(command):
+        # Formato do ESP300: [eixo]MNEMÔNICO[argumento], ex.: 1PA10.5
+        index = 0
+        while index < len(command) and command[index].isdigit():
+            index += 1
+        axis = int(command[:index]) if index else 0
+        return axis, command[index:index + 2].upper(), command[index + 2:]
+
+class SimulatedResource:
+    # Subconjunto da interface de um recurso pyvisa (o que transports.VisaTransport e os scripts de
+    # teste usam), atendido pelo simulador na thread de quem chama, sem pty e sem thread de serviço
+    def __init__(self, simulator, resource_name="SIM0::ESP300::INSTR"):
+        self.simulator = simulator
+        self.resource_name = resource_name
+        self.timeout = 2000  # Milissegundos, como no pyvisa
+        self.write_termination = '\r'
+        self.read_termination = '\r\n'
+        self.is_open = True
+        self._received = b''
+
+    def _check(self):
+        if not self.is_open:
+            import pyvisa
+            raise pyvisa.errors.InvalidSession()
+
+    def write_raw(self, data):
+        self._check()
+        self.simulator.transfer_delay(len(data))
+        if not self.simulator.online:
+            return len(data)
+        for line in data.split(b'\r')[:-1]:  # Só linhas completas, terminadas em \r
+            reply = self.simulator.respond(line.decode(errors='ignore'))
+            if reply is not None:
+                self.simulator.transfer_delay(len(reply), self.simulator.latency)
+                self._received += reply
+        return len(data)
+
+    def write(self, message):
+        return self.write_raw((message + self.write_termination).encode())
+
+    def read(self):
+        self._check()
+        terminator = self.read_termination.encode()
+        index = self._received.find(terminator)
+        if index < 0:
+            # Resposta perdida ou incompleta: espera o timeout inteiro, como o driver VISA
+            import pyvisa
+            time.sleep(self.timeout / 1000)
+            self._received = b''
+            raise pyvisa.errors.VisaIOError(pyvisa.constants.StatusCode.error_timeout)
+        frame, self._received = self._received[:index], self._received[index + len(terminator):]
+        return frame.decode(errors='ignore')
+
+    def query(self, message):
+        self.write(message)
+        return self.read()
+
+    def clear(self):
+        self._received = b''
+
+    def open(self):
+        self.is_open = True
+        self._received = b''
+
+    def close(self):
+        self.is_open = False
+
+if __name__ == "__main__":
+    with ESP300Simulator() as simulator:
+        print(f"Simulador ESP300 em {simulator.port} (Ctrl+C para sair)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
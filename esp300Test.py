@@ -1,10 +1,9 @@
 #!/usr/bin/python3
 
 import time
-import pyvisa
+import visaPool
 
-rm = pyvisa.ResourceManager()
-gpib_device = rm.open_resource('GPIB0::5::INSTR')  # Ajuste o endereço conforme necessário
+gpib_device = visaPool.open_resource('GPIB0::5::INSTR')  # Ajuste o endereço conforme necessário
 #gpib_device.query('1PA0')
 #tiem.sleep(1)
 #gpib_device.query('1WS')
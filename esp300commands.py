@@ -1,11 +1,20 @@
 #!/usr/bin/python3
 
+import argparse
+import importlib
+import sys
 import time
 
 import pyvisa
 from pymeasure.instruments import Instrument
 from pymeasure.adapters import VISAAdapter, SerialAdapter
 
+from esp300Protocol import COMMAND_SEPARATOR, pack_commands, split_responses
+from sequenceRunner import SequenceRunner, open_steps, print_summary
+
+# Parâmetros de movimento que só mudam quando os próprios set_* os escrevem
+CACHED_PARAMETERS = ("VA", "AC", "AG")
+
 class ESP300(Instrument):
     def __init__(self, adapter, **kwargs):
         super().__init__(
@@ -14,6 +23,92 @@ class ESP300(Instrument):
             includeSCPI=False,
             **kwargs
         )
+        self._parameters = {}  # (eixo, mnemônico) -> valor, escrito pelos set_* e lido pelos get_*
+
+    def _set_parameter(self, axis, mnemonic, value):
+        try:
+            self.write(f"{axis}{mnemonic}{value}")
+            self._parameters[(str(axis), mnemonic)] = str(value)
+        except Exception:
+            # Não se sabe se o controlador aplicou o valor
+            self._parameters.pop((str(axis), mnemonic), None)
+            raise
+
+    def _get_parameter(self, axis, mnemonic):
+        key = (str(axis), mnemonic)
+        if key not in self._parameters:
+            self._parameters[key] = self.ask(f"{axis}{mnemonic}?").strip()
+        return self._parameters[key]
+
+    def invalidate_cache(self, axis=None):
+        if axis is None:
+            self._parameters.clear()
+        else:
+            for key in [key for key in self._parameters if key[0] == str(axis)]:
+                del self._parameters[key]
+
+    def query_many(self, commands):
+        results = []
+        for line in pack_commands(commands):
+            results.extend(split_responses(self.ask(COMMAND_SEPARATOR.join(line)).strip(), line))
+        return results
+
+    def load_parameters(self, axes=(1, 2, 3)):
+        # Preenche o cache de todos os eixos numa única leitura em lote
+        keys = [(str(axis), mnemonic) for axis in axes for mnemonic in CACHED_PARAMETERS]
+        try:
+            values = self.query_many([f"{axis}{mnemonic}?" for axis, mnemonic in keys])
+        except Exception as e:
+            print(f"Erro ao carregar os parâmetros de movimento: {e}")
+            return
+        for key, value in zip(keys, values):
+            if value is not None:
+                self._parameters[key] = value
+
+    def verify_cache(self):
+        # Confere todo o cache com o controlador numa única leitura em lote; retorna as divergências
+        keys = list(self._parameters)
+        if not keys:
+            return {}
+        try:
+            values = self.query_many([f"{axis}{mnemonic}?" for axis, mnemonic in keys])
+        except Exception as e:
+            print(f"Erro ao conferir o cache de parâmetros: {e}")
+            self.invalidate_cache()
+            return None
+        mismatches = {}
+        for key, value in zip(keys, values):
+            try:
+                matches = value is not None and float(value) == float(self._parameters[key])
+            except ValueError:
+                matches = False
+            if not matches:
+                mismatches[key] = (self._parameters[key], value)
+                if value is None:
+                    del self._parameters[key]
+                else:
+                    self._parameters[key] = value
+        return mismatches
+
+    def execute_command(self, command):
+        # Um comando arbitrário pode alterar qualquer parâmetro
+        self.invalidate_cache()
+        try:
+            if command.rstrip().endswith('?'):
+                return self.ask(command)
+            self.write(command)
+        except Exception as e:
+            print(f"Erro ao executar o comando {command}: {e}")
+            return None
+
+    def reconnect(self):
+        self.invalidate_cache()
+        try:
+            self.adapter.connection.close()
+            self.adapter.connection.open()
+            print("Reconexão realizada.")
+        except Exception as e:
+            print(f"Erro ao tentar reconectar: {e}")
 
     def move_to(self, axis, position):
         try:
@@ -43,13 +138,13 @@ class ESP300(Instrument):
 
     def set_velocity(self, axis, velocity):
         try:
-            self.write(f"{axis}VA{velocity}")
+            self._set_parameter(axis, "VA", velocity)
         except Exception as e:
             print(f"Erro ao definir a velocidade do eixo {axis} para {velocity}: {e}")
 
     def get_velocity(self, axis):
         try:
-            return self.ask(f"{axis}VA?")
+            return self._get_parameter(axis, "VA")
         except Exception as e:
             print(f"Erro ao consultar a velocidade do eixo {axis}: {e}")
             return None
@@ -62,26 +157,26 @@ class ESP300(Instrument):
 
     def set_acceleration(self, axis, acceleration):
         try:
-            self.write(f"{axis}AC{acceleration}")
+            self._set_parameter(axis, "AC", acceleration)
         except Exception as e:
             print(f"Erro ao definir a aceleração do eixo {axis} para {acceleration}: {e}")
 
     def get_acceleration(self, axis):
         try:
-            return self.ask(f"{axis}AC?")
+            return self._get_parameter(axis, "AC")
         except Exception as e:
             print(f"Erro ao consultar a aceleração do eixo {axis}: {e}")
             return None
 
     def set_deceleration(self, axis, deceleration):
         try:
-            self.write(f"{axis}AG{deceleration}")
+            self._set_parameter(axis, "AG", deceleration)
         except Exception as e:
             print(f"Erro ao definir a desaceleração do eixo {axis} para {deceleration}: {e}")
 
     def get_deceleration(self, axis):
         try:
-            return self.ask(f"{axis}AG?")
+            return self._get_parameter(axis, "AG")
         except Exception as e:
             print(f"Erro ao consultar a desaceleração do eixo {axis}: {e}")
             return None
@@ -98,7 +193,55 @@ class ESP300(Instrument):
         except Exception as e:
             print(f"Erro ao desabilitar o eixo {axis}: {e}")
 
-def main():
+def open_device(address):
+    # Portas seriais (/dev/ttyUSB0, COM3) pelo SerialAdapter; o resto é recurso VISA (GPIB0::5::INSTR)
+    if address.startswith("/dev/") or address.upper().startswith("COM"):
+        adapter = SerialAdapter(address, baudrate=19200, timeout=5, write_termination='\r', read_termination='\r\n')
+    else:
+        adapter = VISAAdapter(address, write_termination='\r', read_termination='\r\n')
+    return ESP300(adapter)
+
+def load_hook(name):
+    # "modulo:funcao" -> função chamada em cada passo measure, com o passo como argumento
+    module, _, function = name.partition(':')
+    return getattr(importlib.import_module(module), function)
+
+def run_sequence(args):
+    try:
+        esp300 = open_device(args.porta)
+    except Exception as e:
+        print(f"Erro ao criar a instância do ESP300: {e}")
+        return 1
+    report = open(args.relatorio, "w", newline="") if args.relatorio else None
+    try:
+        runner = SequenceRunner(esp300, axes=args.eixos, report=report, pipeline=not args.sem_agrupar,
+                                measure=load_hook(args.medicao) if args.medicao else None)
+        summary = runner.run(open_steps(args.sequencia, args.formato))
+    except Exception as e:
+        print(f"Erro durante a sequência: {e}")
+        return 1
+    finally:
+        if report is not None:
+            report.close()
+    print_summary(summary)
+    return 0
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Controle do ESP300; sem argumentos, modo interativo")
+    parser.add_argument("sequencia", nargs="?", help="Arquivo de sequência (JSON ou CSV), ou - para a entrada padrão")
+    parser.add_argument("--porta", default="/dev/ttyUSB0", help="Porta serial ou recurso VISA")
+    parser.add_argument("--formato", choices=("json", "csv"), help="Formato da sequência (padrão: pela extensão ou conteúdo)")
+    parser.add_argument("--relatorio", help="CSV com o tempo de cada passo, gravado durante a execução")
+    parser.add_argument("--medicao", help="Gancho dos passos measure, como modulo:funcao")
+    parser.add_argument("--eixos", type=lambda text: tuple(int(axis) for axis in text.split(',')), default=(1, 2, 3))
+    parser.add_argument("--sem-agrupar", action="store_true", help="Envia cada comando na hora, sem juntar em linhas")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.sequencia is not None:
+        return run_sequence(args)
+
     print("Escolha o método de conexão:")
     print("1. Serial (padrão: /dev/ttyUSB0)")
     print("2. GPIB (padrão: GPIB0::5::INSTR)")
@@ -133,4 +276,4 @@ def main():
         print(f"Erro durante a operação com o ESP300: {e}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,13 +1,136 @@
 #!/usr/bin/python3
 
-import pyvisa
+import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+import serial.tools.list_ports
+import visaPool
+
+# Descoberta do ESP300: todas as portas seriais e recursos GPIB candidatos são sondados ao mesmo
+# tempo com VE (e *IDN? como alternativa) e prazo curto. As unidades encontradas ficam num cache em
+# disco, indexado pela identificação USB (fabricante:produto:número de série), que não muda quando o
+# adaptador troca de /dev/ttyUSBn; na próxima vez só a porta do cache é sondada.
+
+CACHE_PATH = os.path.expanduser("~/.cache/esp300/portas.json")
+PROBE_TIMEOUT = 0.3  # Prazo de cada sonda (s)
+PROBE_COMMANDS = ("VE", "*IDN?")
+
+def fingerprint(port):
+    # Identificação estável de um adaptador USB; portas sem USB usam o próprio nome
+    if port.vid is None:
+        return port.device
+    return f"{port.vid:04x}:{port.pid:04x}:{port.serial_number or ''}"
+
+def serial_ports():
+    # Só as portas seriais: barato, não carrega o backend VISA
+    return {port.device: fingerprint(port) for port in serial.tools.list_ports.comports()}
+
+def candidate_ports():
+    # Endereço -> identificação, sem nenhuma I/O com os dispositivos
+    candidates = serial_ports()
+    try:
+        for resource in visaPool.list_resources():
+            if resource.startswith("GPIB"):
+                candidates[resource] = resource  # O endereço GPIB já é estável
+    except Exception as e:
+        print(f"Erro ao listar recursos VISA: {e}")
+    return candidates
+
+def probe(address, timeout=PROBE_TIMEOUT):
+    # Retorna a versão informada pelo controlador, ou None se não for um ESP300
+    try:
+        if address.startswith("GPIB"):
+            # Um handle que já está no conjunto pertence a um driver em uso: sondá-lo misturaria o VE
+            # com o tráfego dele (ver cached_address). O aberto aqui é sempre devolvido, para que só
+            # drivers fiquem no conjunto; o ResourceManager continua aberto, que é a parte cara
+            if visaPool.in_pool(address):
+                return None
+            resource = visaPool.open_resource(address, timeout)
+            try:
+                for command in PROBE_COMMANDS:
+                    try:
+                        reply = resource.query(command)
+                    except Exception:
+                        continue
+                    if "ESP300" in reply:
+                        return reply.strip()
+                return None
+            finally:
+                visaPool.close_resource(address)
+        with serial.Serial(address, baudrate=19200, timeout=timeout) as connection:
+            for command in PROBE_COMMANDS:
+                connection.reset_input_buffer()
+                connection.write(f"{command}\r".encode())
+                reply = connection.read_until(b'\r\n').decode(errors='ignore')
+                if "ESP300" in reply:
+                    return reply.strip()
+    except Exception:
+        pass
+    return None
+
+def discover(timeout=PROBE_TIMEOUT, max_workers=16, candidates=None):
+    # Sonda todos os candidatos em paralelo: o tempo total é o da sonda mais lenta, não a soma
+    candidates = candidate_ports() if candidates is None else candidates
+    with ThreadPoolExecutor(max_workers=max(min(len(candidates), max_workers), 1)) as executor:
+        versions = dict(zip(candidates, executor.map(lambda address: probe(address, timeout), candidates)))
+    return [{"address": address, "fingerprint": candidates[address], "version": version}
+            for address, version in versions.items() if version is not None]
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(cache, path=CACHE_PATH):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(cache, file, indent=2)
+    except OSError as e:
+        print(f"Erro ao salvar o cache de portas: {e}")
+
+def remember(units, path=CACHE_PATH):
+    cache = load_cache(path)
+    for unit in units:
+        cache[unit["fingerprint"]] = {"address": unit["address"], "version": unit["version"]}
+    save_cache(cache, path)
+
+def find_esp300(timeout=PROBE_TIMEOUT, path=CACHE_PATH, refresh=False, candidates=None):
+    # Endereço do primeiro ESP300: primeiro pelo cache (uma sonda só), varredura completa se falhar
+    if not refresh:
+        address = cached_address(load_cache(path), timeout, candidates)
+        if address is not None:
+            return address
+    candidates = candidate_ports() if candidates is None else candidates
+    found = discover(timeout, candidates=candidates)
+    remember(found, path)
+    return found[0]["address"] if found else None
+
+def cached_address(cache, timeout=PROBE_TIMEOUT, candidates=None):
+    # GPIB e portas sem USB têm o endereço como identificação e são sondados direto; adaptadores USB
+    # são procurados só entre as portas seriais. A enumeração VISA fica para quando o cache falha
+    ports = candidates
+    for identification, entry in cache.items():
+        if identification == entry.get("address"):
+            address = identification
+            if address.startswith("GPIB") and visaPool.in_pool(address) and (candidates is None or address in candidates):
+                return address  # Já aberto por um driver em uso, que a identificou como ESP300
+        else:
+            if ports is None:
+                ports = serial_ports()
+            address = next((address for address, found in ports.items() if found == identification), None)
+        if address is not None and (candidates is None or address in candidates) and probe(address, timeout):
+            return address
+    return None
 
 def find_ports():
     try:
-        rm = pyvisa.ResourceManager()
-        resources = rm.list_resources()
+        resources = visaPool.list_resources()
         if not resources:
             print("Nenhuma porta encontrada.")
         else:
@@ -20,6 +143,13 @@ def find_ports():
         print(f"Erro ao listar portas: {e}")
         sys.exit(1)
 
+    units = discover()
+    if not units:
+        print("Nenhum ESP300 respondeu.")
+    for unit in units:
+        print(f"ESP300 em {unit['address']} ({unit['fingerprint']}): {unit['version']}")
+    remember(units)
+
 def check_permissions():
     user = os.getlogin()
     groups = os.getgroups()
@@ -36,4 +166,3 @@ def check_permissions():
 if __name__ == "__main__":
     check_permissions()
     find_ports()
-
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import os
+import select
+import time
+
+import serial
+
+from esp300Protocol import TERMINATOR, RESPONSE_SEPARATOR
+
+# Separação das respostas do ESP300 em quadros terminados por \r\n. Os bytes disponíveis são lidos
+# de uma vez para dentro de um bytearray reaproveitado (os.readv escreve direto nele, sem bytes
+# intermediários), e cada quadro é entregue como uma fatia memoryview desse buffer, sem cópia.
+# Uma leitura pode trazer um quadro pela metade ou vários quadros; o resto fica para a próxima.
+#
+# O memoryview de read_frame só vale até a próxima leitura: o buffer é compactado e reaproveitado.
+
+SEPARATOR = RESPONSE_SEPARATOR.encode()
+
+def frame_text(frame):
+    return str(frame, "ascii", "ignore").strip()
+
+def frame_numbers(frame):
+    # float aceita bytes direto: sem decodificar para str
+    return [float(value) for value in bytes(frame).split(SEPARATOR)]
+
+class FrameReader:
+    def __init__(self, connection=None, terminator=TERMINATOR, size=1024):
+        self.connection = connection
+        self.terminator = terminator
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # Início do primeiro quadro ainda não entregue
+        self._end = 0  # Fim dos bytes recebidos
+        self._scan = 0  # Onde continuar a procura do terminador
+        self.received = 0  # Bytes lidos da conexão desde a criação
+        # Leitura direta no descritor no POSIX; nos demais sistemas, pelo read do pyserial
+        self._direct = os.name == "posix" and hasattr(connection, "fileno")
+
+    def reset(self):
+        # Descarta o que foi recebido e não entregue (respostas atrasadas, quadros incompletos)
+        self._start = self._end = self._scan = 0
+
+    def pending(self):
+        return bytes(self._view[self._start:self._end])
+
+    def _reserve(self, size):
+        # Garante 'size' bytes livres no fim do buffer
+        if self._end + size <= len(self._buffer):
+            return
+        waiting = self._end - self._start
+        if waiting + size <= len(self._buffer):
+            # Raro: só acontece quando sobra um quadro incompleto perto do fim do buffer
+            self._buffer[:waiting] = bytes(self._view[self._start:self._end])
+        else:
+            # Buffer novo em vez de redimensionar: quadros já entregues continuam apontando para o antigo
+            buffer = bytearray(max(2 * len(self._buffer), waiting + size))
+            buffer[:waiting] = self._view[self._start:self._end]
+            self._buffer = buffer
+            self._view = memoryview(buffer)
+        self._scan -= self._start
+        self._start, self._end = 0, waiting
+
+    def feed(self, data):
+        # Para transportes que já trazem os bytes (ex.: asyncio); copia uma vez para o buffer
+        self._reserve(len(data))
+        self._view[self._end:self._end + len(data)] = data
+        self._end += len(data)
+        self.received += len(data)
+
+    def fill(self, timeout):
+        # Lê o que estiver disponível em até 'timeout' segundos; False se nada chegou
+        if not self._direct:
+            self.connection.timeout = timeout
+            data = self.connection.read(self.connection.in_waiting or 1)
+            self.feed(data)
+            return bool(data)
+        fd = self.connection.fileno()
+        ready, _, _ = select.select([fd], [], [], max(timeout, 0))
+        if not ready:
+            return False
+        self._reserve(256)
+        count = os.readv(fd, [self._view[self._end:]])
+        if count == 0:
+            raise serial.SerialException("Dispositivo pronto para leitura mas sem dados (desconectado?)")
+        self._end += count
+        self.received += count
+        return True
+
+    def next_frame(self):
+        # Próximo quadro completo já recebido (sem o terminador), ou None
+        index = self._buffer.find(self.terminator, self._scan, self._end)
+        if index < 0:
+            self._scan = max(self._end - len(self.terminator) + 1, self._start)
+            return None
+        frame = self._view[self._start:index]
+        self._start = self._scan = index + len(self.terminator)
+        if self._start == self._end:
+            self._start = self._end = self._scan = 0  # Buffer vazio: recomeça do início, sem mover bytes
+        return frame
+
+    def read_frame(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self.next_frame()
+            if frame is not None:
+                return frame
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.fill(remaining):
+                raise serial.SerialTimeoutException(f"Sem resposta completa em {timeout} s (recebido: {self.pending()!r})")
+
+    def read_bytes(self, timeout):
+        return bytes(self.read_frame(timeout))
+
+    def read_text(self, timeout):
+        return frame_text(self.read_frame(timeout))
+
+    def read_numbers(self, timeout):
+        return frame_numbers(self.read_frame(timeout))
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import itertools
+import queue
+import threading
+from concurrent.futures import Future
+
+from esp300Protocol import COMMAND_SEPARATOR, RESPONSE_SEPARATOR, is_single_value
+from transports import compile_lines
+
+# Uma única thread é dona da porta: GUI e scripts enviam pedidos por uma fila com prioridade
+# e recebem futures, de modo que escritas e leituras de chamadores diferentes nunca se misturam
+
+PRIORITY_STOP = 0  # Passa na frente de tudo
+PRIORITY_COMMAND = 1
+PRIORITY_POLL = 2
+
+class IOWorker:
+    def __init__(self, device, max_batch=8):
+        self.device = device
+        self.max_batch = max_batch  # Consultas de polling agrupadas numa mesma linha
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()  # Mantém a ordem de chegada dentro da mesma prioridade
+        self._pending = {}  # Leituras idênticas ainda na fila compartilham o mesmo future
+        self._lock = threading.Lock()
+        self._closed = False
+        self.tracer = None  # busTracer.Tracer: marca a espera na fila e a execução de cada pedido
+        self._thread = threading.Thread(target=self._run, name="ESP300-IO", daemon=True)
+        self._thread.start()
+
+    def submit(self, method, *args, priority=PRIORITY_COMMAND, coalesce=False):
+        key = (method, args) if coalesce else None
+        tracer = self.tracer
+        started = tracer.now() if tracer is not None else None
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("IOWorker encerrado")
+            if key is not None and key in self._pending:
+                if tracer is not None:
+                    tracer.instant(f"{method} (aproveita pedido na fila)", "fila")
+                return self._pending[key]
+            future = Future()
+            future.enqueued = started
+            if key is not None:
+                self._pending[key] = future
+            sequence = next(self._sequence)
+            self._queue.put((priority, sequence, method, args, future, key))
+        if tracer is not None:
+            tracer.complete(f"enfileira {method}", started, tracer.now(), "fila", {"prioridade": priority})
+            tracer.flow(method, sequence, True, started)
+        return future
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put((float('inf'), next(self._sequence), None, (), None, None))
+        self._thread.join()
+        # Quem ainda esperava na fila recebe um erro em vez de ficar bloqueado para sempre
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item[4] is not None and item[4].set_running_or_notify_cancel():
+                item[4].set_exception(RuntimeError("IOWorker encerrado"))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item[2] is None:
+                break
+            batch = [item]
+            if self._batchable(item):
+                batch += self._take_batch()
+            self._release(batch)
+            if len(batch) > 1:
+                self._execute_batch(batch)
+            else:
+                self._execute(item)
+
+    def _batchable(self, item):
+        # Só consultas de um valor: "1TP?;2TP?" ou "1HP?" desalinhariam as respostas do lote inteiro
+        return item[0] == PRIORITY_POLL and item[2] == "query" and len(item[3]) == 1 and is_single_value(item[3][0])
+
+    def _take_batch(self):
+        # Junta as próximas consultas de polling da fila num único query_many
+        batch = []
+        postponed = []
+        while len(batch) + 1 < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[2] is not None and self._batchable(item):
+                batch.append(item)
+            else:
+                postponed.append(item)
+                break
+        for item in postponed:
+            self._queue.put(item)
+        return batch
+
+    def _release(self, batch):
+        with self._lock:
+            for item in batch:
+                if item[5] is not None:
+                    self._pending.pop(item[5], None)
+
+    def _dequeued(self, tracer, item, started):
+        # Espera na fila de cada pedido, com a seta desde quem o enfileirou
+        if item[4].enqueued is not None:
+            tracer.complete(f"fila {item[2]}", item[4].enqueued, started, "fila")
+            tracer.flow(item[2], item[1], False, started)
+
+    def _execute(self, item):
+        _, _, method, args, future, _ = item
+        if not future.set_running_or_notify_cancel():
+            return
+        tracer = self.tracer
+        if tracer is not None:
+            started = tracer.now()
+            self._dequeued(tracer, item, started)
+        try:
+            future.set_result(getattr(self.device, method)(*args))
+        except Exception as e:
+            future.set_exception(e)
+        if tracer is not None:
+            tracer.complete(method, started, tracer.now(), "pedido", {"args": repr(args)})
+
+    def _execute_batch(self, batch):
+        batch = [item for item in batch if item[4].set_running_or_notify_cancel()]
+        tracer = self.tracer
+        if tracer is not None:
+            started = tracer.now()
+            for item in batch:
+                self._dequeued(tracer, item, started)
+        try:
+            results = []
+            for _, line in compile_lines(tuple(item[3][0] for item in batch)):
+                response = self.device.query(COMMAND_SEPARATOR.join(line))
+                values = response.split(RESPONSE_SEPARATOR) if response is not None else [None] * len(line)
+                if len(values) != len(line):
+                    # Número de respostas não bate: cada consulta da linha vai sozinha, como fora do lote
+                    results.extend(self.device.query(command) for command in line)
+                else:
+                    results.extend(value.strip() if value is not None else None for value in values)
+        except Exception as e:
+            for item in batch:
+                item[4].set_exception(e)
+            return
+        for item, result in zip(batch, results):
+            item[4].set_result(result)
+        if tracer is not None:
+            tracer.complete(f"lote de {len(batch)} consultas", started, tracer.now(), "pedido")
+
+    def _call(self, method, *args, priority=PRIORITY_COMMAND, coalesce=False):
+        # Chamadas feitas de dentro da própria thread de I/O não podem esperar na fila
+        if threading.current_thread() is self._thread:
+            return getattr(self.device, method)(*args)
+        return self.submit(method, *args, priority=priority, coalesce=coalesce).result()
+
+    # Interface bloqueante compatível com o driver, para scripts e para as demais camadas
+    def query(self, command, timeout=None):
+        return self._call("query", command, timeout)
+
+    def poll(self, command):
+        return self._call("query", command, priority=PRIORITY_POLL, coalesce=True)
+
+    def write(self, command):
+        return self._call("write", command)
+
+    def query_many(self, commands, timeout=None):
+        return self._call("query_many", commands, timeout)
+
+    def poll_many(self, commands):
+        return self._call("query_many", commands, priority=PRIORITY_POLL)
+
+    def write_many(self, commands):
+        return self._call("write_many", commands)
+
+    def upload_program(self, number, commands):
+        return self._call("upload_program", number, tuple(commands))
+
+    def move_to(self, axis, position, wait=True):
+        return self._call("move_to", axis, position, wait)
+
+    def move_relative(self, axis, increment, wait=True):
+        return self._call("move_relative", axis, increment, wait)
+
+    def define_group(self, group, axes, velocity, acceleration, deceleration):
+        return self._call("define_group", group, tuple(axes), velocity, acceleration, deceleration)
+
+    def move_group(self, group, positions, wait=True, profile=None):
+        return self._call("move_group", group, tuple(positions), wait, profile)
+
+    def stop_group(self, group):
+        return self._call("stop_group", group, priority=PRIORITY_STOP)
+
+    def get_position(self, axis):
+        return self._call("get_position", axis, priority=PRIORITY_POLL, coalesce=True)
+
+    def get_positions(self, axes=(1, 2, 3)):
+        return self._call("get_positions", tuple(axes), priority=PRIORITY_POLL, coalesce=True)
+
+    def execute_command(self, command):
+        return self._call("execute_command", command)
+
+    def stop(self, axis):
+        return self._call("stop", axis, priority=PRIORITY_STOP)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import pyvisa
+import serial
+
+import reconnectUSBPorts
+
+# Recuperação do enlace com o ESP300 em níveis, do mais barato ao mais caro:
+#   0. sonda VE: se o controlador responde, o erro não era do enlace e nada é reaberto
+#   1. reabertura imediata da porta
+#   2. novas reaberturas com espera crescente (backoff exponencial), cada uma confirmada pela sonda
+#   3. reinício do adaptador USB (udev para o serial, corte de energia na porta do hub para o GPIB)
+# Se nada funcionar dentro do prazo, o disjuntor abre: as chamadas falham na hora, sem I/O, até
+# passar o tempo de espera, quando uma única tentativa (meio aberto) decide se o enlace voltou.
+
+CLOSED = "fechado"  # Enlace normal
+OPEN = "aberto"  # Enlace fora; chamadas falham imediatamente
+HALF_OPEN = "meio aberto"  # Tempo de espera passou; a próxima chamada testa o enlace
+
+LINK_VISA_ERRORS = {
+    pyvisa.constants.StatusCode.error_connection_lost,
+    pyvisa.constants.StatusCode.error_io,
+    pyvisa.constants.StatusCode.error_timeout,
+    pyvisa.constants.StatusCode.error_resource_not_found,
+    pyvisa.constants.StatusCode.error_invalid_object,
+    pyvisa.constants.StatusCode.error_no_listeners,
+    pyvisa.constants.StatusCode.error_closing_failed,
+}
+
+def is_link_error(error):
+    # Só falhas de transporte disparam a recuperação; respostas malformadas, erros de conversão e
+    # afins são problemas do comando e não do cabo
+    if isinstance(error, pyvisa.errors.VisaIOError):
+        return error.error_code in LINK_VISA_ERRORS
+    if isinstance(error, pyvisa.errors.InvalidSession):
+        return True
+    return isinstance(error, (serial.SerialException, OSError))
+
+class LinkDown(ConnectionError):
+    pass
+
+class LinkRecovery:
+    def __init__(self, reopen, probe, usb_reset=None, first_delay=0.25, max_delay=4.0,
+                 backoff_budget=10.0, usb_settle=15.0, max_recovery=30.0, cooldown=30.0):
+        self.reopen = reopen  # Fecha e reabre a porta; levanta exceção se não conseguir
+        self.probe = probe  # Consulta barata (VE); True se o controlador respondeu
+        self.usb_reset = usb_reset  # Reinício do adaptador USB (nível 3); None desativa
+        self.first_delay = first_delay
+        self.max_delay = max_delay
+        self.backoff_budget = backoff_budget  # Tempo máximo no nível 2 (s)
+        self.usb_settle = usb_settle  # Tempo para o adaptador reaparecer depois do reinício (s)
+        self.max_recovery = max_recovery  # Limite para a recuperação inteira (s)
+        self.cooldown = cooldown  # Tempo com o disjuntor aberto antes de testar de novo (s)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.recoveries = []  # (nível alcançado, duração em s, sucesso)
+        self.attempts = 0  # Reaberturas tentadas, somando todos os níveis
+        self._lock = threading.Lock()
+
+    @property
+    def last_recovery(self):
+        return self.recoveries[-1] if self.recoveries else None
+
+    def available(self):
+        # Chamado antes de cada operação de I/O
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            return self._half_open()
+        return True
+
+    def check(self):
+        if not self.available():
+            raise LinkDown("Enlace com o ESP300 indisponível (disjuntor aberto)")
+
+    def _half_open(self):
+        # Uma única tentativa barata; as demais chamadas continuam falhando rápido
+        if not self._lock.acquire(blocking=False):
+            return False
+        try:
+            started = time.monotonic()
+            if self._attempt():
+                self._close(1, started)
+                return True
+            self._open(1, started)
+            return False
+        finally:
+            self._lock.release()
+
+    def recover(self, skip_probe=False):
+        # Chamado depois de um erro de enlace; retorna True se o enlace está de pé
+        if not self._lock.acquire(blocking=False):
+            return False  # Outra thread já está recuperando
+        try:
+            started = time.monotonic()
+            deadline = started + self.max_recovery
+            if not skip_probe and self._probe():
+                print("O controlador responde; erro não era do enlace.")
+                return True
+
+            print("Tentando reconectar (nível 1: reabertura)...")
+            if self._attempt():
+                return self._close(1, started)
+
+            print("Tentando reconectar (nível 2: novas tentativas com espera crescente)...")
+            if self._backoff(min(time.monotonic() + self.backoff_budget, deadline)):
+                return self._close(2, started)
+
+            if self.usb_reset is not None and time.monotonic() < deadline:
+                print("Tentando reconectar (nível 3: reinício do adaptador USB)...")
+                try:
+                    self.usb_reset()
+                except Exception as e:
+                    print(f"Erro ao reiniciar o adaptador USB: {e}")
+                else:
+                    if self._backoff(min(time.monotonic() + self.usb_settle, deadline)):
+                        return self._close(3, started)
+
+            self._open(3 if self.usb_reset is not None else 2, started)
+            return False
+        finally:
+            self._lock.release()
+
+    def _probe(self):
+        try:
+            return bool(self.probe())
+        except Exception:
+            return False
+
+    def _attempt(self):
+        self.attempts += 1
+        try:
+            self.reopen()
+        except Exception as e:
+            print(f"Erro ao tentar reconectar: {e}")
+            return False
+        return self._probe()
+
+    def _backoff(self, deadline):
+        delay = self.first_delay
+        while time.monotonic() + delay <= deadline:
+            time.sleep(delay)
+            if self._attempt():
+                return True
+            delay = min(delay * 2, self.max_delay)
+        return False
+
+    def _close(self, tier, started):
+        elapsed = time.monotonic() - started
+        self.recoveries.append((tier, elapsed, True))
+        self.state = CLOSED
+        print(f"Reconexão realizada em {elapsed:.2f} s (nível {tier}).")
+        return True
+
+    def _open(self, tier, started):
+        elapsed = time.monotonic() - started
+        self.recoveries.append((tier, elapsed, False))
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        print(f"Enlace indisponível após {elapsed:.2f} s; novas tentativas em {self.cooldown:.0f} s.")
+
+def usb_reset_for(port=None, hub=None):
+    # Nível 3 conforme o adaptador: udev recarrega os tty USB; o adaptador GPIB (Agilent 82357B)
+    # precisa ter a porta do hub desligada e religada (turnOnOffGPIP.sh), ex.: hub=("1-1", 3)
+    if hub is not None:
+        return lambda: reconnectUSBPorts.power_cycle(*hub)
+    if port is not None and port.startswith("/dev/ttyUSB"):
+        return lambda: reconnectUSBPorts.reload_device(port)
+    return None
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+
+from esp300Protocol import format_number
+
+# Compila sequências de movimento do host em programas armazenados no ESP300 (nEP ... QP), envia o
+# programa de uma vez e o executa com um único nEX. Cada programa é identificado pelo hash do seu
+# conteúdo; se o mesmo conteúdo já está gravado no controlador, ele não é enviado de novo.
+
+FIRST_PROGRAM = 1
+LAST_PROGRAM = 100
+
+def compile_steps(steps):
+    # Passos aceitos (tuplas):
+    #   ("move", eixo, posição)            -> nPA  (movimento absoluto)
+    #   ("move_relative", eixo, incremento) -> nPR
+    #   ("wait", eixo)                     -> nWS  (espera o eixo parar)
+    #   ("dwell", segundos)                -> WT   (em milissegundos)
+    #   ("velocity" | "acceleration" | "deceleration", eixo, valor) -> nVA / nAC / nAG
+    parameters = {"velocity": "VA", "acceleration": "AC", "deceleration": "AG"}
+    commands = []
+    for step in steps:
+        kind = step[0]
+        if kind == "move":
+            commands.append(f"{step[1]}PA{format_number(step[2])}")
+        elif kind == "move_relative":
+            commands.append(f"{step[1]}PR{format_number(step[2])}")
+        elif kind == "wait":
+            commands.append(f"{step[1]}WS")
+        elif kind == "dwell":
+            commands.append(f"WT{int(round(step[1] * 1000))}")
+        elif kind in parameters:
+            commands.append(f"{step[1]}{parameters[kind]}{format_number(step[2])}")
+        else:
+            raise ValueError(f"Passo desconhecido: {step}")
+    return commands
+
+def program_hash(commands):
+    return hashlib.sha1("\n".join(commands).encode()).hexdigest()
+
+def device_identity(device):
+    # Porta serial ou recurso VISA do controlador (também através de um IOWorker)
+    device = getattr(device, "device", device)
+    metrics = getattr(device, "metrics", None)
+    if metrics is not None:
+        return metrics.name
+    adapter = getattr(device, "adapter", device)
+    return getattr(adapter, "port", None) or getattr(adapter, "resource_name", None) or "ESP300"
+
+class ProgramStore:
+    def __init__(self, device, registry_path=None, first=FIRST_PROGRAM, last=LAST_PROGRAM, device_id=None):
+        self.device = device
+        self.first = first
+        self.last = last
+        # O controlador guarda os programas em memória não volátil; o registro de qual hash está
+        # em qual número precisa sobreviver entre execuções do host. Com vários controladores, cada
+        # um tem o seu registro: um hash gravado em outra unidade não vale para esta
+        self.device_id = device_id or device_identity(device)
+        self.registry_path = registry_path or os.path.expanduser("~/.cache/esp300/programas.json")
+        self.registry = self._load_registry().get(self.device_id, {})  # número do programa (str) -> hash
+        self._usage = list(self.registry)  # Menos usado recentemente primeiro
+
+    def _load_registry(self):
+        # controlador -> {número: hash}; o formato antigo, sem o controlador, é descartado
+        try:
+            with open(self.registry_path) as file:
+                registries = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return {device: registry for device, registry in registries.items() if isinstance(registry, dict)}
+
+    def _save_registry(self):
+        # Relido antes de gravar: outros controladores podem ter atualizado os seus registros no mesmo arquivo
+        registries = self._load_registry()
+        registries[self.device_id] = self.registry
+        try:
+            os.makedirs(os.path.dirname(self.registry_path), exist_ok=True)
+            with open(self.registry_path, "w") as file:
+                json.dump(registries, file, indent=2)
+        except OSError as e:
+            print(f"Erro ao salvar o registro de programas: {e}")
+
+    def _touch(self, number):
+        if number in self._usage:
+            self._usage.remove(number)
+        self._usage.append(number)
+
+    def _free_number(self):
+        for number in range(self.first, self.last + 1):
+            if str(number) not in self.registry:
+                return str(number)
+        # Memória cheia: reaproveita o programa usado há mais tempo
+        number = self._usage[0]
+        self.erase(number)
+        return number
+
+    def load(self, steps):
+        commands = compile_steps(steps)
+        digest = program_hash(commands)
+        for number, stored in self.registry.items():
+            if stored == digest:
+                self._touch(number)
+                return int(number)
+        number = self._free_number()
+        # Uma operação só no driver (XX para não sobrar nada de um programa antigo, EP, corpo, QP)
+        if not self.device.upload_program(number, commands):
+            self.registry.pop(number, None)
+            self._save_registry()
+            raise RuntimeError(f"Falha ao gravar o programa {number} no controlador")
+        self.registry[number] = digest
+        self._touch(number)
+        self._save_registry()
+        print(f"Programa {number} gravado no controlador ({len(commands)} comandos).")
+        return int(number)
+
+    def run(self, steps):
+        number = self.load(steps)
+        self.device.write(f"{number}EX")
+        return number
+
+    def erase(self, number):
+        number = str(number)
+        self.device.write(f"{number}XX")
+        self.registry.pop(number, None)
+        if number in self._usage:
+            self._usage.remove(number)
+        self._save_registry()
+
+    def forget(self):
+        # Usar quando os programas do controlador foram apagados ou alterados por fora
+        self.registry.clear()
+        self._usage.clear()
+        self._save_registry()
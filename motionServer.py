@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from esp300Protocol import is_read_only
+from ioWorker import IOWorker, PRIORITY_COMMAND, PRIORITY_POLL, PRIORITY_STOP
+from motionWait import MotionWaiter
+
+# Servidor local que é o único dono do enlace com o ESP300 e atende vários programas ao mesmo tempo
+# (GUI de alinhamento, registro, aquisição), por socket Unix ou TCP em 127.0.0.1.
+#
+# Protocolo: uma mensagem JSON por linha.
+#   pedido:      {"id": 1, "method": "query", "params": ["1TP?"]}
+#   resposta:    {"id": 1, "result": "1.00000"}  ou  {"id": 1, "error": "mensagem"}
+#   assinatura:  {"id": 2, "method": "subscribe"} -> o servidor passa a enviar, sem id,
+#                {"method": "positions", "params": {"1": "...", "2": "...", "3": "...", "t": 123.4}}
+#
+# Leituras idênticas de clientes diferentes que chegam enquanto a mesma leitura ainda está na fila
+# do IOWorker compartilham uma única transação no barramento, e consultas de posição diferentes são
+# agrupadas numa linha só. Os assinantes recebem as posições de uma única leitura por ciclo, não
+# importa quantos sejam.
+
+SOCKET_PATH = os.path.expanduser("~/.cache/esp300/esp300.sock")
+MAX_BACKLOG = 65536  # Bytes pendentes para um assinante lento antes de pular atualizações
+
+# Métodos do driver atendidos pela fila de I/O: nome -> (prioridade, leitura compartilhável)
+QUEUED = {
+    "write": (PRIORITY_COMMAND, False),
+    "write_many": (PRIORITY_COMMAND, False),
+    "query_many": (PRIORITY_COMMAND, False),
+    "get_position": (PRIORITY_POLL, True),
+    "get_positions": (PRIORITY_POLL, True),
+    "stop": (PRIORITY_STOP, False),
+    "stop_group": (PRIORITY_STOP, False),
+}
+WAITED = {"move_to", "move_relative", "move_all"}  # Respondidos quando o movimento termina (MotionWaiter)
+
+def hashable(value):
+    # Parâmetros JSON (listas) viram tuplas: o IOWorker usa (método, argumentos) como chave de compartilhamento
+    if isinstance(value, list):
+        return tuple(hashable(item) for item in value)
+    return value
+
+class MotionServer:
+    def __init__(self, device, axes=(1, 2, 3), rate=10.0, coalesce=True, max_waits=8):
+        self.worker = IOWorker(device)
+        self.waiter = MotionWaiter(self.worker)
+        self.axes = tuple(str(axis) for axis in axes)
+        self.rate = rate  # Atualizações de posição por segundo para os assinantes
+        self.coalesce = coalesce  # False: cada pedido é uma transação (para comparação)
+        self.subscribers = set()
+        self.clients = 0
+        self.requests = 0
+        self.updates = 0  # Ciclos de posição publicados
+        self._waits = ThreadPoolExecutor(max_workers=max_waits)  # Esperas de movimento bloqueantes
+        self._servers = []
+        self._publisher = None
+
+    async def start_unix(self, path=SOCKET_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(path)  # Sobra de uma execução anterior
+        self._servers.append(await asyncio.start_unix_server(self.handle, path))
+        self._start_publisher()
+        print(f"Servidor do ESP300 em {path}")
+
+    async def start_tcp(self, host="127.0.0.1", port=9301):
+        self._servers.append(await asyncio.start_server(self.handle, host, port))
+        self._start_publisher()
+        print(f"Servidor do ESP300 em {host}:{port}")
+
+    def _start_publisher(self):
+        if self._publisher is None:
+            self._publisher = asyncio.get_running_loop().create_task(self.publish())
+
+    async def close(self):
+        if self._publisher is not None:
+            self._publisher.cancel()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._waits.shutdown(wait=False, cancel_futures=True)
+        self.worker.close()
+
+    async def handle(self, reader, writer):
+        self.clients += 1
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    self.send(writer, {"id": None, "error": "JSON inválido"})
+                    continue
+                # Cada pedido numa tarefa: um cliente pode mandar vários sem esperar as respostas
+                task = asyncio.create_task(self.dispatch(message, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.subscribers.discard(writer)
+            self.clients -= 1
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    def send(self, writer, message):
+        if not writer.is_closing():
+            writer.write(json.dumps(message).encode() + b"\n")
+
+    async def dispatch(self, message, writer):
+        self.requests += 1
+        identifier = message.get("id")
+        method = message.get("method")
+        params = message.get("params") or []
+        try:
+            if method == "subscribe":
+                self.subscribers.add(writer)
+                result = {"axes": self.axes, "rate": self.rate}
+            elif method == "unsubscribe":
+                self.subscribers.discard(writer)
+                result = True
+            else:
+                result = await self.call(method, [hashable(param) for param in params])
+            reply = {"id": identifier, "result": result}
+        except Exception as e:
+            reply = {"id": identifier, "error": f"{type(e).__name__}: {e}"}
+        self.send(writer, reply)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def call(self, method, params):
+        if method == "query":
+            command = params[0]
+            shared = self.coalesce and is_read_only(command)
+            # Como IOWorker.poll: só (comando,) nos argumentos; o IOWorker só junta no lote as consultas de um valor
+            future = self.worker.submit("query", command, priority=PRIORITY_POLL if shared else PRIORITY_COMMAND,
+                                        coalesce=shared)
+        elif method in QUEUED:
+            priority, shared = QUEUED[method]
+            shared = shared and self.coalesce
+            if priority == PRIORITY_POLL and not shared:
+                priority = PRIORITY_COMMAND
+            future = self.worker.submit(method, *params, priority=priority, coalesce=shared)
+        elif method in WAITED:
+            # move_all recebe {eixo: posição}, com os eixos como texto (chaves JSON)
+            future = self._waits.submit(getattr(self.waiter, method), *params)
+        else:
+            raise ValueError(f"Método desconhecido: {method}")
+        return await asyncio.wrap_future(future)
+
+    async def publish(self):
+        # Uma leitura por ciclo para todos os assinantes; sem assinantes, o barramento fica livre
+        period = 1 / self.rate
+        while True:
+            started = time.monotonic()
+            if self.subscribers:
+                try:
+                    positions = await asyncio.wrap_future(self.worker.submit(
+                        "get_positions", self.axes, priority=PRIORITY_POLL, coalesce=self.coalesce))
+                except Exception as e:
+                    print(f"Erro ao ler as posições para os assinantes: {e}")
+                else:
+                    positions["t"] = time.time()
+                    message = json.dumps({"method": "positions", "params": positions}).encode() + b"\n"
+                    for writer in list(self.subscribers):
+                        if writer.is_closing():
+                            self.subscribers.discard(writer)
+                        elif writer.transport.get_write_buffer_size() < MAX_BACKLOG:
+                            writer.write(message)  # Assinante lento perde atualizações em vez de atrasar os outros
+                    self.updates += 1
+            await asyncio.sleep(max(period - (time.monotonic() - started), 0))
+
+class MotionClient:
+    # Cliente bloqueante simples, para scripts: MotionClient().call("query", "1TP?")
+    def __init__(self, address=SOCKET_PATH, timeout=30):
+        if ':' in address and not address.startswith('/'):
+            host, port = address.rsplit(':', 1)
+            self.socket = socket.create_connection((host, int(port)), timeout)
+        else:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(address)
+        self.file = self.socket.makefile("rwb")
+        self._ids = itertools.count(1)
+        self.updates = []  # Atualizações recebidas enquanto se esperava uma resposta
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def _read(self):
+        line = self.file.readline()
+        if not line:
+            raise ConnectionError("Servidor do ESP300 encerrou a conexão")
+        return json.loads(line)
+
+    def call(self, method, *params):
+        identifier = next(self._ids)
+        self.file.write(json.dumps({"id": identifier, "method": method, "params": list(params)}).encode() + b"\n")
+        self.file.flush()
+        while True:
+            message = self._read()
+            if message.get("id") == identifier:
+                if "error" in message:
+                    raise RuntimeError(message["error"])
+                return message["result"]
+            if message.get("method") == "positions":
+                self.updates.append(message["params"])
+
+    def query(self, command):
+        return self.call("query", command)
+
+    def subscribe(self):
+        # Gerador infinito das posições enviadas pelo servidor
+        self.call("subscribe")
+        while True:
+            while self.updates:
+                yield self.updates.pop(0)
+            message = self._read()
+            if message.get("method") == "positions":
+                yield message["params"]
+
+def main():
+    from controleESP300 import open_esp300
+
+    parser = argparse.ArgumentParser(description="Servidor local que compartilha um ESP300 entre vários programas")
+    parser.add_argument("--porta", default="/dev/ttyUSB0", help="Porta serial ou recurso VISA do ESP300")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="Caminho do socket Unix")
+    parser.add_argument("--tcp", help="Escuta também em TCP, ex.: 127.0.0.1:9301")
+    parser.add_argument("--taxa", type=float, default=10.0, help="Atualizações de posição por segundo para os assinantes")
+    args = parser.parse_args()
+
+    async def serve():
+        server = MotionServer(open_esp300(args.porta), rate=args.taxa)
+        await server.start_unix(args.socket)
+        if args.tcp:
+            host, port = args.tcp.rsplit(':', 1)
+            await server.start_tcp(host, int(port))
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print("Servidor encerrado.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import math
+import threading
+import time
+
+import numpy as np
+
+# Espera de fim de movimento guiada por um modelo trapezoidal de velocidade: dorme até pouco antes
+# do fim previsto e só então consulta MD? em intervalos curtos, com prazo limite
+
+def predict_move_time(distance, velocity, acceleration, deceleration):
+    distance = abs(distance)
+    if distance == 0 or velocity <= 0:
+        return 0.0
+    # Aceleração zero é tratada como instantânea
+    accel_distance = velocity ** 2 / (2 * acceleration) if acceleration > 0 else 0.0
+    decel_distance = velocity ** 2 / (2 * deceleration) if deceleration > 0 else 0.0
+    accel_time = velocity / acceleration if acceleration > 0 else 0.0
+    decel_time = velocity / deceleration if deceleration > 0 else 0.0
+    if accel_distance + decel_distance <= distance:
+        return accel_time + decel_time + (distance - accel_distance - decel_distance) / velocity
+    # Perfil triangular: não chega à velocidade máxima
+    inverse = (1 / acceleration if acceleration > 0 else 0.0) + (1 / deceleration if deceleration > 0 else 0.0)
+    peak = math.sqrt(2 * distance / inverse)
+    return peak * inverse
+
+def predict_move_times(distances, velocity, acceleration, deceleration):
+    # Versão vetorizada de predict_move_time; aceita arrays que se combinam por broadcasting
+    distances = np.abs(np.asarray(distances, dtype=float))
+    velocity = np.asarray(velocity, dtype=float)
+    acceleration = np.where(np.asarray(acceleration, dtype=float) > 0, acceleration, np.inf)
+    deceleration = np.where(np.asarray(deceleration, dtype=float) > 0, deceleration, np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ramps = velocity ** 2 / (2 * acceleration) + velocity ** 2 / (2 * deceleration)
+        trapezoid = velocity / acceleration + velocity / deceleration + (distances - ramps) / velocity
+        peak = np.sqrt(2 * distances / (1 / acceleration + 1 / deceleration))
+        triangle = peak / acceleration + peak / deceleration
+        times = np.where(ramps <= distances, trapezoid, triangle)
+    return np.where((distances == 0) | (velocity <= 0), 0.0, times)
+
+class MotionWaiter:
+    def __init__(self, device, margin=0.02, poll_interval=0.005, timeout_factor=1.5, min_timeout=2.0, time_scale=1.0):
+        self.device = device
+        self.time_scale = time_scale  # Relógio do controlador / relógio do host; > 1 só com o simulador acelerado
+        self.margin = margin  # Antecedência do primeiro MD? em relação ao fim previsto (s)
+        self.poll_interval = poll_interval  # Intervalo entre consultas MD? depois disso (s)
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout  # Folga mínima além do tempo previsto (s)
+        self._parameters = {}  # eixo -> (VA, AC, AG)
+        self._groups = {}  # grupo de interpolação -> (eixos, (HV, HA, HD)) já enviados ao controlador
+        self._lock = threading.Lock()
+        # Pela thread de I/O, MD? entra como polling e cede a vez a comandos e paradas
+        self._poll = getattr(device, "poll", device.query)
+
+    def parameters(self, axis):
+        axis = str(axis)
+        with self._lock:
+            if axis in self._parameters:
+                return self._parameters[axis]
+        responses = self.device.query_many([f"{axis}VA?", f"{axis}AC?", f"{axis}AG?"])
+        try:
+            parameters = tuple(float(response) for response in responses)
+        except (TypeError, ValueError):
+            print(f"Não foi possível ler VA/AC/AG do eixo {axis}: {responses}")
+            return None
+        with self._lock:
+            self._parameters[axis] = parameters
+        return parameters
+
+    def invalidate(self, axis=None):
+        # Chamar sempre que VA, AC ou AG forem alterados por fora
+        with self._lock:
+            if axis is None:
+                self._parameters.clear()
+            else:
+                self._parameters.pop(str(axis), None)
+            self._groups.clear()  # O perfil dos grupos vem de VA/AC/AG: redefinidos no próximo uso
+
+    def predict(self, axis, distance):
+        parameters = self.parameters(axis)
+        if parameters is None:
+            return None
+        return predict_move_time(distance, *parameters) / self.time_scale
+
+    def wait(self, axis, distance, started=None, timeout=None):
+        started = time.monotonic() if started is None else started
+        predicted = self.predict(axis, distance)
+        if predicted is None:
+            predicted = 0.0  # Sem modelo: começa a consultar imediatamente
+        if timeout is None:
+            timeout = max(predicted * self.timeout_factor, predicted + self.min_timeout)
+        deadline = started + timeout
+
+        remaining = started + predicted - self.margin - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        command = f"{axis}MD?"
+        while True:
+            if self._poll(command) == "1":
+                return True
+            if time.monotonic() >= deadline:
+                print(f"Eixo {axis} não terminou o movimento em {timeout:.3f} s")
+                return False
+            time.sleep(self.poll_interval)
+
+    def wait_many(self, distances, started=None, timeout=None):
+        # Espera vários eixos de uma vez: dorme pelo mais demorado e consulta todos os MD? numa só linha
+        started = time.monotonic() if started is None else started
+        predictions = [self.predict(axis, distance) for axis, distance in distances.items()]
+        predicted = max((prediction or 0.0 for prediction in predictions), default=0.0)
+        return self._wait_stopped(tuple(distances), predicted, started, timeout)
+
+    def _wait_stopped(self, axes, predicted, started, timeout=None):
+        if timeout is None:
+            timeout = max(predicted * self.timeout_factor, predicted + self.min_timeout)
+        deadline = started + timeout
+
+        remaining = started + predicted - self.margin - time.monotonic()
+        if remaining > 0:
+            time.sleep(remaining)
+        commands = tuple(f"{axis}MD?" for axis in axes)
+        read = getattr(self.device, "poll_many", self.device.query_many)
+        while True:
+            if all(status == "1" for status in read(commands)):
+                return True
+            if time.monotonic() >= deadline:
+                print(f"Eixos {', '.join(str(axis) for axis in axes)} não terminaram o movimento em {timeout:.3f} s")
+                return False
+            time.sleep(self.poll_interval)
+
+    def define_group(self, axes, group=1):
+        # Define (uma vez por conjunto de eixos) o grupo de interpolação com o perfil do eixo mais
+        # limitado, para nenhum eixo passar do seu VA/AC/AG; retorna (velocidade, aceleração, desaceleração)
+        axes = tuple(str(axis) for axis in axes)
+        with self._lock:
+            if group in self._groups and self._groups[group][0] == axes:
+                return self._groups[group][1]
+        parameters = [self.parameters(axis) for axis in axes]
+        if None in parameters:
+            return None
+        profile = tuple(min(values) for values in zip(*parameters))
+        self.device.define_group(group, axes, *profile)
+        with self._lock:
+            self._groups[group] = (axes, profile)
+        return profile
+
+    def move_all(self, targets, group=1, current=None, timeout=None):
+        # targets: eixo -> posição absoluta. Uma só linha HL para todos os eixos e uma só espera.
+        # O perfil da reta é escalado para o eixo de maior deslocamento (em relação ao seu VA/AC/AG)
+        # andar no seu próprio perfil: o grupo termina no tempo do movimento mais longo, e nenhum
+        # eixo passa dos seus limites. current (posições na ordem de targets) evita ler TP?
+        axes = tuple(str(axis) for axis in targets)
+        profile = self.define_group(axes, group)
+        if profile is None:
+            print(f"Grupo {group} não definido; movimento cancelado.")
+            return False
+        try:
+            if current is None:
+                current = self.device.query_many([f"{axis}TP?" for axis in axes])
+            deltas = [abs(float(target) - float(position)) for target, position in zip(targets.values(), current)]
+        except (TypeError, ValueError):
+            deltas = None  # Posição atual desconhecida: perfil padrão do grupo, consulta MD? desde o início
+        length = math.sqrt(sum(delta ** 2 for delta in deltas)) if deltas else 0.0
+        if deltas is not None and length == 0:
+            return True  # Já está no destino
+        if length > 0:
+            profile = tuple(min(limit * length / delta for limit, delta in zip(limits, deltas) if delta > 0)
+                            for limits in zip(*(self.parameters(axis) for axis in axes)))
+        predicted = predict_move_time(length, *profile) / self.time_scale
+        started = time.monotonic()
+        self.device.move_group(group, list(targets.values()), False, profile if length > 0 else None)
+        return self._wait_stopped(axes, predicted, started, timeout)
+
+    def move_to(self, axis, position):
+        try:
+            distance = float(position) - float(self.device.get_position(axis))
+        except (TypeError, ValueError):
+            distance = 0.0  # Posição atual desconhecida: consulta MD? desde o início
+        started = time.monotonic()
+        self.device.move_to(axis, position, wait=False)
+        return self.wait(axis, distance, started)
+
+    def move_relative(self, axis, increment):
+        started = time.monotonic()
+        self.device.move_relative(axis, increment, wait=False)
+        return self.wait(axis, float(increment), started)
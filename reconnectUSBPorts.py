@@ -12,11 +12,20 @@ def reload_device(device):
     except subprocess.CalledProcessError as e:
         print(f"Erro ao recarregar o dispositivo: {e}")
 
-# Substitua pelos caminhos corretos para os dispositivos USB
-tty_device = '/dev/ttyUSB0'
-gpib_device = '/dev/GPIB0'
+def power_cycle(hub, port, off_time=5):
+    # Mesmo procedimento de turnOnOffGPIP.sh; sudo -n falha em vez de pedir senha quando chamado
+    # de dentro do programa (uhubctl precisa estar liberado no sudoers)
+    subprocess.run(['sudo', '-n', 'uhubctl', '-l', str(hub), '-p', str(port), '-a', 'off'], check=True)
+    time.sleep(off_time)
+    subprocess.run(['sudo', '-n', 'uhubctl', '-l', str(hub), '-p', str(port), '-a', 'on'], check=True)
+    print(f"Porta {port} do hub {hub} religada.")
 
-# Recarregar os dispositivos USB
-reload_device(tty_device)
-time.sleep(2)  # Esperar um momento
-reload_device(gpib_device)
+if __name__ == "__main__":
+    # Substitua pelos caminhos corretos para os dispositivos USB
+    tty_device = '/dev/ttyUSB0'
+    gpib_device = '/dev/GPIB0'
+
+    # Recarregar os dispositivos USB
+    reload_device(tty_device)
+    time.sleep(2)  # Esperar um momento
+    reload_device(gpib_device)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import time
+
+import numpy as np
+
+from esp300Protocol import format_number
+from motionWait import MotionWaiter, predict_move_times
+
+# Varreduras sobre os eixos 1 a 3: geração vetorizada dos pontos, ordenação para reduzir o tempo
+# total de deslocamento e execução ponto a ponto com um gancho de medição em cada ponto
+
+def raster(*axes_values):
+    # Produto cartesiano dos valores de cada eixo; o primeiro eixo varia mais rápido (linhas ao longo do eixo 1)
+    grids = np.meshgrid(*[np.asarray(values, dtype=float) for values in reversed(axes_values)], indexing="ij")
+    return np.stack([grid.ravel() for grid in reversed(grids)], axis=1)
+
+def serpentine(*axes_values):
+    # Como raster, mas percorrendo o primeiro eixo em sentidos alternados a cada linha
+    points = raster(*axes_values)
+    line = len(axes_values[0])
+    rows = points.reshape(-1, line, points.shape[1])
+    rows[1::2] = rows[1::2, ::-1]
+    return rows.reshape(-1, points.shape[1])
+
+def spiral(center, radius, step, fixed=()):
+    # Espiral de Arquimedes nos dois primeiros eixos com passo radial e espaçamento ~step entre pontos;
+    # 'fixed' acrescenta valores constantes para os demais eixos
+    turns = radius / step
+    length = np.pi * step * turns ** 2  # Comprimento aproximado da espiral
+    count = max(int(length / step), 1)
+    theta = 2 * np.pi * np.sqrt(np.linspace(0, 1, count + 1)) * turns
+    r = step * theta / (2 * np.pi)
+    points = np.column_stack((center[0] + r * np.cos(theta), center[1] + r * np.sin(theta)))
+    if fixed:
+        points = np.column_stack((points, np.tile(np.asarray(fixed, dtype=float), (len(points), 1))))
+    return points
+
+def travel_times(origin, points, parameters):
+    # Tempo de ida de 'origin' até cada ponto: os eixos se movem juntos, vale o mais lento
+    velocity, acceleration, deceleration = np.asarray(parameters, dtype=float).T
+    return predict_move_times(points - origin, velocity, acceleration, deceleration).max(axis=1)
+
+def order_points(points, start, parameters):
+    # Vizinho mais próximo em tempo de deslocamento, começando da posição atual
+    points = np.asarray(points, dtype=float)
+    remaining = np.ones(len(points), dtype=bool)
+    order = np.empty(len(points), dtype=int)
+    current = np.asarray(start, dtype=float)
+    for index in range(len(points)):
+        times = travel_times(current, points, parameters)
+        times[~remaining] = np.inf
+        chosen = int(np.argmin(times))
+        order[index] = chosen
+        remaining[chosen] = False
+        current = points[chosen]
+    return order
+
+MAX_ORDERED_POINTS = 1000  # Acima disso a ordenação (O(N²)) custaria mais do que costuma economizar
+
+def best_order(points, start, parameters, max_points=MAX_ORDERED_POINTS):
+    # Ordem do vizinho mais próximo só se o tempo previsto for menor que o da ordem dada: raster e
+    # serpentina já são quase ótimos e o guloso pode piorá-los. Retorna (ordem, tempo previsto)
+    order = np.arange(len(points))
+    predicted = total_travel_time(points, start, parameters)
+    if 2 < len(points) <= max_points:
+        greedy = order_points(points, start, parameters)
+        greedy_time = total_travel_time(points[greedy], start, parameters)
+        if greedy_time < predicted:
+            return greedy, greedy_time
+    return order, predicted
+
+def total_travel_time(points, start, parameters):
+    path = np.vstack((np.asarray(start, dtype=float), points))
+    velocity, acceleration, deceleration = np.asarray(parameters, dtype=float).T
+    return float(predict_move_times(np.diff(path, axis=0), velocity, acceleration, deceleration).max(axis=1).sum())
+
+class ScanEngine:
+    def __init__(self, device, axes=(1, 2, 3), waiter=None, interpolate=False):
+        self.device = device
+        self.axes = tuple(axes)
+        self.waiter = waiter if waiter is not None else MotionWaiter(device)
+        # True: cada ponto é um movimento em linha reta do grupo de interpolação (HL), com os eixos
+        # chegando juntos; False: PA independentes por eixo, partindo na mesma linha
+        self.interpolate = interpolate
+
+    def parameters(self):
+        # Uma linha (VA, AC, AG) por eixo
+        return [self.waiter.parameters(axis) for axis in self.axes]
+
+    def current_position(self):
+        responses = self.device.query_many([f"{axis}TP?" for axis in self.axes])
+        return np.array([float(response) for response in responses])
+
+    def run(self, points, measure=None, optimize=True):
+        points = np.asarray(points, dtype=float)
+        if points.ndim != 2 or points.shape[1] != len(self.axes):
+            raise ValueError(f"Esperado um array (N, {len(self.axes)}) de pontos")
+        parameters = self.parameters()
+        position = self.current_position()
+        if optimize:
+            order, predicted = best_order(points, position, parameters)
+        else:
+            order = np.arange(len(points))
+            predicted = total_travel_time(points, position, parameters)
+        points = points[order]
+
+        results = []
+        start = time.monotonic()
+        for index, point in enumerate(points):
+            # Todos os eixos que mudam partem na mesma linha de comando e são esperados juntos
+            moved = {axis: target - current for axis, target, current in zip(self.axes, point, position) if target != current}
+            if moved and self.interpolate and len(moved) > 1:
+                if not self.waiter.move_all(dict(zip(self.axes, point)), current=position):
+                    raise TimeoutError(f"Movimento para o ponto {index} ({point}) não terminou")
+            elif moved:
+                started = time.monotonic()
+                self.device.write_many([f"{axis}PA{format_number(point[self.axes.index(axis)])}" for axis in moved])
+                if not self.waiter.wait_many(moved, started):
+                    raise TimeoutError(f"Movimento para o ponto {index} ({point}) não terminou")
+            position = point
+            results.append(measure(index, point) if measure is not None else None)
+        elapsed = time.monotonic() - start
+
+        return {
+            "points": points,
+            "order": order,
+            "results": results,
+            "elapsed": elapsed,
+            "predicted_travel": predicted,
+            "points_per_minute": 60 * len(points) / elapsed if elapsed > 0 else float("inf"),
+        }
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+import csv
+import json
+import sys
+import time
+
+from esp300Protocol import COMMAND_SEPARATOR, pack_commands, format_number
+
+# Execução de sequências de movimento sem interface, para trabalhos longos em máquinas sem display.
+# Os passos são lidos do arquivo (ou da entrada padrão) à medida que são executados, então o tamanho
+# da sequência não importa: só o corpo dos laços fica em memória. Comandos seguidos que não
+# esperam resposta (movimentos, parâmetros, comandos livres) são acumulados e enviados juntos, em
+# linhas com ';', no próximo passo que precisa do controlador (espera, consulta, medição).
+#
+# Passos (objetos JSON, um por linha ou numa lista, ou linhas CSV com cabeçalho action,axis,value):
+#   move / move_relative   eixo, posição ou incremento          -> nPA / nPR
+#   velocity / acceleration / deceleration   eixo, valor         -> nVA / nAC / nAG
+#   command                comando livre; se terminar em '?', a resposta é registrada
+#   wait                   eixo ou eixos ("1,2"), value = prazo em s (padrão 600)
+#   dwell                  value = segundos de pausa no host
+#   position               eixo ou eixos: registra TP
+#   measure                chama o gancho de medição (padrão: registra as posições de todos os eixos)
+#   loop / end             value = repetições do trecho até o end correspondente (pode aninhar)
+
+PARAMETERS = {"velocity": "VA", "acceleration": "AC", "deceleration": "AG"}
+PIPELINED = {"move", "move_relative", "velocity", "acceleration", "deceleration"}
+WAIT_TIMEOUT = 600.0  # Prazo padrão de um passo wait (s)
+MAX_PENDING = 64  # Comandos acumulados no máximo antes de enviar, mesmo sem um passo que espere
+
+def read_json(stream):
+    # Uma lista JSON ([{...}, {...}]) ou um objeto por linha, decodificados aos poucos
+    decoder = json.JSONDecoder()
+    buffer = ""
+    for chunk in iter(lambda: stream.read(65536), ""):
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,[]":
+                position += 1
+            if position >= len(buffer):
+                break
+            try:
+                step, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break  # Objeto incompleto: espera o próximo bloco
+            yield step
+            position = end
+        buffer = buffer[position:]
+    if buffer.strip(" \t\r\n,[]"):
+        raise ValueError(f"JSON inválido no fim da sequência: {buffer[:80]!r}")
+
+def read_csv(stream):
+    for row in csv.DictReader(line for line in stream if line.strip() and not line.lstrip().startswith('#')):
+        yield {key.strip(): value.strip() for key, value in row.items() if key and value not in (None, "")}
+
+def read_steps(stream, format=None):
+    # format: "json", "csv" ou None (decide pelo primeiro caractere: '[' ou '{' é JSON)
+    if format is None:
+        first = stream.read(1)
+        while first.isspace():
+            first = stream.read(1)
+        format = "json" if first in "[{" else "csv"
+        stream = _Prefixed(first, stream)
+    return read_json(stream) if format == "json" else read_csv(stream)
+
+class _Prefixed:
+    # Devolve à frente do fluxo o caractere já lido para decidir o formato (stdin não volta atrás)
+    def __init__(self, prefix, stream):
+        self.prefix = prefix
+        self.stream = stream
+
+    def read(self, size=-1):
+        prefix, self.prefix = self.prefix, ""
+        return prefix + self.stream.read(size) if prefix else self.stream.read(size)
+
+    def __iter__(self):
+        prefix, self.prefix = self.prefix, ""
+        first = next(iter(self.stream), "")
+        yield prefix + first
+        yield from self.stream
+
+def open_steps(path, format=None):
+    # "-" lê da entrada padrão; o formato vem da extensão quando não é informado
+    if path == "-":
+        return read_steps(sys.stdin, format)
+    if format is None and path.lower().endswith((".csv", ".json", ".jsonl")):
+        format = "csv" if path.lower().endswith(".csv") else "json"
+    return _close_after(open(path, newline=""), format)
+
+def _close_after(file, format):
+    with file:
+        yield from read_steps(file, format)
+
+def expand(steps):
+    # Desenrola os laços; só o corpo de um laço é guardado, o resto passa direto
+    depth = 0
+    body = []
+    count = 0
+    for step in steps:
+        action = step.get("action")
+        if action == "loop":
+            if depth == 0:
+                count = int(step.get("value", step.get("count", 1)))
+                body = []
+            else:
+                body.append(step)
+            depth += 1
+        elif action == "end":
+            depth -= 1
+            if depth < 0:
+                raise ValueError("end sem loop correspondente")
+            if depth == 0:
+                for _ in range(count):
+                    yield from expand(body)
+            else:
+                body.append(step)
+        elif depth > 0:
+            body.append(step)
+        else:
+            yield step
+    if depth > 0:
+        raise ValueError("loop sem end correspondente")
+
+def axes_of(step, default=(1, 2, 3)):
+    axis = step.get("axis")
+    if axis in (None, ""):
+        return tuple(str(axis) for axis in default)
+    return tuple(part.strip() for part in str(axis).split(',') if part.strip())
+
+class SequenceRunner:
+    def __init__(self, device, axes=(1, 2, 3), measure=None, report=None, pipeline=True, poll_interval=0.01):
+        self.device = device  # esp300commands.ESP300 (ou qualquer objeto com write, ask e query_many)
+        self.axes = tuple(axes)
+        self.measure = measure if measure is not None else self.positions  # gancho(step) -> resultado
+        self.report = report  # Arquivo de texto para o CSV com o tempo de cada passo; None só resume
+        self.pipeline = pipeline  # False envia cada comando na hora (para comparação)
+        self.poll_interval = poll_interval
+        self._pending = []  # (índice, passo, comando) ainda não enviados
+        self._writer = csv.writer(report) if report is not None else None
+        if self._writer is not None:
+            self._writer.writerow(["indice", "acao", "eixo", "valor", "inicio_s", "duracao_ms", "resultado"])
+        self.durations = {}  # ação -> [quantidade, soma, máximo] das durações (s), sem guardar cada passo
+        self.count = 0
+        self._start = None
+
+    def positions(self, step=None):
+        values = self.device.query_many([f"{axis}TP?" for axis in self.axes])
+        return dict(zip((str(axis) for axis in self.axes), values))
+
+    def run(self, steps):
+        self._start = time.monotonic()
+        for index, step in enumerate(expand(steps)):
+            self.execute(index, step)
+        self.flush()
+        return self.summary()
+
+    def execute(self, index, step):
+        action = step.get("action")
+        command = self.command_for(step)
+        if action in PIPELINED or (action == "command" and not command.endswith('?')):
+            self._pending.append((index, step, command))
+            if not self.pipeline or len(self._pending) >= MAX_PENDING:
+                self.flush()
+            return
+        self.flush()
+        started = time.monotonic()
+        result = self.perform(step, command)
+        self._record(index, step, started, time.monotonic(), result)
+
+    def command_for(self, step):
+        action = step.get("action")
+        axis = step.get("axis", "")
+        if action == "move":
+            return f"{axis}PA{format_number(step['value'])}"
+        if action == "move_relative":
+            return f"{axis}PR{format_number(step['value'])}"
+        if action in PARAMETERS:
+            return f"{axis}{PARAMETERS[action]}{format_number(step['value'])}"
+        if action == "command":
+            return str(step["value"]).strip()
+        return None
+
+    def perform(self, step, command):
+        action = step.get("action")
+        if action == "wait":
+            return self.wait(axes_of(step, self.axes), float(step.get("value", WAIT_TIMEOUT)))
+        if action == "dwell":
+            time.sleep(float(step.get("value", 0)))
+            return None
+        if action == "position":
+            axes = axes_of(step, self.axes)
+            return dict(zip(axes, self.device.query_many([f"{axis}TP?" for axis in axes])))
+        if action == "measure":
+            return self.measure(step)
+        if action == "command":
+            self.device.invalidate_cache()  # Um comando livre pode alterar qualquer parâmetro
+            return self.device.ask(command).strip()
+        raise ValueError(f"Passo desconhecido: {step}")
+
+    def wait(self, axes, timeout):
+        # Todos os MD? numa só linha por consulta, até todos os eixos pararem
+        deadline = time.monotonic() + timeout
+        commands = [f"{axis}MD?" for axis in axes]
+        while True:
+            if all(status == "1" for status in self.device.query_many(commands)):
+                return True
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Eixos {', '.join(axes)} não terminaram o movimento em {timeout} s")
+            time.sleep(self.poll_interval)
+
+    def flush(self):
+        # Envia os comandos acumulados no menor número de linhas; todos os passos do lote dividem o tempo
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        started = time.monotonic()
+        for line in pack_commands([command for _, _, command in pending]):
+            self.device.write(COMMAND_SEPARATOR.join(line))
+        ended = time.monotonic()
+        # O cache de VA/AC/AG do driver volta a ler do controlador; um comando livre pode mudar qualquer eixo
+        if any(step.get("action") == "command" for _, step, _ in pending):
+            self.device.invalidate_cache()
+        else:
+            for axis in {str(step.get("axis")) for _, step, _ in pending if step.get("action") in PARAMETERS}:
+                self.device.invalidate_cache(axis)
+        share = (ended - started) / len(pending)
+        for index, step, _ in pending:
+            self._record(index, step, started, started + share, None)
+
+    def _record(self, index, step, started, ended, result):
+        action = step.get("action")
+        self.count += 1
+        totals = self.durations.setdefault(action, [0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += ended - started
+        totals[2] = max(totals[2], ended - started)
+        if self._writer is not None:
+            self._writer.writerow([index, action, step.get("axis", ""), step.get("value", ""),
+                                   f"{started - self._start:.6f}", f"{(ended - started) * 1000:.3f}",
+                                   "" if result is None else json.dumps(result)])
+
+    def summary(self):
+        elapsed = time.monotonic() - self._start
+        actions = {action: {"count": count, "mean_ms": total / count * 1000, "max_ms": longest * 1000}
+                   for action, (count, total, longest) in self.durations.items()}
+        return {"steps": self.count, "elapsed": elapsed, "actions": actions}
+
+def print_summary(summary):
+    print(f"{summary['steps']} passos em {summary['elapsed']:.3f} s")
+    for action, values in sorted(summary["actions"].items()):
+        print(f"  {action:<14} n={values['count']:<7} média={values['mean_ms']:9.3f} ms  máx={values['max_ms']:9.3f} ms")
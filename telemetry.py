@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+import numpy as np
+
+# Amostragem contínua das posições (TP) e do estado de movimento (MD) dos eixos num buffer circular
+# NumPy pré-alocado: o buffer não cresce nem aloca memória por amostra, mesmo em execuções de horas
+
+class RingBuffer:
+    def __init__(self, capacity, columns):
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        # Uma linha a mais: a próxima amostra é escrita fora do lock (row() ... commit()), numa linha
+        # que nunca está entre as que snapshot() e since() devolvem
+        self.slots = capacity + 1
+        self.data = np.full((self.slots, len(self.columns)), np.nan)
+        self.count = 0  # Total de amostras já escritas
+        self._condition = threading.Condition()
+
+    def row(self):
+        # Linha onde a próxima amostra deve ser escrita antes de commit()
+        return self.data[self.count % self.slots]
+
+    def commit(self):
+        with self._condition:
+            self.count += 1
+            self._condition.notify_all()
+
+    def snapshot(self):
+        # Cópia em ordem cronológica das amostras ainda no buffer
+        with self._condition:
+            count = self.count
+            if count <= self.capacity:
+                return self.data[:count].copy()
+            return self.data[np.arange(count - self.capacity, count) % self.slots]
+
+    def latest(self):
+        with self._condition:
+            if self.count == 0:
+                return None
+            return self.data[(self.count - 1) % self.slots].copy()
+
+    def since(self, position):
+        # Amostras escritas depois de 'position' (um valor anterior de count); as que já foram
+        # sobrescritas se perdem. Retorna também a nova posição.
+        with self._condition:
+            count = self.count
+            position = max(position, count - self.capacity)
+            indices = np.arange(position, count) % self.slots
+            return self.data[indices], count
+
+    def wait(self, position, timeout=None):
+        with self._condition:
+            return self._condition.wait_for(lambda: self.count > position, timeout)
+
+class PositionSampler:
+    def __init__(self, device, axes=(1, 2, 3), rate=10.0, capacity=100000, status=True, velocity=False, sinks=()):
+        self.device = device
+        self.axes = tuple(axes)
+        self.rate = rate  # Amostras por segundo; 0 lê o mais rápido possível
+        self.commands = [f"{axis}TP?" for axis in self.axes]
+        columns = ["time"] + [f"position{axis}" for axis in self.axes]
+        if velocity:
+            self.commands += [f"{axis}TV?" for axis in self.axes]
+            columns += [f"velocity{axis}" for axis in self.axes]
+        if status:
+            self.commands += [f"{axis}MD?" for axis in self.axes]
+            columns += [f"done{axis}" for axis in self.axes]
+        self.commands = tuple(self.commands)  # Mesma tupla a cada leitura: a linha codificada fica em cache
+        self.buffer = RingBuffer(capacity, columns)
+        self.sinks = list(sinks)  # Recebem cada amostra, ex.: TelemetryRecorder.append
+        self.overruns = 0  # Amostras atrasadas em relação ao período configurado
+        # Pela thread de I/O, a leitura entra como polling e cede a vez a comandos e paradas
+        self._read = getattr(device, "poll_many", device.query_many)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="ESP300-telemetria", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        period = 1.0 / self.rate if self.rate > 0 else 0.0
+        next_sample = time.monotonic()
+        while self._running:
+            self.sample()
+            if period == 0:
+                continue
+            next_sample += period
+            delay = next_sample - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Atrasado: pula os instantes perdidos em vez de acumular rajadas
+                self.overruns += 1
+                next_sample = time.monotonic()
+
+    def sample(self):
+        try:
+            responses = self._read(self.commands)
+        except Exception as e:
+            print(f"Erro na leitura de telemetria: {e}")
+            return
+        row = self.buffer.row()
+        row[0] = time.time()
+        for index, response in enumerate(responses, 1):
+            try:
+                row[index] = float(response)
+            except (TypeError, ValueError):
+                row[index] = np.nan
+        self.buffer.commit()
+        for sink in self.sinks:
+            sink(row)
+
+    def snapshot(self):
+        return self.buffer.snapshot()
+
+    def latest(self):
+        return self.buffer.latest()
+
+    def __iter__(self):
+        # Entrega cada amostra nova (cópia) enquanto o amostrador estiver rodando
+        position = self.buffer.count
+        while self._running or position < self.buffer.count:
+            if not self.buffer.wait(position, timeout=0.5):
+                continue
+            samples, position = self.buffer.since(position)
+            yield from samples
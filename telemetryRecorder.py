@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+import json
+import mmap
+import queue
+import struct
+import threading
+
+import numpy as np
+
+# Gravação contínua de amostras de telemetria num arquivo binário mapeado em memória.
+#
+# Formato: cabeçalho de HEADER_SIZE bytes seguido de linhas float64 de tamanho fixo, em ordem de
+# tempo. O arquivo cresce em blocos de chunk_rows linhas. O cabeçalho guarda o número de linhas já
+# gravadas, atualizado só depois dos dados, de modo que um leitor pode abrir o arquivo enquanto ele
+# ainda é escrito. Como as linhas têm tamanho fixo e o tempo é crescente, a primeira coluna de cada
+# bloco serve de índice: a busca por intervalo de tempo toca só O(log n) páginas do arquivo.
+
+MAGIC = b"ESP300RC"
+VERSION = 1
+HEADER_SIZE = 4096
+HEADER_FORMAT = "<8sIIIQ"  # magic, versão, colunas, linhas por bloco, linhas gravadas
+ROWS_OFFSET = struct.calcsize("<8sIII")
+
+class TelemetryRecorder:
+    def __init__(self, path, columns, chunk_rows=4096, queue_size=100000):
+        self.path = path
+        self.columns = tuple(columns)
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        self.dropped = 0  # Amostras descartadas porque a fila estava cheia
+        self._row_size = len(self.columns) * 8
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = open(path, "w+b")
+        self._write_header()
+        self._capacity = 0
+        self._map = None
+        self._grow()
+        self._thread = threading.Thread(target=self._run, name="ESP300-gravador", daemon=True)
+        self._thread.start()
+
+    def _write_header(self):
+        names = json.dumps(self.columns).encode()
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(self.columns), self.chunk_rows, 0)
+        if len(header) + 4 + len(names) > HEADER_SIZE:
+            raise ValueError("Nomes de colunas não cabem no cabeçalho")
+        header += struct.pack("<I", len(names)) + names
+        self._file.write(header.ljust(HEADER_SIZE, b"\0"))
+        self._file.flush()
+
+    def _grow(self):
+        # Acrescenta um bloco ao arquivo e refaz o mapeamento
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+        self._capacity += self.chunk_rows
+        self._file.truncate(HEADER_SIZE + self._capacity * self._row_size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._data = np.ndarray((self._capacity, len(self.columns)), dtype=np.float64, buffer=self._map, offset=HEADER_SIZE)
+
+    def append(self, sample):
+        # Nunca bloqueia quem está no laço de I/O; a gravação acontece na thread do gravador
+        try:
+            self._queue.put_nowait(np.array(sample, dtype=np.float64))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            sample = self._queue.get()
+            if sample is None:
+                break
+            batch = [sample]
+            while True:
+                try:
+                    sample = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if sample is None:
+                    self._write(batch)
+                    return
+                batch.append(sample)
+            self._write(batch)
+
+    def _write(self, batch):
+        for sample in batch:
+            if self.rows == self._capacity:
+                self._grow()
+            self._data[self.rows] = sample
+            self.rows += 1
+        # O contador só avança depois que as linhas estão no mapeamento
+        struct.pack_into("<Q", self._map, ROWS_OFFSET, self.rows)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        del self._data
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Recording:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        header = self._file.read(HEADER_SIZE)
+        magic, version, ncolumns, self.chunk_rows, _ = struct.unpack_from(HEADER_FORMAT, header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} não é uma gravação de telemetria do ESP300")
+        (length,) = struct.unpack_from("<I", header, struct.calcsize(HEADER_FORMAT))
+        start = struct.calcsize(HEADER_FORMAT) + 4
+        self.columns = tuple(json.loads(header[start:start + length]))
+        self._ncolumns = ncolumns
+        self.data = None
+        self.refresh()
+
+    def refresh(self):
+        # Mapeia de novo para enxergar as linhas gravadas desde a última chamada
+        self._file.seek(ROWS_OFFSET)
+        (rows,) = struct.unpack("<Q", self._file.read(8))
+        if rows == 0:
+            self.data = np.empty((0, self._ncolumns))
+        else:
+            self.data = np.memmap(self._file, dtype=np.float64, mode="r", offset=HEADER_SIZE, shape=(rows, self._ncolumns))
+        return len(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def index(self):
+        # Tempo da primeira amostra de cada bloco
+        return self.data[::self.chunk_rows, 0]
+
+    def slice(self, start=None, end=None):
+        # Linhas com start <= tempo < end, como vista sobre o arquivo (sem cópia)
+        times = self.data[:, 0]
+        first = 0 if start is None else self._search(times, start)
+        last = len(times) if end is None else self._search(times, end)
+        return self.data[first:last]
+
+    def _search(self, times, value):
+        block = max(int(np.searchsorted(self.index(), value, side="right")) - 1, 0)
+        begin = block * self.chunk_rows
+        end = min(begin + self.chunk_rows, len(times))
+        return begin + int(np.searchsorted(times[begin:end], value))
+
+    def close(self):
+        self.data = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def load(path, start=None, end=None):
+    # Retorna um dicionário coluna -> array NumPy, lido direto do mapeamento
+    recording = Recording(path)
+    rows = recording.slice(start, end)
+    return {name: rows[:, index] for index, name in enumerate(recording.columns)}
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import serial
-import time
+from frameReader import FrameReader
 
 def test_serial(port):
     try:
@@ -32,15 +32,8 @@ def test_serial(port):
         print(f"Enviando: {command}")
         ser.write(command.encode())
         
-        # Adiciona um atraso para garantir que o dispositivo tenha tempo de resposta
-        time.sleep(1)
-        
-        # Lê a resposta do dispositivo, que termina com \r\n
-        response = b''
-        while not response.endswith(b'\r\n'):
-            response += ser.read(1)
-        
-        response = response.decode('ascii', errors='ignore').strip()  # Decodifica e remove espaços em branco
+        # Lê a resposta do dispositivo, que termina com \r\n, em blocos e não byte a byte
+        response = FrameReader(ser).read_text(ser.timeout)  # Decodifica e remove espaços em branco
         print(f"Resposta: {response}")
         
         # Fecha a conexão
@@ -4,11 +4,14 @@ import sys
 import time
 import pyvisa
 import serial
+import visaPool
 from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtGui import QPixmap
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QComboBox, QFrame
 from PyQt5.QtCore import Qt
 
+TERMINATOR = b'\r\n'  # Terminador das respostas do ESP300
+
 class ESP300:
     def __init__(self, adapter, timeout):
         self.adapter = adapter
@@ -19,15 +22,20 @@ class ESP300:
             self.adapter.timeout = self.timeout * 1000  # Converte segundos para milissegundos
         self.resource = adapter
 
-    def query(self, command):
+    def query(self, command, timeout=None):
         try:
             if isinstance(self.resource, serial.Serial):
                 command = command if command.endswith('\r') else command + '\r'
                 self.resource.write(command.encode())
-                time.sleep(1)  # Atraso para permitir o processamento do comando
-                response = self.resource.read_until(b'\r\n').decode().strip()
+                response = self.read_response(timeout)
             else:
-                response = self.resource.query(command)
+                if timeout is not None:
+                    self.resource.timeout = timeout * 1000
+                try:
+                    response = self.resource.query(command)
+                finally:
+                    if timeout is not None:
+                        self.resource.timeout = self.timeout * 1000
             return response
         except (pyvisa.errors.VisaIOError, serial.SerialException) as e:
             print(f"Erro ao enviar comando: {e}")
@@ -38,6 +46,16 @@ class ESP300:
             self.reconnect()
             return None
 
+    def read_response(self, timeout=None):
+        # Retorna assim que o terminador chega; o prazo vale para o comando inteiro
+        timeout = self.timeout if timeout is None else timeout
+        if self.resource.timeout != timeout:
+            self.resource.timeout = timeout
+        raw = self.resource.read_until(TERMINATOR)
+        if not raw.endswith(TERMINATOR):
+            raise serial.SerialTimeoutException(f"Sem resposta completa em {timeout} s (recebido: {raw!r})")
+        return raw.decode().strip()
+
     def write(self, command):
         try:
             if isinstance(self.resource, serial.Serial):
@@ -261,8 +279,7 @@ class MainWindow(QMainWindow):
             self.serial_connection = serial.Serial(port, baudrate=19200, timeout=timeout)
             self.device = ESP300(self.serial_connection, timeout)
         else:
-            rm = pyvisa.ResourceManager()
-            self.gpib_connection = rm.open_resource("GPIB0::5::INSTR")
+            self.gpib_connection = visaPool.open_resource("GPIB0::5::INSTR", timeout)
             self.device = ESP300(self.gpib_connection, timeout)
 
         self.connection_status_label.setText("Status da conexão: Conectado")
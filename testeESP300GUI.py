@@ -4,8 +4,12 @@ import sys
 import time
 import pyvisa
 import serial
+import visaPool
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLineEdit, QLabel, QComboBox, QFrame, QFormLayout
 from PyQt5.QtCore import Qt
+from concurrent.futures import ThreadPoolExecutor
+from controleESP300 import FutureBridge
+from ioWorker import IOWorker, PRIORITY_POLL
 
 class ESP300:
     def __init__(self, adapter, timeout):
@@ -232,120 +236,123 @@ class MainWindow(QMainWindow):
         self.axis_layout2.addRow(self.axis2_command_output)
 
         self.controller = None
+        self.worker = None  # Todo acesso ao dispositivo passa pela thread de I/O
+        self.bridge = FutureBridge()
+        self.executor = ThreadPoolExecutor(max_workers=1)
 
     def connect_to_device(self):
-        try:
-            connection_type = self.connection_combo.currentText()
-            if connection_type == "Serial (/dev/ttyUSB0)":
-                port = "/dev/ttyUSB0"
-                self.controller = ESP300(serial.Serial(port, baudrate=19200, timeout=1), timeout=20)
-            elif connection_type == "GPIB (GPIB0::5::INSTR)":
-                rm = pyvisa.ResourceManager()
-                resource = rm.open_resource("GPIB0::5::INSTR")
-                self.controller = ESP300(resource, timeout=20)
+        connection_type = self.connection_combo.currentText()
+        self.set_pending(self.connect_button, True)
+        self.status_label.setText("Status de Conexão: Conectando...")
+        future = self.executor.submit(self.open_controller, connection_type)
+        self.bridge.watch(future, self.on_controller_opened)
+
+    def open_controller(self, connection_type):
+        # Roda fora da thread da GUI
+        if connection_type == "Serial (/dev/ttyUSB0)":
+            port = "/dev/ttyUSB0"
+            controller = ESP300(serial.Serial(port, baudrate=19200, timeout=1), timeout=20)
+        elif connection_type == "GPIB (GPIB0::5::INSTR)":
+            resource = visaPool.open_resource("GPIB0::5::INSTR")
+            controller = ESP300(resource, timeout=20)
+        else:
+            return None
+        controller.query("*IDN?")
+        return controller
+
+    def on_controller_opened(self, future):
+        self.set_pending(self.connect_button, False)
+        if future.exception() is not None:
+            self.status_label.setText(f"Status de Conexão: Erro ao conectar: {future.exception()}")
+            return
+        if future.result() is None:
+            self.status_label.setText("Status de Conexão: Método de conexão não reconhecido.")
+            return
+        if self.worker is not None:
+            self.worker.close()
+        self.controller = future.result()
+        self.worker = IOWorker(self.controller)
+        self.status_label.setText("Status de Conexão: Conectado com sucesso.")
+
+    def set_pending(self, button, pending):
+        if pending and button.isEnabled():
+            button.setProperty("texto_original", button.text())
+            button.setText("Aguardando...")
+        elif button.property("texto_original"):
+            button.setText(button.property("texto_original"))
+        button.setEnabled(not pending)
+
+    def run(self, button, output, on_result, method, *args, **kwargs):
+        # Executa na thread de I/O e mostra o resultado no rótulo quando ele chegar
+        if self.worker is None:
+            output.setText("Não conectado.")
+            return
+        self.set_pending(button, True)
+
+        def done(future):
+            self.set_pending(button, False)
+            if future.exception() is not None:
+                output.setText(f"Erro: {future.exception()}")
             else:
-                self.controller = None
-                self.status_label.setText("Status de Conexão: Método de conexão não reconhecido.")
-                return
+                output.setText(on_result(future.result()))
 
-            self.controller.query("*IDN?")
-            self.status_label.setText("Status de Conexão: Conectado com sucesso.")
-        except Exception as e:
-            self.status_label.setText(f"Status de Conexão: Erro ao conectar: {e}")
+        self.bridge.watch(self.worker.submit(method, *args, **kwargs), done)
 
-    def move_to_position_axis1(self):
-        position = self.axis1_position_input.text()
+    def move_to_position(self, axis, input_field, button, output, error_output):
+        position = input_field.text()
         if not position:
-            self.axis1_command_output.setText("Posição não pode estar vazia.")
+            error_output.setText("Posição não pode estar vazia.")
             return
+        self.run(button, output, lambda result: f"Movendo eixo {axis} para a posição {position}.", "move_to", axis, position)
 
-        try:
-            self.controller.move_to("1", position)
-            self.axis1_current_position_output.setText(f"Movendo eixo 1 para a posição {position}.")
-        except Exception as e:
-            self.axis1_command_output.setText(f"Erro: {e}")
-
-    def move_relative_position_axis1(self):
-        increment = self.axis1_move_relative_input.text()
+    def move_relative_position(self, axis, input_field, button, output, error_output):
+        increment = input_field.text()
         if not increment:
-            self.axis1_command_output.setText("Incremento não pode estar vazio.")
+            error_output.setText("Incremento não pode estar vazio.")
             return
+        self.run(button, output, lambda result: f"Movendo eixo {axis} relativo {increment}.", "move_relative", axis, increment)
 
-        try:
-            self.controller.move_relative("1", increment)
-            self.axis1_current_position_output.setText(f"Movendo eixo 1 relativo {increment}.")
-        except Exception as e:
-            self.axis1_command_output.setText(f"Erro: {e}")
-
-    def update_position_axis1(self):
-        try:
-            position = self.controller.get_position("1")
-            self.axis1_current_position_output.setText(f"Posição atual do eixo 1: {position}")
-        except Exception as e:
-            self.axis1_current_position_output.setText(f"Erro: {e}")
+    def update_position(self, axis, button, output):
+        self.run(button, output, lambda position: f"Posição atual do eixo {axis}: {position}",
+                 "get_position", axis, priority=PRIORITY_POLL, coalesce=True)
 
-    def send_custom_command_axis1(self):
-        command = self.axis1_custom_command_input.text()
+    def send_custom_command(self, input_field, button, output):
+        command = input_field.text()
         if not command:
-            self.axis1_command_output.setText("Comando não pode estar vazio.")
+            output.setText("Comando não pode estar vazio.")
             return
+        self.run(button, output, lambda response: "Nenhuma resposta recebida." if response is None else response,
+                 "execute_command", command)
 
-        try:
-            response = self.controller.execute_command(command)
-            if response is None:
-                self.axis1_command_output.setText("Nenhuma resposta recebida.")
-            else:
-                self.axis1_command_output.setText(response)
-        except Exception as e:
-            self.axis1_command_output.setText(f"Erro: {e}")
-            print(f"Erro ao enviar comando personalizado: {e}")
+    def move_to_position_axis1(self):
+        self.move_to_position("1", self.axis1_position_input, self.axis1_move_to_button, self.axis1_current_position_output, self.axis1_command_output)
 
-    def move_to_position_axis2(self):
-        position = self.axis2_position_input.text()
-        if not position:
-            self.axis2_command_output.setText("Posição não pode estar vazia.")
-            return
+    def move_relative_position_axis1(self):
+        self.move_relative_position("1", self.axis1_move_relative_input, self.axis1_move_relative_button, self.axis1_current_position_output, self.axis1_command_output)
 
-        try:
-            self.controller.move_to("2", position)
-            self.axis2_current_position_output.setText(f"Movendo eixo 2 para a posição {position}.")
-        except Exception as e:
-            self.axis2_command_output.setText(f"Erro: {e}")
+    def update_position_axis1(self):
+        self.update_position("1", self.axis1_update_position_button, self.axis1_current_position_output)
 
-    def move_relative_position_axis2(self):
-        increment = self.axis2_move_relative_input.text()
-        if not increment:
-            self.axis2_command_output.setText("Incremento não pode estar vazio.")
-            return
+    def send_custom_command_axis1(self):
+        self.send_custom_command(self.axis1_custom_command_input, self.axis1_send_command_button, self.axis1_command_output)
 
-        try:
-            self.controller.move_relative("2", increment)
-            self.axis2_current_position_output.setText(f"Movendo eixo 2 relativo {increment}.")
-        except Exception as e:
-            self.axis2_command_output.setText(f"Erro: {e}")
+    def move_to_position_axis2(self):
+        self.move_to_position("2", self.axis2_position_input, self.axis2_move_to_button, self.axis2_current_position_output, self.axis2_command_output)
+
+    def move_relative_position_axis2(self):
+        self.move_relative_position("2", self.axis2_move_relative_input, self.axis2_move_relative_button, self.axis2_current_position_output, self.axis2_command_output)
 
     def update_position_axis2(self):
-        try:
-            position = self.controller.get_position("2")
-            self.axis2_current_position_output.setText(f"Posição atual do eixo 2: {position}")
-        except Exception as e:
-            self.axis2_current_position_output.setText(f"Erro: {e}")
+        self.update_position("2", self.axis2_update_position_button, self.axis2_current_position_output)
 
     def send_custom_command_axis2(self):
-        command = self.axis2_custom_command_input.text()
-        if not command:
-            self.axis2_command_output.setText("Comando não pode estar vazio.")
-            return
+        self.send_custom_command(self.axis2_custom_command_input, self.axis2_send_command_button, self.axis2_command_output)
 
-        try:
-            response = self.controller.execute_command(command)
-            if response is None:
-                self.axis2_command_output.setText("Nenhuma resposta recebida.")
-            else:
-                self.axis2_command_output.setText(response)
-        except Exception as e:
-            self.axis2_command_output.setText(f"Erro: {e}")
-            print(f"Erro ao enviar comando personalizado: {e}")
+    def closeEvent(self, event):
+        if self.worker is not None:
+            self.worker.close()
+        self.executor.shutdown(wait=False)
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
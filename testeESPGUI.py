@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 
 import sys
-import pyvisa
+import visaPool
 from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QLineEdit, QPushButton, QVBoxLayout, QWidget
 
 class MainWindow(QMainWindow):
@@ -9,8 +9,7 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.setWindowTitle('ESP300 Controller')
         
-        # Resource Manager
-        self.rm = pyvisa.ResourceManager()
+        # Shared Resource Manager from visaPool, created on first connection
         self.gpib_device = None
 
         # Layout and widgets
@@ -37,8 +36,7 @@ class MainWindow(QMainWindow):
 
     def connect_to_esp300(self):
         try:
-            self.gpib_device = self.rm.open_resource('GPIB0::5::INSTR')
-            self.gpib_device.timeout = 3000  # 3 seconds timeout
+            self.gpib_device = visaPool.open_resource('GPIB0::5::INSTR', timeout=3)  # 3 seconds timeout
             self.command_output.setText('Connected to ESP300.')
         except Exception as e:
             self.command_output.setText(f'Connection error: {str(e)}')
@@ -48,7 +46,7 @@ class MainWindow(QMainWindow):
             self.command_output.setText('Not connected to ESP300.')
             return
 
-        command = self.command_input.text() + '\r'
+        command = self.command_input.text()  # visaPool appends the '\r' write termination
         try:
             response = self.gpib_device.query(command)
             self.command_output.setText(response)
@@ -2,18 +2,13 @@
 
 import time
 import pyvisa
+import visaPool
 
 def test_gpib_commands():
+    resource = None
     try:
-        # Cria o gerenciador de recursos
-        rm = pyvisa.ResourceManager()
-
-        # Abre o recurso GPIB
-        resource = rm.open_resource("GPIB0::5::INSTR")
-
-        # Define as terminações de escrita e leitura
-        resource.write_termination = '\r'
-        resource.read_termination = '\r\n'
+        # Abre o recurso GPIB pelo gerenciador compartilhado (terminações já configuradas)
+        resource = visaPool.open_resource("GPIB0::5::INSTR")
 
         print("Conectado ao GPIB.")
 
@@ -39,7 +34,8 @@ def test_gpib_commands():
         print(f"Erro de comunicação: {e}")
     finally:
         # Garante que o recurso será fechado
-        resource.close()
+        if resource is not None:
+            visaPool.close_resource("GPIB0::5::INSTR")
 
 if __name__ == "__main__":
     test_gpib_commands()
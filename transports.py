@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+import functools
+
+import serial
+
+from esp300Protocol import COMMAND_SEPARATOR, RESPONSE_SEPARATOR, pack_commands
+from frameReader import FrameReader, frame_text, frame_numbers
+
+# Transportes do ESP300 com a mesma interface (serial, VISA/GPIB e um falso em memória para testes),
+# escolhidos uma vez na conexão por make_transport. Os comandos chegam já codificados em bytes com o
+# \r final; encode e compile_lines guardam a codificação, então o laço de consulta repete sempre os
+# mesmos bytes sem formatar strings nem testar o tipo da conexão a cada chamada.
+
+COMMAND_TERMINATOR = b'\r'
+
+@functools.lru_cache(maxsize=4096)
+def encode(command):
+    # "1TP?" -> b"1TP?\r"
+    return command.rstrip('\r').encode() + COMMAND_TERMINATOR
+
+@functools.lru_cache(maxsize=1024)
+def compile_lines(commands):
+    # Tupla de comandos -> ((bytes da linha, comandos da linha), ...), agrupados como em pack_commands
+    return tuple((encode(COMMAND_SEPARATOR.join(line)), tuple(line)) for line in pack_commands(commands))
+
+class Transport:
+    # Interface comum; timeout em segundos, None usa o padrão da conexão. sent e received contam
+    # os bytes trocados com o controlador (ver driverMetrics). tracer: busTracer.Tracer ou None
+    sent = 0
+    received = 0
+    tracer = None
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def query(self, data, timeout=None):
+        raise NotImplementedError
+
+    def query_numbers(self, data, timeout=None):
+        return [float(value) for value in self.query(data, timeout).split(RESPONSE_SEPARATOR)]
+
+    def read(self, timeout=None):
+        # Próxima resposta já pedida, sem enviar nada (ex.: a que chega atrás de uma resposta atrasada)
+        raise NotImplementedError
+
+    def reopen(self):
+        pass
+
+    def flush(self):
+        # Descarta respostas atrasadas ainda não lidas
+        pass
+
+    def close(self):
+        pass
+
+class SerialTransport(Transport):
+    def __init__(self, connection, timeout):
+        self.connection = connection
+        self.timeout = timeout
+        connection.timeout = timeout
+        # Respostas lidas em blocos para um buffer reaproveitado, em vez de byte a byte
+        self.framer = FrameReader(connection)
+        self._write = connection.write
+
+    @property
+    def received(self):
+        return self.framer.received
+
+    def write(self, data):
+        tracer = self.tracer  # Lido uma vez: a GUI pode desligar o tracer no meio da chamada
+        if tracer is not None:
+            started = tracer.now()
+            self._write(data)
+            tracer.complete("escrita", started, tracer.now(), args={"bytes": len(data)})
+        else:
+            self._write(data)
+        self.sent += len(data)
+
+    def query(self, data, timeout=None):
+        tracer = self.tracer
+        if tracer is not None:
+            return self._traced(tracer, data, self.timeout if timeout is None else timeout, frame_text)
+        self._write(data)
+        self.sent += len(data)
+        return self.framer.read_text(self.timeout if timeout is None else timeout)
+
+    def query_numbers(self, data, timeout=None):
+        # Os números saem direto dos bytes recebidos, sem passar por str
+        tracer = self.tracer
+        if tracer is not None:
+            return self._traced(tracer, data, self.timeout if timeout is None else timeout, frame_numbers)
+        self._write(data)
+        self.sent += len(data)
+        return self.framer.read_numbers(self.timeout if timeout is None else timeout)
+
+    def read(self, timeout=None):
+        return self.framer.read_text(self.timeout if timeout is None else timeout)
+
+    def _traced(self, tracer, data, timeout, parse):
+        # Mesma consulta, com as fases marcadas: escrita, primeiro byte, quadro completo, conversão
+        started = tracer.now()
+        self._write(data)
+        self.sent += len(data)
+        written = tracer.now()
+        tracer.complete("escrita", started, written, args={"bytes": len(data)})
+        if not self.framer.pending():
+            self.framer.fill(timeout)  # Volta quando chega o primeiro byte (ou no timeout)
+        first = tracer.now()
+        tracer.complete("espera do 1º byte", written, first)
+        frame = self.framer.read_frame(max(timeout - (first - started) / 1e9, 0))
+        complete = tracer.now()
+        tracer.complete("recepção", first, complete, args={"bytes": len(frame) + len(self.framer.terminator)})
+        result = parse(frame)
+        tracer.complete("conversão", complete, tracer.now())
+        return result
+
+    def reopen(self):
+        self.connection.close()
+        self.connection.open()
+        self.framer.reset()
+        self._write = self.connection.write
+
+    def flush(self):
+        self.connection.reset_input_buffer()
+        self.framer.reset()
+
+    def close(self):
+        self.connection.close()
+
+class VisaTransport(Transport):
+    def __init__(self, resource, timeout):
+        self.resource = resource
+        self.timeout = timeout
+        self._applied = None  # Timeout atualmente configurado no recurso (s)
+        self._apply(timeout)
+
+    def _apply(self, timeout):
+        # Alterar o timeout é uma chamada ao driver VISA; só quando muda
+        if timeout != self._applied:
+            self.resource.timeout = timeout * 1000  # Converte segundos para milissegundos
+            self._applied = timeout
+
+    def write(self, data):
+        # write_raw não acrescenta terminação: o \r já está nos bytes
+        tracer = self.tracer  # Lido uma vez: a GUI pode desligar o tracer no meio da chamada
+        if tracer is not None:
+            started = tracer.now()
+            self.resource.write_raw(data)
+            tracer.complete("escrita", started, tracer.now(), args={"bytes": len(data)})
+        else:
+            self.resource.write_raw(data)
+        self.sent += len(data)
+
+    def query(self, data, timeout=None):
+        self._apply(self.timeout if timeout is None else timeout)
+        tracer = self.tracer
+        if tracer is not None:
+            return self._traced(tracer, data)
+        self.resource.write_raw(data)
+        self.sent += len(data)
+        reply = self.resource.read()
+        self.received += len(reply) + 2  # read() já tirou o \r\n
+        return reply.strip()
+
+    def read(self, timeout=None):
+        self._apply(self.timeout if timeout is None else timeout)
+        reply = self.resource.read()
+        self.received += len(reply) + 2
+        return reply.strip()
+
+    def _traced(self, tracer, data):
+        # O VISA entrega a resposta inteira: primeiro byte e quadro completo não se separam
+        started = tracer.now()
+        self.resource.write_raw(data)
+        self.sent += len(data)
+        written = tracer.now()
+        tracer.complete("escrita", started, written, args={"bytes": len(data)})
+        reply = self.resource.read()
+        self.received += len(reply) + 2
+        read = tracer.now()
+        tracer.complete("leitura", written, read, args={"bytes": len(reply) + 2})
+        reply = reply.strip()
+        tracer.complete("conversão", read, tracer.now())
+        return reply
+
+    def reopen(self):
+        self.resource.close()
+        self.resource.open()
+        self._applied = None  # open() volta o timeout ao padrão do VISA
+        self._apply(self.timeout)
+
+    def close(self):
+        self.resource.close()
+
+class FakeTransport(Transport):
+    # Responde em memória, sem porta nem thread: responder recebe a linha de comando (str, sem \r) e
+    # devolve a resposta ou None, ex.: FakeTransport(ESP300Simulator().handle_line)
+    def __init__(self, responder, timeout=5):
+        self.responder = responder
+        self.timeout = timeout
+
+    def write(self, data):
+        self.sent += len(data)
+        self.responder(data[:-1].decode())
+
+    def query(self, data, timeout=None):
+        self.sent += len(data)
+        reply = self.responder(data[:-1].decode())
+        if reply is None:
+            raise serial.SerialTimeoutException(f"Sem resposta para {data!r}")
+        self.received += len(reply)
+        return reply.strip()
+
+    def read(self, timeout=None):
+        raise serial.SerialTimeoutException("Nenhuma resposta pendente")  # As respostas nunca atrasam aqui
+
+def make_transport(adapter, timeout):
+    # adapter: serial.Serial, recurso pyvisa, função de resposta (transporte falso) ou Transport pronto
+    if isinstance(adapter, Transport):
+        return adapter
+    if isinstance(adapter, serial.Serial):
+        return SerialTransport(adapter, timeout)
+    if callable(adapter):
+        return FakeTransport(adapter, timeout)
+    return VisaTransport(adapter, timeout)
@@ -23,6 +23,12 @@
 #  Port 5: 0100 power
 #  Port 6: 0100 power
 
-sudo uhubctl -l 1-1 -p 3 -a off
+## Usage: turnOnOffGPIP.sh [hub] [port] (defaults: 1-1 3) ##
+## The same power cycle is tier 3 of linkRecovery (reconnectUSBPorts.power_cycle) ##
+
+HUB=${1:-1-1}
+PORT=${2:-3}
+
+sudo uhubctl -l $HUB -p $PORT -a off
 sleep 5
-sudo uhubctl -l 1-1 -p 3 -a on
+sudo uhubctl -l $HUB -p $PORT -a on
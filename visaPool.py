@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import threading
+
+import pyvisa
+
+# ResourceManager único por processo, aberto só quando alguém precisa dele, e um conjunto de
+# instrumentos já abertos indexados pelo nome do recurso. Carregar o backend VISA e enumerar os
+# recursos costuma levar centenas de milissegundos; aqui isso acontece uma vez só.
+
+WRITE_TERMINATION = '\r'
+READ_TERMINATION = '\r\n'
+
+_lock = threading.RLock()
+_manager = None
+_resources = {}
+_timeouts = {}  # O timeout volta ao padrão quando a sessão é reaberta e precisa ser reaplicado
+_listing = None
+
+def resource_manager():
+    global _manager
+    with _lock:
+        if _manager is None:
+            _manager = pyvisa.ResourceManager()
+        return _manager
+
+def list_resources(refresh=False):
+    # A enumeração é a parte mais lenta; o resultado fica guardado até refresh=True
+    global _listing
+    with _lock:
+        if _listing is None or refresh:
+            _listing = resource_manager().list_resources()
+        return _listing
+
+def _is_open(resource):
+    try:
+        resource.session
+        return True
+    except pyvisa.errors.InvalidSession:
+        return False
+
+def _configure(name, resource):
+    resource.write_termination = WRITE_TERMINATION
+    resource.read_termination = READ_TERMINATION
+    resource.timeout = _timeouts[name] * 1000  # Converte segundos para milissegundos
+
+def open_resource(name, timeout=5):
+    # Todos os usuários recebem o mesmo handle; as terminações são configuradas uma vez e o timeout
+    # (em segundos) passa a ser o do último pedido, se for diferente do atual
+    with _lock:
+        resource = _resources.get(name)
+        if resource is None:
+            resource = resource_manager().open_resource(name)
+            _resources[name] = resource
+            _timeouts[name] = timeout
+            _configure(name, resource)
+        elif not _is_open(resource):
+            _timeouts[name] = timeout
+            resource.open()
+            _configure(name, resource)
+        elif timeout != _timeouts[name]:
+            _timeouts[name] = timeout
+            resource.timeout = timeout * 1000
+        return resource
+
+def in_pool(name):
+    # True se algum usuário (ex.: um driver conectado) já tem o handle deste recurso
+    with _lock:
+        return name in _resources
+
+def reopen(name):
+    # Reconexão sem recriar o ResourceManager nem o objeto do recurso
+    with _lock:
+        resource = _resources[name]
+        if _is_open(resource):
+            resource.close()
+        resource.open()
+        _configure(name, resource)
+        return resource
+
+def close_resource(name):
+    with _lock:
+        resource = _resources.pop(name, None)
+        _timeouts.pop(name, None)
+        if resource is not None and _is_open(resource):
+            resource.close()
+
+def close_all():
+    global _manager, _listing
+    with _lock:
+        for name in list(_resources):
+            close_resource(name)
+        if _manager is not None:
+            _manager.close()
+        _manager = None
+        _listing = None